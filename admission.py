@@ -0,0 +1,194 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# Custo em tokens de cada classe de rota
+COSTS = {
+    'lookup': 1,
+    'write': 2,
+    'listing': 10,
+    'bulk': 50,
+}
+
+DEFAULT_QUEUE_TIMEOUT = 0.1
+DEFAULT_MAX_CLIENTS = 10000
+
+
+class RateLimited(Exception):
+    """The client spent its token bucket; retry after `retry_after` seconds"""
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"Limite de requisições excedido. Tente novamente em {retry_after}s")
+
+
+class Overloaded(Exception):
+    """Every concurrency slot stayed busy for the whole queue timeout"""
+
+    def __init__(self, retry_after=1):
+        self.retry_after = retry_after
+        super().__init__("Servidor sobrecarregado. Tente novamente em instantes")
+
+
+class TokenBucket:
+    """
+    Refills `rate` tokens per second up to `burst`.
+
+    A cost above `burst` (e.g. a large batch) is taken from a full bucket and
+    leaves it negative, so it still waits as long as its requests sent one
+    by one would.
+    """
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, cost, now):
+        """Spend `cost` tokens; returns 0 on success or the seconds until they are available"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        needed = min(cost, self.burst)
+        if self.tokens >= needed:
+            self.tokens -= cost
+            return 0
+        return (needed - self.tokens) / self.rate
+
+    def refund(self, cost):
+        self.tokens = min(self.burst, self.tokens + cost)
+
+
+class AdmissionController:
+    """
+    Decides, before any database work, whether a request runs.
+
+    Per client: a token bucket of `rate` tokens per second and `burst`
+    capacity, where each request spends the cost of its route class, so a
+    full listing weighs as much as ten id lookups. Exhausting it raises
+    RateLimited (429).
+
+    Global: at most `max_concurrent` admitted requests run at once. A request
+    waits up to `queue_timeout` seconds for a slot and then raises
+    Overloaded (503), so overload turns into fast rejections instead of a
+    queue that grows until clients time out.
+
+    rate=0 disables the per-client limit and max_concurrent=None the global one.
+    """
+
+    def __init__(self, rate=0, burst=None, max_concurrent=None, queue_timeout=DEFAULT_QUEUE_TIMEOUT,
+                 max_clients=DEFAULT_MAX_CLIENTS, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(2 * rate, max(COSTS.values()))
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.max_clients = max_clients
+        self.clock = clock
+        self.in_flight = 0
+        self.rate_limited = 0
+        self.overloaded = 0
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+
+    def _take(self, client, cost):
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.burst, now)
+                if len(self._buckets) > self.max_clients:
+                    # O cliente parado há mais tempo já teria o balde cheio de novo
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+            wait = bucket.take(cost, now)
+            if wait:
+                self.rate_limited += 1
+        return wait
+
+    def _refund(self, client, cost):
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is not None:
+                bucket.refund(cost)
+
+    def admit(self, client, cost):
+        """
+        Admit one request; call release() when it finishes.
+
+        Args:
+            client (str): API key or IP address
+            cost (int): Tokens the request spends (see COSTS)
+
+        Raises:
+            RateLimited: The client is over its rate
+            Overloaded: No concurrency slot freed up within queue_timeout
+        """
+        if self.rate:
+            wait = self._take(client, cost)
+            if wait:
+                raise RateLimited(max(1, math.ceil(wait)))
+        if self._slots is not None:
+            if not self._slots.acquire(timeout=self.queue_timeout):
+                if self.rate:
+                    # A requisição não rodou: o cliente não paga por ela
+                    self._refund(client, cost)
+                with self._lock:
+                    self.overloaded += 1
+                raise Overloaded()
+        with self._lock:
+            self.in_flight += 1
+
+    def borrow(self, count):
+        """
+        Take up to `count` extra concurrency slots without waiting, for work
+        an admitted request fans out (e.g. parallel batch reads).
+
+        Returns:
+            int: Slots taken; give them back with release(n)
+        """
+        taken = count
+        if self._slots is not None:
+            taken = 0
+            while taken < count and self._slots.acquire(blocking=False):
+                taken += 1
+        with self._lock:
+            self.in_flight += taken
+        return taken
+
+    def release(self, count=1):
+        with self._lock:
+            self.in_flight -= count
+        if self._slots is not None:
+            for _ in range(count):
+                self._slots.release()
+
+    def status(self):
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'max_concurrent': self.max_concurrent,
+                'rate_per_client': self.rate or None,
+                'burst': self.burst if self.rate else None,
+                'clients': len(self._buckets),
+                'rate_limited': self.rate_limited,
+                'overloaded': self.overloaded
+            }
+
+
+controller = AdmissionController()
+
+
+def configure(rate=0, burst=None, max_concurrent=None, queue_timeout=DEFAULT_QUEUE_TIMEOUT):
+    """Replace the process admission controller"""
+    global controller
+    controller = AdmissionController(rate, burst, max_concurrent, queue_timeout)
+    return controller
+
+
+def get_controller():
+    return controller
@@ -1,14 +1,32 @@
-from flask import Flask, jsonify, request, url_for
-from func import *
-import re
+from flask import Flask, Response, current_app, g, jsonify, request, send_file, url_for
+from func import (
+    listar_todos_imoveis, listar_imovel_por_id, listar_imoveis_por_ids, listar_imoveis_por_tipo, listar_imoveis_por_cidade,
+    inserir_imovel, atualizar_imovel_e_retornar, deletar_imovel_e_retornar,
+    listar_alteracoes, TokenExpiradoError, contar_imoveis, listar_contagens, versao_dados
+)
+import admission
+import compression
+import db
+import events
+import importacao
+import replication
+import response_cache
+import serialization
+from validation import imovel_validator
+import shared_cache
+import singleflight
+import snapshot
+import swr_cache
+from circuit_breaker import CircuitOpenError
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from collections import OrderedDict
-
-app = Flask(__name__)
-
-# Configurações
-app.config['JSON_SORT_KEYS'] = False
-app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
 
 # HATEOAS Helper Functions
 def build_imovel_links(imovel_id, include_collection=True):
@@ -85,6 +103,36 @@ def build_api_root_links():
             'method': 'POST',
             'title': 'Criar novo imóvel'
         },
+        'import': {
+            'href': url_for('importar_imoveis_route', _external=True),
+            'method': 'POST',
+            'title': 'Importar imóveis de um CSV ou NDJSON'
+        },
+        'lookup': {
+            'href': url_for('buscar_imoveis_por_ids_route', _external=True),
+            'method': 'POST',
+            'title': 'Buscar vários imóveis por id ({"ids": [...]} ou GET /imoveis?ids=)'
+        },
+        'batch': {
+            'href': url_for('batch_route', _external=True),
+            'method': 'POST',
+            'title': 'Executar várias operações em uma requisição'
+        },
+        'counts': {
+            'href': url_for('contagens_imoveis_route', _external=True),
+            'method': 'GET',
+            'title': 'Quantidade de imóveis por tipo e por cidade'
+        },
+        'changes': {
+            'href': url_for('listar_alteracoes_route', _external=True),
+            'method': 'GET',
+            'title': 'Sincronizar alterações desde um token (?since=)'
+        },
+        'stream': {
+            'href': url_for('stream_imoveis_route', _external=True),
+            'method': 'GET',
+            'title': 'Acompanhar inclusões, alterações e remoções (Server-Sent Events)'
+        },
         'health': {
             'href': url_for('health_check', _external=True),
             'method': 'GET',
@@ -92,38 +140,310 @@ def build_api_root_links():
         }
     }
 
-def enhance_imovel_with_links(imovel):
-    """Add HATEOAS links to a single imovel object with data fields first"""
+IMOVEL_FIELDS = ('id', 'logradouro', 'tipo_logradouro', 'bairro', 'cidade', 'cep', 'tipo', 'valor', 'data_aquisicao')
+
+# Fields accepted in ?fields=; 'link' asks for the links of each imovel
+SELECTABLE_FIELDS = IMOVEL_FIELDS + ('link',)
+
+def enhance_imovel_with_links(imovel, fields=None):
+    """Add HATEOAS links to a single imovel object with data fields first (only `fields`, if given)"""
     if imovel and 'id' in imovel:
-        # Use OrderedDict to guarantee field order
-        enhanced_imovel = OrderedDict()
-        
-        # Add all original fields first in a specific order
-        enhanced_imovel['id'] = imovel.get('id')
-        enhanced_imovel['logradouro'] = imovel.get('logradouro')
-        enhanced_imovel['tipo_logradouro'] = imovel.get('tipo_logradouro')
-        enhanced_imovel['bairro'] = imovel.get('bairro')
-        enhanced_imovel['cidade'] = imovel.get('cidade')
-        enhanced_imovel['cep'] = imovel.get('cep')
-        enhanced_imovel['tipo'] = imovel.get('tipo')
-        enhanced_imovel['valor'] = imovel.get('valor')
-        enhanced_imovel['data_aquisicao'] = imovel.get('data_aquisicao')
-        
-        # Add links at the end
-        enhanced_imovel['link'] = build_imovel_links(imovel['id'])
-        
+        # dicts keep insertion order and the JSON provider does not sort keys: fields first, links at the end
+        if fields is None:
+            enhanced_imovel = {field: imovel.get(field) for field in IMOVEL_FIELDS}
+        else:
+            enhanced_imovel = {field: imovel.get(field) for field in IMOVEL_FIELDS if field == 'id' or field in fields}
+        if fields is None or 'link' in fields:
+            enhanced_imovel['link'] = build_imovel_links(imovel['id'])
         return enhanced_imovel
     return imovel
 
-def enhance_imoveis_collection_with_links(imoveis):
+def enhance_imoveis_collection_with_links(imoveis, fields=None):
     """Add HATEOAS links to each imovel in a collection"""
-    enhanced_imoveis = []
-    for imovel in imoveis:
-        enhanced_imoveis.append(enhance_imovel_with_links(imovel.copy()))
-    return enhanced_imoveis
+    return [enhance_imovel_with_links(imovel, fields) for imovel in imoveis]
+
+# Placeholder id whose encoded links become the template filled in for each row
+LINK_TEMPLATE_ID = 987654321987654321
+
+def imovel_links_suffix():
+    """
+    Suffix with the links of each imovel for serialization.RowEncoder
+
+    url_for runs once per response: the links of a placeholder id are encoded
+    and the id of each row (its first column) is filled into that template.
+    """
+    template = current_app.json.backend.dumps(build_imovel_links(LINK_TEMPLATE_ID)).decode('utf-8').split(
+        str(LINK_TEMPLATE_ID))
+    
+    def suffix(row):
+        return ',"link":' + str(row[0]).join(template)
+    return suffix
+
+def encode_imoveis_collection(imoveis, fields=None):
+    """Same objects as enhance_imoveis_collection_with_links, encoded straight to JSON (a serialization.Fragment)"""
+    columns = IMOVEL_FIELDS if fields is None else tuple(field for field in IMOVEL_FIELDS
+                                                         if field == 'id' or field in fields)
+    suffix = imovel_links_suffix() if fields is None or 'link' in fields else None
+    return serialization.RowEncoder(columns, suffix, current_app.json.backend).encode_mappings(imoveis)
+
+def requested_fields():
+    """
+    Campos pedidos em ?fields=id,cidade,valor
+    
+    O id vem sempre; os links de cada imóvel só vêm se 'link' for pedido.
+    
+    Returns:
+        set or None: Campos pedidos, ou None sem o parâmetro (todos os campos e os links)
+        
+    Raises:
+        ValueError: Algum campo não existe
+    """
+    fields = request.args.get('fields')
+    if fields is None:
+        return None
+    fields = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown = sorted(fields - set(SELECTABLE_FIELDS))
+    if unknown:
+        raise ValueError(f"Campos desconhecidos: {', '.join(unknown)}. "
+                         f"Campos válidos: {', '.join(SELECTABLE_FIELDS)}")
+    return fields
+
+def data_columns(fields):
+    """Colunas a ler do banco para os campos pedidos (None: todas)"""
+    return None if fields is None else fields - {'link'}
+
+# Máximo de ids em uma busca de vários imóveis (?ids= ou POST /imoveis/lookup)
+MAX_IDS = 5000
+
+def parse_ids(values):
+    """
+    Converte os ids pedidos em inteiros positivos
+    
+    Raises:
+        ValueError: Algum id inválido, nenhum id ou mais que MAX_IDS
+    """
+    ids = []
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError(f'Id inválido: {value!r}')
+        try:
+            imovel_id = int(value.strip() if isinstance(value, str) else value)
+        except ValueError:
+            raise ValueError(f'Id inválido: {value!r}') from None
+        if imovel_id < 1:
+            raise ValueError(f'Id inválido: {value!r}')
+        ids.append(imovel_id)
+    if not ids:
+        raise ValueError('Informe pelo menos um id')
+    if len(ids) > MAX_IDS:
+        raise ValueError(f'No máximo {MAX_IDS} ids por requisição')
+    return ids
+
+def imoveis_por_ids_response(ids, fields):
+    """Resposta da busca de vários imóveis: encontrados na ordem pedida e ids ausentes em missing"""
+    encontrados, nao_encontrados = listar_imoveis_por_ids(ids, tx=batch_transaction(), campos=data_columns(fields))
+    response_data = OrderedDict([
+        ('success', True),
+        ('message', f'{len(encontrados)} imóveis encontrados'),
+        ('total', len(encontrados)),
+        ('missing', nao_encontrados),
+        ('links', build_collection_links()),
+        ('data', encode_imoveis_collection(encontrados, fields)),
+    ])
+    return jsonify(response_data), 200
+
+def invalid_parameter_response(error):
+    return jsonify({
+        'success': False,
+        'error': 'Parâmetro inválido',
+        'message': str(error),
+        'link': build_collection_links()
+    }), 400
+
+# Requisições em lote (POST /batch): cada sub-requisição roda no próprio app
+BATCH_SUBREQUEST_KEY = 'imoveis.batch'
+BATCH_TX_KEY = 'imoveis.batch_transaction'
+
+def batch_transaction():
+    """Transação do batch atômico a que esta requisição pertence, ou None"""
+    return request.environ.get(BATCH_TX_KEY)
+
+@contextmanager
+def request_transaction():
+    """db.transaction() da rota; dentro de um batch atômico, a transação dele (confirmada no fim do batch)"""
+    tx = batch_transaction()
+    if tx is not None:
+        yield tx
+    else:
+        with db.transaction() as tx:
+            yield tx
+
+# Sessão do cliente para leitura em réplicas (read-your-writes)
+LAST_WRITE_COOKIE = 'db_last_write'
+
+def bind_db_session():
+    """Associa a requisição à sessão do cliente para rotear leituras entre primário e réplicas"""
+    try:
+        last_write_hint = float(request.cookies.get(LAST_WRITE_COOKIE, ''))
+    except ValueError:
+        last_write_hint = None
+    session_key = request.headers.get('X-Session-Id') or request.remote_addr
+    replication.begin_request(session_key, last_write_hint)
+
+def remember_last_write(response):
+    """Após uma escrita, informa ao cliente o momento dela para que qualquer worker leia do primário"""
+    if replication.request_wrote():
+        response.set_cookie(LAST_WRITE_COOKIE, f'{time.time():.3f}', max_age=3600, httponly=True, samesite='Lax')
+    return response
+
+# Cache de respostas: GETs de leitura são servidos da memória sem entrar na rota
+CACHEABLE_ENDPOINTS = {
+    'api_info',
+    'listar_todos_imoveis_route',
+    'obter_imovel_por_id_route',
+    'listar_imoveis_por_tipo_route',
+    'listar_imoveis_por_cidade_route',
+    'contagens_imoveis_route',
+}
+# Headers que não podem ser reaproveitados entre clientes
+UNCACHED_HEADERS = {'set-cookie', 'x-cache'}
+
+def _cacheable_request():
+    # Dentro de um batch atômico a leitura vê escritas ainda não confirmadas
+    return (request.method in ('GET', 'HEAD') and request.endpoint in CACHEABLE_ENDPOINTS
+            and BATCH_TX_KEY not in request.environ)
+
+def _response_cache_key():
+    # Accept-Encoding fica fora da chave: as versões comprimidas são guardadas na própria entrada
+    return request.scheme, request.host, request.full_path, request.headers.get('Accept', '')
+
+def _wrote_recently(ttl):
+    """O cliente escreveu há menos de ttl segundos: o cache pode não ter visto a escrita"""
+    try:
+        return time.time() - float(request.cookies.get(LAST_WRITE_COOKIE, '')) < ttl
+    except ValueError:
+        return False
+
+def serve_cached_response():
+    """Devolve a resposta guardada, se houver, antes de qualquer outro processamento"""
+    cache = response_cache.get_cache()
+    if cache is None or not _cacheable_request() or _wrote_recently(cache.ttl):
+        return None
+    g.response_cache_generation = cache.generation
+    # Lida antes da rota: uma escrita de outro worker durante a leitura deixa a entrada já vencida
+    g.response_cache_version = versao_dados()
+    entry = cache.get(_response_cache_key(), g.response_cache_version)
+    if entry is None:
+        return None
+    g.response_cache_hit = True
+    g.response_cache_entry = entry
+    response = Response(entry.body, status=entry.status, headers=entry.headers)
+    response.headers['X-Cache'] = 'HIT'
+    return response.make_conditional(request)
+
+def apply_cache_policy(response):
+    """Cache-Control, Vary e ETag nas leituras; guarda a resposta no cache quando ligado"""
+    if g.get('response_cache_hit'):
+        return response
+    if not _cacheable_request():
+        if request.method not in ('GET', 'HEAD'):
+            response.headers['Cache-Control'] = 'no-store'
+        return response
+    if response.status_code != 200 or response.is_streamed:
+        return response
+    
+    max_age = current_app.config['HTTP_MAX_AGE']
+    response.headers['Cache-Control'] = f'public, max-age={max_age}' if max_age else 'no-cache'
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    response.add_etag()
+    
+    generation = g.get('response_cache_generation')
+    if generation is not None:
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() not in UNCACHED_HEADERS]
+        g.response_cache_entry = response_cache.get_cache().set(
+            _response_cache_key(), response.status_code, headers, response.get_data(), generation,
+            g.response_cache_version)
+        response.headers['X-Cache'] = 'MISS'
+    return response.make_conditional(request)
+
+# Compressão: roda por último, depois do ETag e do cache de respostas
+def compress_response(response):
+    """Comprime o corpo com a melhor codificação aceita pelo cliente (Accept-Encoding)"""
+    if (not current_app.config['COMPRESSION'] or response.status_code in (204, 304)
+            or response.status_code < 200 or 'Content-Encoding' in response.headers
+            or response.direct_passthrough or response.mimetype not in compression.COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(compression.available_encodings())
+    if encoding is None:
+        return response
+    
+    if response.is_streamed:
+        source = response.response
+        response.response = compression.compress_stream(response.iter_encoded(), encoding)
+        # iter_encoded() não repassa o close(): sem isto um stream SSE comprimido nunca libera a vaga
+        if hasattr(source, 'close'):
+            response.call_on_close(source.close)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < current_app.config['COMPRESSION_MIN_SIZE']:
+            return response
+        entry = g.get('response_cache_entry')
+        cache = response_cache.get_cache()
+        if entry is not None and cache is not None:
+            # Resposta em cache: comprime uma vez e reaproveita nas próximas
+            response.set_data(cache.variant(entry, encoding, compression.compress))
+        else:
+            response.set_data(compression.compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    
+    # O corpo comprimido não é idêntico byte a byte ao original: o ETag vira fraco
+    etag, _ = response.get_etag()
+    if etag:
+        response.set_etag(etag, weak=True)
+    return response
+
+# Controle de admissão: rejeita cedo em vez de enfileirar até o timeout
+def admit_request():
+    """Aplica o limite por cliente (429) e o limite global de concorrência (503) antes da rota"""
+    cost_class = ROUTE_COST_CLASSES.get(request.endpoint)
+    if cost_class is None or request.environ.get(BATCH_SUBREQUEST_KEY):
+        # Sub-requisições de um batch já foram admitidas junto com ele
+        return None
+    cost = admission.COSTS[cost_class]
+    if request.endpoint == 'batch_route':
+        cost = batch_cost(cost)
+    client = request.headers.get('X-API-Key') or request.remote_addr
+    try:
+        admission.get_controller().admit(client, cost)
+    except admission.RateLimited as e:
+        response = jsonify({
+            'success': False,
+            'error': 'Muitas requisições',
+            'message': str(e),
+            'status': 429
+        })
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    except admission.Overloaded as e:
+        response = jsonify({
+            'success': False,
+            'error': 'Serviço sobrecarregado',
+            'message': str(e),
+            'status': 503
+        })
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 503
+    g.admitted = True
+    return None
+
+def release_admission(error=None):
+    """Libera a vaga de concorrência ao fim da requisição"""
+    if g.pop('admitted', False):
+        admission.get_controller().release()
 
 # Middleware para tratamento de erros
-@app.errorhandler(404)
 def not_found(error):
     return jsonify({
         'error': 'Recurso não encontrado',
@@ -131,7 +451,6 @@ def not_found(error):
         'status': 404
     }), 404
 
-@app.errorhandler(400)
 def bad_request(error):
     return jsonify({
         'error': 'Requisição inválida',
@@ -139,7 +458,6 @@ def bad_request(error):
         'status': 400
     }), 400
 
-@app.errorhandler(500)
 def internal_error(error):
     return jsonify({
         'error': 'Erro interno do servidor',
@@ -147,7 +465,6 @@ def internal_error(error):
         'status': 500
     }), 500
 
-@app.errorhandler(405)
 def method_not_allowed(error):
     return jsonify({
         'error': 'Método não permitido',
@@ -155,7 +472,6 @@ def method_not_allowed(error):
         'status': 405
     }), 405
 
-@app.errorhandler(409)
 def conflict(error):
     return jsonify({
         'error': 'Conflito',
@@ -163,7 +479,6 @@ def conflict(error):
         'status': 409
     }), 409
 
-@app.errorhandler(422)
 def unprocessable_entity(error):
     return jsonify({
         'error': 'Entidade não processável',
@@ -171,7 +486,6 @@ def unprocessable_entity(error):
         'status': 422
     }), 422
 
-@app.errorhandler(503)
 def service_unavailable(error):
     return jsonify({
         'error': 'Serviço indisponível',
@@ -182,10 +496,21 @@ def service_unavailable(error):
 # Função auxiliar para tratamento de erros de banco de dados
 def handle_database_error(e):
     """Trata erros de banco de dados e retorna a resposta apropriada"""
+    # Circuito aberto: o banco nem foi chamado, o cliente deve esperar antes de tentar de novo
+    if isinstance(e, CircuitOpenError):
+        response = jsonify({
+            'success': False,
+            'error': 'Serviço de banco de dados indisponível',
+            'message': 'O banco de dados está indisponível. Tente novamente mais tarde.',
+            'details': str(e)
+        })
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 503
+    
     error_message = str(e).lower()
     
     # Erros de conexão com banco de dados
-    if any(keyword in error_message for keyword in ['connection', 'timeout', 'refused', 'unreachable']):
+    if any(keyword in error_message for keyword in ['connection', 'conectar', 'timeout', 'refused', 'unreachable']):
         return jsonify({
             'success': False,
             'error': 'Serviço de banco de dados indisponível',
@@ -212,83 +537,26 @@ def handle_database_error(e):
         }), 500
 
 # Função auxiliar para validações
-def validate_imovel_data(data, is_update=False):
-    """Valida os dados do imóvel e retorna erros se houver"""
-    tipos_validos = ['casa', 'apartamento', 'terreno',"casa em condominio"]
-    
-    # Validar CEP se fornecido
-    if 'cep' in data:
-        cep = str(data['cep']).strip().replace('-', '').replace('.', '')
-        if not re.match(r'^\d{8}$', cep):
-            return {
-                'success': False,
-                'error': 'CEP inválido',
-                'message': 'CEP deve conter 8 dígitos numéricos (formato: 12345678 ou 12345-678)'
-            }, 422
-    
-    # Validar tipo se fornecido
-    if 'tipo' in data:
-        if str(data['tipo']).strip().lower() not in tipos_validos:
-            return {
-                'success': False,
-                'error': 'Tipo de imóvel inválido',
-                'message': f'Tipo deve ser um dos seguintes: {", ".join(tipos_validos)}'
-            }, 422
-    
-    # Validar data de aquisição se fornecida
-    if 'data_aquisicao' in data:
-        try:
-            data_aquisicao = str(data['data_aquisicao']).strip()
-            datetime.strptime(data_aquisicao, '%Y-%m-%d')
-        except ValueError:
-            return {
-                'success': False,
-                'error': 'Data de aquisição inválida',
-                'message': 'Data deve estar no formato YYYY-MM-DD (ex: 2024-01-15)'
-            }, 422
-    
-    # Validar valor se fornecido
-    if 'valor' in data:
-        try:
-            valor = float(data['valor'])
-            if valor < 0:
-                return {
-                    'success': False,
-                    'error': 'Valor inválido',
-                    'message': 'O valor deve ser um número positivo'
-                }, 422
-        except (ValueError, TypeError):
-            return {
-                'success': False,
-                'error': 'Valor inválido',
-                'message': 'O valor deve ser um número válido'
-            }, 422
-    
-    # Validar campos vazios para operações de atualização
-    if is_update:
-        empty_text_fields = ['logradouro', 'tipo_logradouro', 'bairro', 'cidade']
-        for field in empty_text_fields:
-            if field in data and not str(data[field]).strip():
-                return {
-                    'success': False,
-                    'error': 'Campo vazio',
-                    'message': f'{field.replace("_", " ").title()} não pode estar vazio'
-                }, 422
-    
-    return None, None
+def validation_error_response(errors, links):
+    """Resposta 422 com todos os erros de validação no formato {field, code, message}"""
+    return jsonify({
+        'success': False,
+        'error': 'Dados inválidos',
+        'message': '; '.join(error['message'] for error in errors),
+        'errors': errors,
+        'link': links
+    }), 422
 
 # Rota raiz para informações da API
-@app.route('/', methods=['GET'])
 def api_info():
     """Informações básicas da API com hypermedia para descoberta"""
     try:
-        # Get basic stats for the API overview
-        imoveis = listar_todos_imoveis()
-        total_imoveis = len(imoveis)
+        # Get basic stats for the API overview (contagens mantidas pelas escritas)
+        total_imoveis = contar_imoveis()
         
         # Get unique types and cities for search hints
-        tipos_unicos = list(set(imovel['tipo'] for imovel in imoveis if imovel.get('tipo')))
-        cidades_unicas = list(set(imovel['cidade'] for imovel in imoveis if imovel.get('cidade')))
+        tipos_unicos = [tipo for tipo in listar_contagens('tipo') if tipo]
+        cidades_unicas = list(listar_contagens('cidade'))
         
         return jsonify({
             'api': 'API RESTful de Imóveis - Nível 3 (HATEOAS)',
@@ -305,7 +573,7 @@ def api_info():
             'statistics': {
                 'total_imoveis': total_imoveis,
                 'tipos_disponiveis': sorted(tipos_unicos),
-                'cidades_disponiveis': sorted(cidades_unicas[:10])  # Limit to first 10 for brevity
+                'cidades_disponiveis': sorted(cidades_unicas)[:10]  # Limit to first 10 for brevity
             },
             'media_types': {
                 'accepted': ['application/json'],
@@ -331,22 +599,31 @@ def api_info():
         }), 200
 
 # 1. Listar todos os imóveis
-@app.route('/imoveis', methods=['GET'])
 def listar_todos_imoveis_route():
-    """Lista todos os imóveis com todos os seus atributos"""
+    """
+    Lista todos os imóveis com todos os seus atributos (ou só os de ?fields=)
+    
+    Com ?ids=1,2,3 devolve só esses imóveis, buscados em uma consulta.
+    """
     try:
-        imoveis = listar_todos_imoveis()
+        fields = requested_fields()
+        ids = parse_ids(request.args['ids'].split(',')) if 'ids' in request.args else None
+    except ValueError as e:
+        return invalid_parameter_response(e)
+    
+    try:
+        if ids is not None:
+            return imoveis_por_ids_response(ids, fields)
         
-        # Add HATEOAS links to each imovel
-        enhanced_imoveis = enhance_imoveis_collection_with_links(imoveis)
+        imoveis = listar_todos_imoveis(tx=batch_transaction(), campos=data_columns(fields))
         
-        # Use OrderedDict to control response structure
+        # Use OrderedDict to control response structure; rows and their links go straight to JSON
         response_data = OrderedDict([
             ('success', True),
-            ('message', f'{len(enhanced_imoveis)} imóveis encontrados'),
-            ('total', len(enhanced_imoveis)),
+            ('message', f'{len(imoveis)} imóveis encontrados'),
+            ('total', len(imoveis)),
             ('links', build_collection_links()),
-            ('data', enhanced_imoveis),
+            ('data', encode_imoveis_collection(imoveis, fields)),
         ])
         
         return jsonify(response_data), 200
@@ -363,11 +640,15 @@ def listar_todos_imoveis_route():
         return handle_database_error(e)
 
 # 2. Listar imóvel específico por ID
-@app.route('/imoveis/<int:imovel_id>', methods=['GET'])
 def obter_imovel_por_id_route(imovel_id):
     """Obtém um imóvel específico pelo seu ID"""
     try:
-        imovel = listar_imovel_por_id(imovel_id)
+        fields = requested_fields()
+    except ValueError as e:
+        return invalid_parameter_response(e)
+    
+    try:
+        imovel = listar_imovel_por_id(imovel_id, tx=batch_transaction(), campos=data_columns(fields))
         
         if imovel is None:
             return jsonify({
@@ -389,7 +670,7 @@ def obter_imovel_por_id_route(imovel_id):
             }), 404
             
         # Add HATEOAS links to the imovel
-        enhanced_imovel = enhance_imovel_with_links(imovel)
+        enhanced_imovel = enhance_imovel_with_links(imovel, fields)
         
         # Use OrderedDict to control response structure
         response_data = OrderedDict([
@@ -405,7 +686,6 @@ def obter_imovel_por_id_route(imovel_id):
         return handle_database_error(e)
 
 # 3. Adicionar novo imóvel
-@app.route('/imoveis', methods=['POST'])
 def criar_imovel_route():
     """Cria um novo imóvel"""
     try:
@@ -420,49 +700,19 @@ def criar_imovel_route():
             
         data = request.get_json()
         
-        # Validar campos obrigatórios
-        required_fields = ['logradouro', 'tipo_logradouro', 'bairro', 'cidade', 'cep', 'tipo', 'valor', 'data_aquisicao']
-        missing_fields = [field for field in required_fields if field not in data or data[field] is None]
+        # Campos obrigatórios, vazios e formatos: todos os erros de uma vez
+        imovel, errors = imovel_validator.validate(data)
+        if errors:
+            return validation_error_response(errors, build_collection_links())
         
-        if missing_fields:
-            return jsonify({
-                'success': False,
-                'error': 'Campos obrigatórios ausentes',
-                'message': f'Os seguintes campos são obrigatórios: {", ".join(missing_fields)}',
-                'required_fields': required_fields,
-                'link': build_collection_links()
-            }), 422
+        # Inserção e leitura do imóvel criado na mesma transação
+        with request_transaction() as tx:
+            # Inserir imóvel
+            novo_id = inserir_imovel(**imovel, tx=tx)
         
-        # Validar se os campos de texto não estão vazios
-        empty_fields = [field for field in required_fields[:-2] if not str(data.get(field, '')).strip()]
-        if empty_fields:
-            return jsonify({
-                'success': False,
-                'error': 'Campos vazios detectados',
-                'message': f'Os seguintes campos não podem estar vazios: {", ".join(empty_fields)}',
-                'link': build_collection_links()
-            }), 422
+            # Buscar o imóvel criado para retornar
+            imovel_criado = listar_imovel_por_id(novo_id, tx=tx)
         
-        # Usar função de validação centralizada
-        error_response, status_code = validate_imovel_data(data)
-        if error_response:
-            error_response['link'] = build_collection_links()
-            return jsonify(error_response), status_code
-        
-        # Inserir imóvel
-        novo_id = inserir_imovel(
-            logradouro=str(data['logradouro']).strip(),
-            tipo_logradouro=str(data['tipo_logradouro']).strip(),
-            bairro=str(data['bairro']).strip(),
-            cidade=str(data['cidade']).strip(),
-            cep=str(data['cep']).strip(),
-            tipo=str(data['tipo']).strip().lower(),
-            valor=float(data['valor']),
-            data_aquisicao=str(data['data_aquisicao']).strip()
-        )
-        
-        # Buscar o imóvel criado para retornar
-        imovel_criado = listar_imovel_por_id(novo_id)
         enhanced_imovel = enhance_imovel_with_links(imovel_criado)
         
         # Build links for the created resource
@@ -508,31 +758,9 @@ def criar_imovel_route():
         return handle_database_error(e)
 
 # 4. Atualizar imóvel existente
-@app.route('/imoveis/<int:imovel_id>', methods=['PUT'])
 def atualizar_imovel_route(imovel_id):
     """Atualiza um imóvel existente"""
     try:
-        # Verificar se o imóvel existe
-        imovel_existe = listar_imovel_por_id(imovel_id)
-        if imovel_existe is None:
-            return jsonify({
-                'success': False,
-                'error': 'Imóvel não encontrado',
-                'message': f'Nenhum imóvel encontrado com ID {imovel_id}',
-                'link': {
-                    'collection': {
-                        'href': url_for('listar_todos_imoveis_route', _external=True),
-                        'method': 'GET',
-                        'title': 'Listar todos os imóveis'
-                    },
-                    'create': {
-                        'href': url_for('criar_imovel_route', _external=True),
-                        'method': 'POST',
-                        'title': 'Criar novo imóvel'
-                    }
-                }
-            }), 404
-            
         # Validar se o request contém JSON
         if not request.is_json:
             return jsonify({
@@ -544,31 +772,10 @@ def atualizar_imovel_route(imovel_id):
             
         data = request.get_json()
         
-        # Usar função de validação centralizada
-        error_response, status_code = validate_imovel_data(data, is_update=True)
-        if error_response:
-            error_response['link'] = build_imovel_links(imovel_id)
-            return jsonify(error_response), status_code
-        
-        # Preparar argumentos para atualização (apenas campos fornecidos)
-        update_args = {}
-        
-        if 'logradouro' in data:
-            update_args['logradouro'] = str(data['logradouro']).strip()
-        if 'tipo_logradouro' in data:
-            update_args['tipo_logradouro'] = str(data['tipo_logradouro']).strip()
-        if 'bairro' in data:
-            update_args['bairro'] = str(data['bairro']).strip()
-        if 'cidade' in data:
-            update_args['cidade'] = str(data['cidade']).strip()
-        if 'cep' in data:
-            update_args['cep'] = str(data['cep']).strip()
-        if 'tipo' in data:
-            update_args['tipo'] = str(data['tipo']).strip().lower()
-        if 'data_aquisicao' in data:
-            update_args['data_aquisicao'] = str(data['data_aquisicao']).strip()
-        if 'valor' in data:
-            update_args['valor'] = float(data['valor'])
+        # Apenas os campos fornecidos são validados e atualizados
+        update_args, errors = imovel_validator.validate(data, partial=True)
+        if errors:
+            return validation_error_response(errors, build_imovel_links(imovel_id))
         
         # Verificar se há campos para atualizar
         if not update_args:
@@ -579,19 +786,27 @@ def atualizar_imovel_route(imovel_id):
                 'link': build_imovel_links(imovel_id)
             }), 422
         
-        # Atualizar imóvel
-        sucesso = atualizar_imovel(imovel_id, **update_args)
-        
-        if not sucesso:
+        # Atualizar e reler o imóvel em uma única transação; None = não existe
+        imovel_atualizado = atualizar_imovel_e_retornar(imovel_id, tx=batch_transaction(), **update_args)
+        if imovel_atualizado is None:
             return jsonify({
                 'success': False,
-                'error': 'Falha na atualização',
-                'message': 'Não foi possível atualizar o imóvel',
-                'link': build_imovel_links(imovel_id)
-            }), 500
+                'error': 'Imóvel não encontrado',
+                'message': f'Nenhum imóvel encontrado com ID {imovel_id}',
+                'link': {
+                    'collection': {
+                        'href': url_for('listar_todos_imoveis_route', _external=True),
+                        'method': 'GET',
+                        'title': 'Listar todos os imóveis'
+                    },
+                    'create': {
+                        'href': url_for('criar_imovel_route', _external=True),
+                        'method': 'POST',
+                        'title': 'Criar novo imóvel'
+                    }
+                }
+            }), 404
         
-        # Buscar imóvel atualizado
-        imovel_atualizado = listar_imovel_por_id(imovel_id)
         enhanced_imovel = enhance_imovel_with_links(imovel_atualizado)
         
         # Build links showing available actions after update
@@ -637,13 +852,12 @@ def atualizar_imovel_route(imovel_id):
         return handle_database_error(e)
 
 # 5. Remover imóvel
-@app.route('/imoveis/<int:imovel_id>', methods=['DELETE'])
 def deletar_imovel_route(imovel_id):
     """Remove um imóvel existente"""
     try:
-        # Verificar se o imóvel existe antes de tentar deletar
-        imovel_existe = listar_imovel_por_id(imovel_id)
-        if imovel_existe is None:
+        # Remover e obter os dados removidos em uma única transação; None = não existe
+        imovel_removido = deletar_imovel_e_retornar(imovel_id, tx=batch_transaction())
+        if imovel_removido is None:
             return jsonify({
                 'success': False,
                 'error': 'Imóvel não encontrado',
@@ -662,17 +876,6 @@ def deletar_imovel_route(imovel_id):
                 }
             }), 404
         
-        # Deletar imóvel
-        sucesso = deletar_imovel(imovel_id)
-        
-        if not sucesso:
-            return jsonify({
-                'success': False,
-                'error': 'Falha na remoção',
-                'message': 'Não foi possível remover o imóvel',
-                'link': build_imovel_links(imovel_id)
-            }), 500
-        
         # Build links for after deletion
         deletion_links = {
             'collection': {
@@ -695,8 +898,8 @@ def deletar_imovel_route(imovel_id):
         # Use OrderedDict for the response
         response_data = OrderedDict([
             ('success', True),
-            ('message', f'Imóvel com ID {imovel_id} removido com sucesso',
-            'data', imovel_existe),
+            ('message', f'Imóvel com ID {imovel_id} removido com sucesso'),
+            ('data', imovel_removido),
             ('link', deletion_links)
         ])
         
@@ -706,14 +909,15 @@ def deletar_imovel_route(imovel_id):
         return handle_database_error(e)
 
 # 6. Listar imóveis por tipo
-@app.route('/imoveis/tipo/<tipo>', methods=['GET'])
 def listar_imoveis_por_tipo_route(tipo):
     """Lista todos os imóveis de um tipo específico"""
     try:
-        imoveis = listar_imoveis_por_tipo(tipo)
-        
-        # Add HATEOAS links to each imovel
-        enhanced_imoveis = enhance_imoveis_collection_with_links(imoveis)
+        fields = requested_fields()
+    except ValueError as e:
+        return invalid_parameter_response(e)
+    
+    try:
+        imoveis = listar_imoveis_por_tipo(tipo, tx=batch_transaction(), campos=data_columns(fields))
         
         # Build specific links for this filtered collection
         filter_links = {
@@ -743,12 +947,12 @@ def listar_imoveis_por_tipo_route(tipo):
         # Use OrderedDict to control response structure
         response_data = OrderedDict([
             ('success', True),
-            ('message', f'{len(enhanced_imoveis)} imóveis do tipo "{tipo}" encontrados'),
-            ('total', len(enhanced_imoveis)),
+            ('message', f'{len(imoveis)} imóveis do tipo "{tipo}" encontrados'),
+            ('total', len(imoveis)),
             ('filtro', {'tipo': tipo}),
             ('link', filter_links),
 
-            ('data', enhanced_imoveis),
+            ('data', encode_imoveis_collection(imoveis, fields)),
         ])
         
         return jsonify(response_data), 200
@@ -757,14 +961,15 @@ def listar_imoveis_por_tipo_route(tipo):
         return handle_database_error(e)
 
 # 7. Listar imóveis por cidade
-@app.route('/imoveis/cidade/<cidade>', methods=['GET'])
 def listar_imoveis_por_cidade_route(cidade):
     """Lista todos os imóveis de uma cidade específica"""
     try:
-        imoveis = listar_imoveis_por_cidade(cidade)
-        
-        # Add HATEOAS links to each imovel
-        enhanced_imoveis = enhance_imoveis_collection_with_links(imoveis)
+        fields = requested_fields()
+    except ValueError as e:
+        return invalid_parameter_response(e)
+    
+    try:
+        imoveis = listar_imoveis_por_cidade(cidade, tx=batch_transaction(), campos=data_columns(fields))
         
         # Build specific links for this filtered collection
         filter_links = {
@@ -794,11 +999,11 @@ def listar_imoveis_por_cidade_route(cidade):
         # Use OrderedDict to control response structure
         response_data = OrderedDict([
             ('success', True),
-            ('message', f'{len(enhanced_imoveis)} imóveis na cidade "{cidade}" encontrados'),
-            ('total', len(enhanced_imoveis)),
+            ('message', f'{len(imoveis)} imóveis na cidade "{cidade}" encontrados'),
+            ('total', len(imoveis)),
             ('filtro', {'cidade': cidade}),
             ('link', filter_links),
-            ('data', enhanced_imoveis),
+            ('data', encode_imoveis_collection(imoveis, fields)),
         ])
         
         return jsonify(response_data), 200
@@ -806,13 +1011,495 @@ def listar_imoveis_por_cidade_route(cidade):
     except Exception as e:
         return handle_database_error(e)
 
+# 8. Acompanhar mudanças nos imóveis (Server-Sent Events)
+def stream_imoveis_route():
+    """
+    Envia os eventos insert, update, delete e bulk_insert conforme acontecem
+    
+    Um cliente que reconecta com o header Last-Event-ID recebe os eventos que
+    perdeu, enquanto ainda estiverem no buffer; caso contrário recebe um
+    evento reset e deve recarregar /imoveis.
+    
+    Sob o server.py a conexão sai do pool de threads de requisições
+    (environ['server.detach']) e é encerrada quando o worker para; o cliente
+    reconecta sozinho. Acima de EVENTS_MAX_SUBSCRIBERS conexões o worker
+    responde 503.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        stream = events.broker.stream(last_event_id, heartbeat=current_app.config['EVENTS_HEARTBEAT'])
+    except events.StreamUnavailableError as e:
+        return stream_unavailable_response(str(e))
+    
+    detach = request.environ.get('server.detach')
+    if detach is not None and not detach(on_stop=events.close):
+        stream.close()
+        return stream_unavailable_response('Sem threads livres para conexões de eventos')
+    
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def stream_unavailable_response(message):
+    """503 para uma conexão de eventos recusada; o EventSource tenta de novo depois do Retry-After"""
+    response = jsonify({
+        'success': False,
+        'error': 'Serviço indisponível',
+        'message': message,
+        'link': build_collection_links()
+    })
+    response.headers['Retry-After'] = '5'
+    return response, 503
+
+# 9. Sincronização incremental
+def listar_alteracoes_route():
+    """
+    Devolve os imóveis alterados e os ids removidos desde o token `since`
+    
+    Sem `since`, devolve o catálogo inteiro, paginado. O cliente guarda o
+    `next` da resposta e o usa como `since` na próxima sincronização. Aceita
+    ?fields= para os imóveis alterados.
+    """
+    since = request.args.get('since') or None
+    try:
+        fields = requested_fields()
+    except ValueError as e:
+        return invalid_parameter_response(e)
+    try:
+        limite = int(request.args.get('limit', 500))
+        if not 1 <= limite <= 5000:
+            raise ValueError
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'Parâmetro inválido',
+            'message': 'limit deve ser um inteiro entre 1 e 5000',
+            'link': build_collection_links()
+        }), 400
+    
+    try:
+        alteracoes = listar_alteracoes(since, limite, campos=data_columns(fields))
+    except TokenExpiradoError as e:
+        return jsonify({
+            'success': False,
+            'error': 'Token expirado',
+            'message': str(e),
+            'link': {
+                'full_sync': {
+                    'href': url_for('listar_alteracoes_route', _external=True),
+                    'method': 'GET',
+                    'title': 'Sincronização completa'
+                }
+            }
+        }), 410
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': 'Token inválido',
+            'message': str(e),
+            'link': build_collection_links()
+        }), 400
+    except Exception as e:
+        return handle_database_error(e)
+    
+    links = {
+        'self': {
+            'href': request.url,
+            'method': 'GET',
+            'title': 'Esta página de alterações'
+        },
+        'next': {
+            'href': url_for('listar_alteracoes_route', since=alteracoes['token'], limit=limite,
+                            fields=request.args.get('fields'), _external=True),
+            'method': 'GET',
+            'title': 'Próxima página' if alteracoes['tem_mais'] else 'Próxima sincronização'
+        },
+        'collection': {
+            'href': url_for('listar_todos_imoveis_route', _external=True),
+            'method': 'GET',
+            'title': 'Listar todos os imóveis'
+        }
+    }
+    
+    response_data = OrderedDict([
+        ('success', True),
+        ('message', f"{len(alteracoes['alterados'])} imóveis alterados, {len(alteracoes['removidos'])} removidos"),
+        ('next', alteracoes['token']),
+        ('has_more', alteracoes['tem_mais']),
+        ('links', links),
+        ('data', OrderedDict([
+            ('changed', enhance_imoveis_collection_with_links(alteracoes['alterados'], fields)),
+            ('deleted', alteracoes['removidos']),
+        ])),
+    ])
+    
+    return jsonify(response_data), 200
+
+# 10. Contagens por tipo e cidade
+def contagens_imoveis_route():
+    """Quantidade de imóveis no total, por tipo e por cidade, sem percorrer a tabela"""
+    try:
+        response_data = OrderedDict([
+            ('success', True),
+            ('total', contar_imoveis(tx=batch_transaction())),
+            ('por_tipo', listar_contagens('tipo', tx=batch_transaction())),
+            ('por_cidade', listar_contagens('cidade', tx=batch_transaction())),
+            ('link', build_collection_links()),
+        ])
+        
+        return jsonify(response_data), 200
+        
+    except Exception as e:
+        return handle_database_error(e)
+
+# 11. Importação em massa (CSV ou NDJSON)
+def importar_imoveis_route():
+    """
+    Importa imóveis de um CSV ou NDJSON enviado no corpo da requisição
+    
+    O corpo é lido em streaming e os registros são validados e inseridos em
+    lotes, então arquivos grandes não são carregados na memória. Os registros
+    rejeitados ficam disponíveis para download por 24 horas.
+    """
+    formato = importacao.FORMATOS.get(request.mimetype)
+    if formato is None:
+        return jsonify({
+            'success': False,
+            'error': 'Content-Type não suportado',
+            'message': f'Envie o arquivo como {" ou ".join(importacao.FORMATOS)}',
+            'link': build_collection_links()
+        }), 415
+    
+    try:
+        tamanho_lote = int(request.args.get('batch_size', importacao.TAMANHO_LOTE))
+        if not 1 <= tamanho_lote <= 5000:
+            raise ValueError
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'Parâmetro inválido',
+            'message': 'batch_size deve ser um inteiro entre 1 e 5000',
+            'link': build_collection_links()
+        }), 400
+    
+    leitor = importacao.ler_csv if formato == 'csv' else importacao.ler_ndjson
+    try:
+        resumo = importacao.importar_imoveis(leitor(request.stream), tamanho_lote)
+    except UnicodeDecodeError as e:
+        response = jsonify({
+            'success': False,
+            'error': 'Codificação inválida',
+            'message': 'O arquivo deve estar em UTF-8',
+            'link': build_collection_links()
+        })
+        return with_import_summary(response, e.resumo), 400
+    except Exception as e:
+        response, status = handle_database_error(e)
+        resumo = getattr(e, 'resumo', None)
+        if resumo is not None:
+            response = with_import_summary(response, resumo)
+        return response, status
+    
+    response_data = OrderedDict([
+        ('success', True),
+        ('message', f"{resumo['importados']} imóveis importados, {resumo['rejeitados']} rejeitados"),
+        ('data', import_summary(resumo)),
+        ('links', import_links(resumo)),
+    ])
+    
+    return jsonify(response_data), 200
+
+def import_summary(resumo):
+    """Contagens de uma importação, concluída ou interrompida"""
+    return OrderedDict([
+        ('total', resumo['total']),
+        ('imported', resumo['importados']),
+        ('rejected', resumo['rejeitados']),
+        ('batches', resumo['lotes']),
+    ])
+
+def import_links(resumo):
+    links = {
+        'collection': {
+            'href': url_for('listar_todos_imoveis_route', _external=True),
+            'method': 'GET',
+            'title': 'Listar todos os imóveis'
+        }
+    }
+    if resumo['rejeitados']:
+        links['rejects'] = {
+            'href': url_for('rejeitados_importacao_route', importacao_id=resumo['id'], _external=True),
+            'method': 'GET',
+            'title': 'Baixar os registros rejeitados (NDJSON)'
+        }
+    return links
+
+def with_import_summary(response, resumo):
+    """
+    Acrescenta a uma resposta de erro o que a importação gravou antes de falhar
+    
+    Os lotes confirmados continuam no banco: o cliente precisa saber quantos
+    foram e onde baixar os rejeitados até ali para retomar do ponto certo.
+    """
+    body = response.get_json()
+    body['data'] = import_summary(resumo)
+    body['links'] = import_links(resumo)
+    response.set_data(current_app.json.dumps(body))
+    return response
+
+def rejeitados_importacao_route(importacao_id):
+    """Arquivo NDJSON com os registros rejeitados de uma importação"""
+    caminho = importacao.caminho_rejeitados(importacao_id)
+    if caminho is None or not os.path.exists(caminho):
+        return jsonify({
+            'success': False,
+            'error': 'Arquivo não encontrado',
+            'message': 'Importação sem rejeitados ou arquivo já expirado',
+            'link': build_collection_links()
+        }), 404
+    return send_file(caminho, mimetype='application/x-ndjson', as_attachment=True,
+                      download_name=f'rejeitados-{importacao_id}.ndjson')
+
+# 12. Busca de vários imóveis por id (listas longas demais para ?ids=)
+def buscar_imoveis_por_ids_route():
+    """
+    Busca os imóveis de {"ids": [...]} em uma única consulta
+    
+    Mesma resposta de GET /imoveis?ids=; aceita ?fields=.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('ids'), list):
+        return jsonify({
+            'success': False,
+            'error': 'Dados inválidos',
+            'message': 'Envie um JSON {"ids": [1, 2, 3]}',
+            'link': build_collection_links()
+        }), 400
+    try:
+        fields = requested_fields()
+        ids = parse_ids(data['ids'])
+    except ValueError as e:
+        return invalid_parameter_response(e)
+    
+    try:
+        return imoveis_por_ids_response(ids, fields)
+    except Exception as e:
+        return handle_database_error(e)
+
+# 13. Requisições em lote
+# Rotas que podem ser chamadas dentro de um batch (todas aceitam a transação do batch atômico)
+BATCHABLE_ENDPOINTS = {
+    'listar_todos_imoveis_route',
+    'buscar_imoveis_por_ids_route',
+    'obter_imovel_por_id_route',
+    'criar_imovel_route',
+    'atualizar_imovel_route',
+    'deletar_imovel_route',
+    'listar_imoveis_por_tipo_route',
+    'listar_imoveis_por_cidade_route',
+    'contagens_imoveis_route',
+}
+MAX_BATCH_REQUESTS = 100
+# Headers da requisição do batch que não passam para as sub-requisições
+# (sem Accept-Encoding: a compressão é feita uma vez, na resposta do batch)
+BATCH_DROPPED_HEADERS = {'content-type', 'content-length', 'accept-encoding'}
+BATCH_RESPONSE_DROPPED_HEADERS = {'content-length', 'set-cookie'}
+
+class BatchAborted(Exception):
+    """Uma sub-requisição de um batch atômico falhou; a transação é desfeita"""
+
+    def __init__(self, index):
+        self.index = index
+        super().__init__(f'A sub-requisição {index} falhou')
+
+def parse_batch(data):
+    """
+    Valida o corpo de POST /batch e monta o environ WSGI de cada sub-requisição
+    
+    Returns:
+        tuple: (lista de environs, atomic)
+        
+    Raises:
+        ValueError: Corpo ou sub-requisição inválidos
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('requests'), list):
+        raise ValueError('Envie um JSON {"requests": [{"method": "GET", "path": "/imoveis/1"}, ...]}')
+    subrequests = data['requests']
+    if not 1 <= len(subrequests) <= MAX_BATCH_REQUESTS:
+        raise ValueError(f'Envie de 1 a {MAX_BATCH_REQUESTS} sub-requisições')
+    atomic = data.get('atomic', False)
+    if not isinstance(atomic, bool):
+        raise ValueError('atomic deve ser true ou false')
+    
+    adapter = current_app.url_map.bind_to_environ(request.environ)
+    headers = [(k, v) for k, v in request.headers.items() if k.lower() not in BATCH_DROPPED_HEADERS]
+    environs = []
+    for index, sub in enumerate(subrequests):
+        if not isinstance(sub, dict) or not isinstance(sub.get('path'), str) or not sub['path'].startswith('/'):
+            raise ValueError(f'Sub-requisição {index}: informe method e path (começando com /)')
+        method = str(sub.get('method', 'GET')).upper()
+        path = sub['path']
+        try:
+            endpoint, _ = adapter.match(path.split('?', 1)[0], method)
+        except HTTPException:
+            endpoint = None
+        if endpoint not in BATCHABLE_ENDPOINTS:
+            raise ValueError(f'Sub-requisição {index}: {method} {path} não pode ser usada em um batch')
+        sub_headers = sub.get('headers') or {}
+        if not isinstance(sub_headers, dict):
+            raise ValueError(f'Sub-requisição {index}: headers deve ser um objeto')
+        
+        builder = EnvironBuilder(
+            path=path,
+            method=method,
+            base_url=request.root_url,
+            headers=headers + [(str(k), str(v)) for k, v in sub_headers.items()],
+            json=sub['body'] if 'body' in sub else None,
+            environ_base={'REMOTE_ADDR': request.remote_addr}
+        )
+        try:
+            environ = builder.get_environ()
+        finally:
+            builder.close()
+        environ[BATCH_SUBREQUEST_KEY] = endpoint
+        environs.append(environ)
+    return environs, atomic
+
+def batch_cost(minimum):
+    """
+    Custo de admissão de POST /batch: a soma dos custos das sub-requisições, no mínimo `minimum`
+    
+    O batch validado fica em g.batch_request, e a rota não o valida de novo.
+    """
+    try:
+        g.batch_request = parse_batch(request.get_json(silent=True))
+    except ValueError:
+        # A rota responde 400; o batch inválido paga só o mínimo
+        return minimum
+    environs, _ = g.batch_request
+    return max(minimum, sum(admission.COSTS[ROUTE_COST_CLASSES[environ[BATCH_SUBREQUEST_KEY]]]
+                            for environ in environs))
+
+def dispatch_subrequest(app, environ):
+    """
+    Executa uma sub-requisição pelo próprio app, sem passar pela rede
+    
+    Returns:
+        tuple: (resultado {status, headers, body}, cookies definidos pela resposta)
+    """
+    def run():
+        # Contexto de aplicação próprio: g não é compartilhado com o batch nem com as outras
+        with app.app_context(), app.request_context(environ):
+            try:
+                response = app.full_dispatch_request()
+            except Exception as e:
+                response = app.make_response(app.handle_exception(e))
+            body = response.get_json(silent=True) if response.is_json else response.get_data(as_text=True)
+            result = OrderedDict([
+                ('status', response.status_code),
+                ('headers', {k: v for k, v in response.headers.items()
+                             if k.lower() not in BATCH_RESPONSE_DROPPED_HEADERS}),
+                ('body', body),
+            ])
+            return result, response.headers.getlist('Set-Cookie')
+    # As variáveis de contexto da sessão de réplicas (replication) também ficam isoladas
+    return contextvars.copy_context().run(run)
+
+def batch_groups(environs):
+    """Agrupa leituras (GET) consecutivas, que podem rodar em paralelo; cada escrita fica sozinha"""
+    groups = []
+    for environ in environs:
+        if environ['REQUEST_METHOD'] == 'GET' and groups and groups[-1][0]['REQUEST_METHOD'] == 'GET':
+            groups[-1].append(environ)
+        else:
+            groups.append([environ])
+    return groups
+
+def batch_route():
+    """
+    Executa várias operações da API em uma única requisição
+    
+    Corpo: {"requests": [{"method": "GET", "path": "/imoveis/1", "body": {...},
+    "headers": {...}}, ...], "atomic": false}. Sem atomic, as sub-requisições
+    rodam na ordem, com leituras seguidas em paralelo, e a falha de uma não
+    afeta as outras. Com atomic, todas rodam em ordem em uma única transação,
+    desfeita se alguma responder com erro.
+    """
+    try:
+        environs, atomic = g.pop('batch_request', None) or parse_batch(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': 'Dados inválidos',
+            'message': str(e),
+            'link': build_collection_links()
+        }), 400
+    
+    app = current_app._get_current_object()
+    results = []
+    cookies = []
+    
+    def collect(outcome):
+        result, set_cookies = outcome
+        results.append(result)
+        cookies.extend(set_cookies)
+    
+    if atomic:
+        try:
+            with db.transaction() as tx:
+                for index, environ in enumerate(environs):
+                    environ[BATCH_TX_KEY] = tx
+                    collect(dispatch_subrequest(app, environ))
+                    if results[-1]['status'] >= 400:
+                        raise BatchAborted(index)
+        except BatchAborted as e:
+            return jsonify(OrderedDict([
+                ('success', False),
+                ('error', 'Batch desfeito'),
+                ('message', f'{e}; nenhuma alteração do batch foi aplicada'),
+                ('atomic', True),
+                ('failed', e.index),
+                ('results', results),
+            ])), 409
+        except Exception as e:
+            return handle_database_error(e)
+    else:
+        workers = current_app.config['BATCH_READ_WORKERS']
+        controller = admission.get_controller()
+        for group in batch_groups(environs):
+            # Cada thread além da do batch ocupa uma vaga de concorrência; sem vagas livres, o grupo
+            # roda na vaga do próprio batch
+            extra = controller.borrow(min(workers, len(group)) - 1) if len(group) > 1 and workers > 1 else 0
+            try:
+                if not extra:
+                    for environ in group:
+                        collect(dispatch_subrequest(app, environ))
+                    continue
+                with ThreadPoolExecutor(max_workers=extra + 1) as executor:
+                    for outcome in executor.map(lambda environ: dispatch_subrequest(app, environ), group):
+                        collect(outcome)
+            finally:
+                if extra:
+                    controller.release(extra)
+    
+    response = jsonify(OrderedDict([
+        ('success', True),
+        ('message', f'{len(results)} operações executadas'),
+        ('atomic', atomic),
+        ('results', results),
+    ]))
+    if cookies:
+        # Ex.: o cookie da última escrita, para o cliente continuar lendo o que escreveu
+        response.headers.add('Set-Cookie', cookies[-1])
+    return response, 200
+
 # Rota para verificar health da API
-@app.route('/health', methods=['GET'])
 def health_check():
     """Endpoint para verificar se a API está funcionando"""
     try:
         # Tenta fazer uma consulta simples no banco
-        imoveis = listar_todos_imoveis()
+        total_imoveis = contar_imoveis()
         
         health_links = {
             'self': {
@@ -832,14 +1519,32 @@ def health_check():
             }
         }
         
-        return jsonify({
+        health = {
             'status': 'healthy',
             'message': 'API funcionando corretamente',
             'database': 'connected',
-            'total_imoveis': len(imoveis),
+            'total_imoveis': total_imoveis,
             'timestamp': datetime.now().isoformat(),
             'link': health_links
-        }), 200
+        }
+        
+        health['circuit_breaker'] = db.get_circuit_breaker().status()
+        health['events'] = events.broker.status()
+        health['cache'] = shared_cache.get_cache().status()
+        health['admission'] = admission.get_controller().status()
+        health['coalescing'] = singleflight.group.status()
+        health['swr_cache'] = swr_cache.get_cache().status()
+        health['json_backend'] = current_app.json.backend.name
+        if response_cache.get_cache() is not None:
+            health['response_cache'] = response_cache.get_cache().status()
+        snap = snapshot.get_snapshot()
+        if snap is not None:
+            health['snapshot'] = snap.status()
+        router = db.get_replica_router()
+        if router is not None:
+            health['replicas'] = router.status()
+        
+        return jsonify(health), 200
     except Exception as e:
         error_links = {
             'self': {
@@ -854,13 +1559,236 @@ def health_check():
             }
         }
         
-        return jsonify({
+        response = jsonify({
             'status': 'unhealthy',
             'message': 'Problemas na API',
             'error': str(e),
+            'circuit_breaker': db.get_circuit_breaker().status(),
             'timestamp': datetime.now().isoformat(),
             'link': error_links
-        }), 503
+        })
+        if isinstance(e, CircuitOpenError):
+            response.headers['Retry-After'] = str(e.retry_after)
+        return response, 503
+
+# Fábrica da aplicação
+ROUTES = [
+    ('/', api_info, ['GET']),
+    ('/imoveis', listar_todos_imoveis_route, ['GET']),
+    ('/imoveis/lookup', buscar_imoveis_por_ids_route, ['POST']),
+    ('/imoveis/<int:imovel_id>', obter_imovel_por_id_route, ['GET']),
+    ('/imoveis', criar_imovel_route, ['POST']),
+    ('/imoveis/<int:imovel_id>', atualizar_imovel_route, ['PUT']),
+    ('/imoveis/<int:imovel_id>', deletar_imovel_route, ['DELETE']),
+    ('/imoveis/tipo/<tipo>', listar_imoveis_por_tipo_route, ['GET']),
+    ('/imoveis/cidade/<cidade>', listar_imoveis_por_cidade_route, ['GET']),
+    ('/imoveis/stream', stream_imoveis_route, ['GET']),
+    ('/imoveis/changes', listar_alteracoes_route, ['GET']),
+    ('/imoveis/contagens', contagens_imoveis_route, ['GET']),
+    ('/imoveis/import', importar_imoveis_route, ['POST']),
+    ('/imoveis/import/<importacao_id>/rejeitados', rejeitados_importacao_route, ['GET']),
+    ('/batch', batch_route, ['POST']),
+    ('/health', health_check, ['GET']),
+]
+
+# Classe de custo de cada rota no controle de admissão (admission.COSTS).
+# Rotas fora daqui não passam pelo controle: /health precisa responder
+# mesmo sob carga e /imoveis/stream não usa o banco.
+ROUTE_COST_CLASSES = {
+    'api_info': 'lookup',
+    'listar_todos_imoveis_route': 'listing',
+    'buscar_imoveis_por_ids_route': 'listing',
+    'obter_imovel_por_id_route': 'lookup',
+    'criar_imovel_route': 'write',
+    'atualizar_imovel_route': 'write',
+    'deletar_imovel_route': 'write',
+    'listar_imoveis_por_tipo_route': 'listing',
+    'listar_imoveis_por_cidade_route': 'listing',
+    'listar_alteracoes_route': 'listing',
+    'contagens_imoveis_route': 'lookup',
+    'importar_imoveis_route': 'bulk',
+    'rejeitados_importacao_route': 'lookup',
+    'batch_route': 'bulk',
+}
+
+ERROR_HANDLERS = {
+    400: bad_request,
+    404: not_found,
+    405: method_not_allowed,
+    409: conflict,
+    422: unprocessable_entity,
+    500: internal_error,
+    503: service_unavailable,
+}
+
+def default_max_concurrent(pool_size):
+    """
+    Limite de requisições simultâneas quando MAX_CONCURRENT_REQUESTS não é dado
+    
+    Sob o server.py, o número de threads por worker (SERVER_THREADS): um
+    limite menor recusaria com 503 requisições para as quais há thread livre,
+    inclusive as que não usam o banco (snapshot, cache). Fora dele, o tamanho
+    do pool de conexões: mais requisições simultâneas só esperariam por uma
+    conexão.
+    """
+    threads = os.getenv('SERVER_THREADS')
+    return int(threads) if threads else pool_size
+
+def create_app(config=None):
+    """
+    Cria e configura a aplicação Flask
+    
+    A configuração do banco é lida e validada uma única vez aqui; nenhuma
+    conexão é aberta, a menos que WARM_POOL esteja ligado.
+    
+    Args:
+        config (dict, optional): Configurações da aplicação. Além das chaves do Flask:
+            DATABASE (dict): Configuração do banco no formato de DatabaseConfig.load()
+                (default: lida das variáveis de ambiente)
+            JSON_BACKEND (str): Serializador das respostas: 'stdlib', 'orjson' ou 'auto'
+                (orjson se instalado) (default: env JSON_BACKEND ou 'auto')
+            JSON_PRETTY (bool): Respostas indentadas; sem isso só com ?pretty=1
+                (default: env JSON_PRETTY=1 ou False)
+            WARM_POOL (bool): Abre as conexões do pool na inicialização (default: False)
+            EVENTS_BUFFER_SIZE (int): Eventos guardados para clientes de /imoveis/stream
+                que reconectam (default: 1000)
+            EVENTS_HEARTBEAT (float): Segundos entre heartbeats de /imoveis/stream (default: 15)
+            EVENTS_BACKEND (str): 'sqlite' para que cada cliente de /imoveis/stream receba as
+                escritas de todos os workers do host, 'memory' só as do próprio worker
+                (default: env EVENTS_BACKEND ou 'memory'; o server.py com mais de um worker
+                usa 'sqlite')
+            EVENTS_PATH (str): Arquivo do log de eventos (default: env EVENTS_PATH ou o
+                diretório do cache compartilhado)
+            EVENTS_MAX_SUBSCRIBERS (int): Conexões de /imoveis/stream por processo
+                (default: env EVENTS_MAX_SUBSCRIBERS ou 1000)
+            CACHE_BACKEND (str): 'sqlite' para um cache de leituras compartilhado entre os
+                workers do host, 'none' para desligar (default: env CACHE_BACKEND ou 'none')
+            CACHE_PATH (str): Arquivo do cache (default: env CACHE_PATH ou /dev/shm)
+            CACHE_TTL (float): Segundos que uma leitura fica no cache (default: env CACHE_TTL ou 30)
+            SNAPSHOT_PATH (str): Snapshot gerado por snapshot.py; as leituras de imóveis passam a
+                vir dele em vez do banco (default: env SNAPSHOT_PATH ou desligado)
+            SWR_FRESH (float): Segundos em que uma listagem por tipo/cidade é servida sem
+                revalidar; 0 desliga o cache (default: env SWR_FRESH ou 0)
+            SWR_STALE (float): Segundos a mais em que ela ainda é servida na hora enquanto é
+                atualizada em segundo plano (default: env SWR_STALE ou 60)
+            SWR_MAX_ENTRIES (int): Listagens guardadas por processo (default: 1000)
+            RESPONSE_CACHE_TTL (float): Segundos que o corpo pronto de uma leitura (listagens,
+                imóvel por id, contagens, raiz) fica em memória; 0 desliga
+                (default: env RESPONSE_CACHE_TTL ou 0)
+            RESPONSE_CACHE_MAX_BYTES (int): Memória máxima do cache de respostas por processo
+                (default: 64 MB)
+            HTTP_MAX_AGE (int): max-age do Cache-Control dessas leituras para navegadores e
+                proxies; 0 envia no-cache, que exige revalidação pelo ETag
+                (default: env HTTP_MAX_AGE ou 0)
+            COMPRESSION (bool): Comprime as respostas de texto com gzip, deflate e, se
+                instalados, brotli e zstd, conforme o Accept-Encoding do cliente
+                (default: env COMPRESSION, ligado a menos que seja 0)
+            COMPRESSION_MIN_SIZE (int): Corpos menores que isto (bytes) vão sem compressão;
+                respostas em streaming são sempre comprimidas (default: 1024)
+            BATCH_READ_WORKERS (int): Leituras seguidas de um POST /batch executadas em
+                paralelo (default: 4)
+            RATE_LIMIT (float): Tokens por segundo de cada cliente (X-API-Key ou IP); uma listagem
+                custa 10, uma busca por id 1 (default: env RATE_LIMIT ou 0, desligado)
+            RATE_LIMIT_BURST (float): Tokens acumuláveis por cliente (default: env
+                RATE_LIMIT_BURST ou o maior entre 2 * RATE_LIMIT e 50)
+            MAX_CONCURRENT_REQUESTS (int): Requisições simultâneas por processo, 0 desliga
+                (default: env MAX_CONCURRENT_REQUESTS; senão as threads por worker do servidor,
+                em env SERVER_THREADS, que o server.py exporta a partir de --threads; senão o
+                tamanho do pool de conexões)
+            ADMISSION_QUEUE_TIMEOUT (float): Segundos que uma requisição espera por uma vaga
+                antes do 503 (default: 0.1)
+            
+    Returns:
+        Flask: Aplicação pronta para ser servida
+    """
+    app = Flask(__name__)
+    app.config['JSON_BACKEND'] = os.getenv('JSON_BACKEND', 'auto')
+    app.config['JSON_PRETTY'] = os.getenv('JSON_PRETTY', '0') == '1'
+    app.config['WARM_POOL'] = False
+    app.config['EVENTS_BUFFER_SIZE'] = events.DEFAULT_BUFFER_SIZE
+    app.config['EVENTS_HEARTBEAT'] = events.DEFAULT_HEARTBEAT
+    app.config['EVENTS_BACKEND'] = os.getenv('EVENTS_BACKEND', 'memory')
+    app.config['EVENTS_PATH'] = os.getenv('EVENTS_PATH')
+    app.config['EVENTS_MAX_SUBSCRIBERS'] = int(os.getenv('EVENTS_MAX_SUBSCRIBERS', events.DEFAULT_MAX_SUBSCRIBERS))
+    app.config['CACHE_BACKEND'] = os.getenv('CACHE_BACKEND', 'none')
+    app.config['CACHE_PATH'] = os.getenv('CACHE_PATH')
+    app.config['CACHE_TTL'] = float(os.getenv('CACHE_TTL', shared_cache.DEFAULT_TTL))
+    app.config['SNAPSHOT_PATH'] = os.getenv('SNAPSHOT_PATH')
+    app.config['SWR_FRESH'] = float(os.getenv('SWR_FRESH', 0))
+    app.config['SWR_STALE'] = float(os.getenv('SWR_STALE', swr_cache.DEFAULT_STALE_FOR))
+    app.config['SWR_MAX_ENTRIES'] = swr_cache.DEFAULT_MAX_ENTRIES
+    app.config['RESPONSE_CACHE_TTL'] = float(os.getenv('RESPONSE_CACHE_TTL', 0))
+    app.config['RESPONSE_CACHE_MAX_BYTES'] = response_cache.DEFAULT_MAX_BYTES
+    app.config['HTTP_MAX_AGE'] = int(os.getenv('HTTP_MAX_AGE', 0))
+    app.config['COMPRESSION'] = os.getenv('COMPRESSION', '1') != '0'
+    app.config['COMPRESSION_MIN_SIZE'] = int(os.getenv('COMPRESSION_MIN_SIZE', compression.DEFAULT_MIN_SIZE))
+    app.config['BATCH_READ_WORKERS'] = 4
+    app.config['RATE_LIMIT'] = float(os.getenv('RATE_LIMIT', 0))
+    app.config['RATE_LIMIT_BURST'] = float(os.getenv('RATE_LIMIT_BURST')) if os.getenv('RATE_LIMIT_BURST') else None
+    app.config['MAX_CONCURRENT_REQUESTS'] = int(os.getenv('MAX_CONCURRENT_REQUESTS')) if os.getenv('MAX_CONCURRENT_REQUESTS') else None
+    app.config['ADMISSION_QUEUE_TIMEOUT'] = admission.DEFAULT_QUEUE_TIMEOUT
+    app.config.update(config or {})
+    
+    app.json = serialization.JSONProvider(app, app.config['JSON_BACKEND'])
+    app.config['DATABASE'] = db.configure(app.config.get('DATABASE'))
+    mysql = app.config['DATABASE']['mysql']
+    events_settings = dict(
+        buffer_size=app.config['EVENTS_BUFFER_SIZE'],
+        max_subscribers=app.config['EVENTS_MAX_SUBSCRIBERS'],
+        backend=app.config['EVENTS_BACKEND'],
+        path=app.config['EVENTS_PATH'],
+        # Dois bancos no mesmo host não misturam eventos
+        channel=f"{mysql['host']}:{mysql['port']}/{mysql['database']}"
+    )
+    if events.settings() != events_settings:
+        events.configure(**events_settings)
+    shared_cache.configure(
+        app.config['CACHE_BACKEND'],
+        path=app.config['CACHE_PATH'],
+        # Dois bancos no mesmo host não compartilham entradas
+        prefix=f"{mysql['host']}:{mysql['port']}/{mysql['database']}:",
+        ttl=app.config['CACHE_TTL']
+    )
+    snapshot.configure(app.config['SNAPSHOT_PATH'])
+    swr_cache.configure(app.config['SWR_FRESH'], app.config['SWR_STALE'], app.config['SWR_MAX_ENTRIES'])
+    response_cache.configure(app.config['RESPONSE_CACHE_TTL'], app.config['RESPONSE_CACHE_MAX_BYTES'])
+    if app.config['MAX_CONCURRENT_REQUESTS'] is None:
+        app.config['MAX_CONCURRENT_REQUESTS'] = default_max_concurrent(app.config['DATABASE']['pool_size'])
+    admission.configure(
+        rate=app.config['RATE_LIMIT'],
+        burst=app.config['RATE_LIMIT_BURST'],
+        max_concurrent=app.config['MAX_CONCURRENT_REQUESTS'] or None,
+        queue_timeout=app.config['ADMISSION_QUEUE_TIMEOUT']
+    )
+    
+    app.before_request(serve_cached_response)
+    app.before_request(admit_request)
+    app.before_request(bind_db_session)
+    # after_request roda na ordem inversa do registro: a compressão é a última
+    app.after_request(compress_response)
+    app.after_request(apply_cache_policy)
+    app.after_request(remember_last_write)
+    app.teardown_request(release_admission)
+    for code, handler in ERROR_HANDLERS.items():
+        app.register_error_handler(code, handler)
+    for rule, view_func, methods in ROUTES:
+        app.add_url_rule(rule, view_func=view_func, methods=methods)
+    
+    if app.config['WARM_POOL']:
+        db.warm_pool()
+    
+    return app
+
+_app = None
+
+def __getattr__(name):
+    """Cria a aplicação padrão (`app.app`) só quando ela é usada pela primeira vez"""
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the data-access (func.py) and HTTP (app.py) layers
+
+Seeds a dedicated MySQL database with rows from generate_dataset.py, times
+every func.py function and every Flask route (through the test client) and
+writes the results as JSON so two runs can be compared between commits.
+
+Usage:
+    python benchmark.py --sizes 1000 100000 1000000
+    python benchmark.py --sizes 1000 --layers http --output bench_results/pr.json
+    python benchmark.py --compare bench_results/base.json bench_results/pr.json
+
+The benchmark database is taken from BENCH_DB_NAME (default: imoveis_bench) and
+uses the same DB_HOST/DB_PORT/DB_USER/DB_PASSWORD as the API. Its `imoveis`
+table is truncated and re-seeded, so it must never point to the real database.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+from generate_dataset import gerar_lotes
+
+# Load environment variables
+load_dotenv()
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema_mysql.sql')
+SEED_BATCH_SIZE = 5000
+# Ids por busca de vários imóveis (?ids=, /imoveis/lookup) e sub-requisições por /batch
+IDS_POR_BUSCA = 100
+REQUISICOES_POR_BATCH = 10
+
+
+# Estatísticas
+
+def percentile(sorted_values, pct):
+    """Percentile with linear interpolation over an already sorted list"""
+    if not sorted_values:
+        return None
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    weight = rank - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * weight
+
+
+def summarize(samples_ms):
+    """Summarize a list of latencies (milliseconds) into the reported statistics"""
+    values = sorted(samples_ms)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'min': values[0],
+        'max': values[-1],
+        'mean': statistics.fmean(values),
+        'stdev': statistics.stdev(values) if len(values) > 1 else 0.0,
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+    }
+
+
+# Preparação do banco de benchmark
+
+def preparar_banco(tamanho, reseed=False, seed=42):
+    """
+    Create the benchmark database/table and load `tamanho` rows.
+
+    The table is only re-seeded when its row count differs from `tamanho`
+    (or when `reseed` is set), so repeated runs on 1M rows stay cheap.
+    """
+    import mysql.connector
+    from database_config import DatabaseConfig
+    from func import CONSULTAS_RECONSTRUCAO_CONTAGENS
+
+    config = DatabaseConfig.get_mysql_config()
+    database = config.pop('database')
+    config['raise_on_warnings'] = False
+
+    conn = mysql.connector.connect(**config)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{database}`")
+        cursor.execute(f"USE `{database}`")
+        with open(SCHEMA_FILE, encoding='utf-8') as schema:
+            for statement in schema.read().split(';'):
+                linhas = [l for l in statement.splitlines() if not l.strip().startswith('--')]
+                if '\n'.join(linhas).strip():
+                    cursor.execute('\n'.join(linhas))
+
+        cursor.execute("SELECT COUNT(*) FROM imoveis")
+        atual = cursor.fetchone()[0]
+        if atual == tamanho and not reseed:
+            return
+
+        print(f"   Populando {tamanho} linhas em {database}.imoveis...")
+        cursor.execute("TRUNCATE TABLE imoveis")
+        cursor.execute("TRUNCATE TABLE imoveis_removidos")
+        insert = """
+            INSERT INTO imoveis (logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data_aquisicao)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        for lote in gerar_lotes(tamanho, seed=seed, batch_size=SEED_BATCH_SIZE):
+            cursor.executemany(insert, lote)
+            conn.commit()
+        # A carga direta não passa por func.py: recalcula as contagens de uma vez
+        for query in CONSULTAS_RECONSTRUCAO_CONTAGENS:
+            cursor.execute(query)
+        conn.commit()
+        cursor.execute("ANALYZE TABLE imoveis")
+        cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# Casos de benchmark
+
+class BenchCase:
+    """
+    A single benchmark case.
+
+    `prepare(i)` runs untimed before each iteration and returns the argument
+    passed to `run`, which is the only part that is timed. `setup()` and
+    `teardown()` run once around the whole case (e.g. to turn a cache on).
+    """
+
+    def __init__(self, layer, name, run, prepare=None, setup=None, teardown=None):
+        self.layer = layer
+        self.name = name
+        self.run = run
+        self.prepare = prepare or (lambda i: i)
+        self.setup = setup
+        self.teardown = teardown
+
+
+def _payload(i):
+    return {
+        'logradouro': f'Rua Benchmark {i}',
+        'tipo_logradouro': 'Rua',
+        'bairro': 'Centro',
+        'cidade': 'Cidade Benchmark',
+        'cep': '12345678',
+        'tipo': 'casa',
+        'valor': 350000.0,
+        'data_aquisicao': '2024-01-01',
+    }
+
+
+def _lote_ids(amostra_ids, i):
+    """IDS_POR_BUSCA ids da amostra, diferentes a cada iteração"""
+    return [amostra_ids[(i * IDS_POR_BUSCA + j) % len(amostra_ids)] for j in range(IDS_POR_BUSCA)]
+
+
+def build_func_cases(tamanho, rng):
+    """Cases for every public function in func.py"""
+    import func
+
+    amostra_ids = [rng.randint(1, tamanho) for _ in range(1000)]
+    cidade = func.listar_imovel_por_id(amostra_ids[0])['cidade']
+    # Token do fim da primeira página: as próximas leituras continuam a sincronização no meio do catálogo
+    token = func.listar_alteracoes(limite=500)['token']
+    criados = []
+
+    def inserir(i):
+        criados.append(func.inserir_imovel(**_payload(i)))
+
+    def preparar_id_criado(i):
+        if not criados:
+            criados.append(func.inserir_imovel(**_payload(i)))
+        return criados[-1]
+
+    def deletar(imovel_id):
+        func.deletar_imovel(imovel_id)
+        criados.remove(imovel_id)
+
+    return [
+        BenchCase('func', 'listar_todos_imoveis', lambda i: func.listar_todos_imoveis()),
+        BenchCase('func', 'listar_todos_imoveis (campos)',
+                  lambda i: func.listar_todos_imoveis(campos={'cidade', 'valor'})),
+        BenchCase('func', f'listar_imoveis_por_ids ({IDS_POR_BUSCA})',
+                  lambda i: func.listar_imoveis_por_ids(_lote_ids(amostra_ids, i))),
+        BenchCase('func', 'listar_alteracoes', lambda i: func.listar_alteracoes(limite=500)),
+        BenchCase('func', 'listar_alteracoes (token)', lambda i: func.listar_alteracoes(token, limite=500)),
+        BenchCase('func', 'listar_imovel_por_id',
+                  lambda i: func.listar_imovel_por_id(amostra_ids[i % len(amostra_ids)])),
+        BenchCase('func', 'listar_imovel_por_id_inexistente',
+                  lambda i: func.listar_imovel_por_id(tamanho * 10 + i)),
+        BenchCase('func', 'listar_imoveis_por_tipo', lambda i: func.listar_imoveis_por_tipo('casa')),
+        BenchCase('func', 'listar_imoveis_por_cidade', lambda i: func.listar_imoveis_por_cidade(cidade)),
+        BenchCase('func', 'inserir_imovel', inserir),
+        BenchCase('func', 'atualizar_imovel',
+                  lambda imovel_id: func.atualizar_imovel(imovel_id, valor=400000.0 + imovel_id),
+                  prepare=preparar_id_criado),
+        BenchCase('func', 'deletar_imovel', deletar, prepare=preparar_id_criado),
+    ]
+
+
+def build_http_cases(tamanho, rng):
+    """Cases for every Flask route, executed through the test client"""
+    import func
+    import response_cache
+    from app import app as flask_app
+
+    client = flask_app.test_client()
+    # Cliente sem o cookie de escrita recente dos casos de escrita, que desviaria do cache de respostas
+    leitor = flask_app.test_client()
+    amostra_ids = [rng.randint(1, tamanho) for _ in range(1000)]
+    cidade = func.listar_imovel_por_id(amostra_ids[0])['cidade']
+    criados = []
+
+    def checar(response, *esperados):
+        if response.status_code not in esperados:
+            raise RuntimeError(f'{response.request.method} {response.request.path} '
+                               f'retornou {response.status_code}')
+        return response
+
+    def criar(i):
+        response = checar(client.post('/imoveis', json=_payload(i)), 201)
+        criados.append(response.get_json()['data']['id'])
+
+    def preparar_id_criado(i):
+        if not criados:
+            criados.append(func.inserir_imovel(**_payload(i)))
+        return criados[-1]
+
+    def remover(imovel_id):
+        checar(client.delete(f'/imoveis/{imovel_id}'), 200)
+        criados.remove(imovel_id)
+
+    def batch(i):
+        requests = [{'method': 'GET', 'path': f'/imoveis/{imovel_id}'}
+                    for imovel_id in _lote_ids(amostra_ids, i)[:REQUISICOES_POR_BATCH]]
+        checar(client.post('/batch', json={'requests': requests}), 200)
+
+    def ligar_cache():
+        response_cache.configure(60, flask_app.config['RESPONSE_CACHE_MAX_BYTES'])
+
+    def restaurar_cache():
+        response_cache.configure(flask_app.config['RESPONSE_CACHE_TTL'], flask_app.config['RESPONSE_CACHE_MAX_BYTES'])
+
+    gzip = {'Accept-Encoding': 'gzip'}
+
+    return [
+        BenchCase('http', 'GET /', lambda i: checar(client.get('/'), 200)),
+        BenchCase('http', 'GET /health', lambda i: checar(client.get('/health'), 200)),
+        BenchCase('http', 'GET /imoveis', lambda i: checar(client.get('/imoveis'), 200)),
+        BenchCase('http', 'GET /imoveis?fields=cidade,valor',
+                  lambda i: checar(client.get('/imoveis?fields=cidade,valor'), 200)),
+        BenchCase('http', 'GET /imoveis (gzip)', lambda i: checar(client.get('/imoveis', headers=gzip), 200)),
+        BenchCase('http', 'GET /imoveis (cache)', lambda i: checar(leitor.get('/imoveis'), 200),
+                  setup=ligar_cache, teardown=restaurar_cache),
+        BenchCase('http', 'GET /imoveis (cache, gzip)', lambda i: checar(leitor.get('/imoveis', headers=gzip), 200),
+                  setup=ligar_cache, teardown=restaurar_cache),
+        BenchCase('http', f'GET /imoveis?ids= ({IDS_POR_BUSCA})',
+                  lambda i: checar(client.get('/imoveis?ids=' + ','.join(map(str, _lote_ids(amostra_ids, i)))),
+                                   200)),
+        BenchCase('http', f'POST /imoveis/lookup ({IDS_POR_BUSCA})',
+                  lambda i: checar(client.post('/imoveis/lookup', json={'ids': _lote_ids(amostra_ids, i)}), 200)),
+        BenchCase('http', 'GET /imoveis/changes', lambda i: checar(client.get('/imoveis/changes'), 200)),
+        BenchCase('http', f'POST /batch ({REQUISICOES_POR_BATCH} GET)', batch),
+        BenchCase('http', 'GET /imoveis/<id>',
+                  lambda i: checar(client.get(f'/imoveis/{amostra_ids[i % len(amostra_ids)]}'), 200)),
+        BenchCase('http', 'GET /imoveis/<id> (404)',
+                  lambda i: checar(client.get(f'/imoveis/{tamanho * 10 + i}'), 404)),
+        BenchCase('http', 'GET /imoveis/tipo/<tipo>',
+                  lambda i: checar(client.get('/imoveis/tipo/casa'), 200)),
+        BenchCase('http', 'GET /imoveis/cidade/<cidade>',
+                  lambda i: checar(client.get(f'/imoveis/cidade/{cidade}'), 200)),
+        BenchCase('http', 'POST /imoveis', criar),
+        BenchCase('http', 'PUT /imoveis/<id>',
+                  lambda imovel_id: checar(client.put(f'/imoveis/{imovel_id}', json={'valor': 410000.0}), 200),
+                  prepare=preparar_id_criado),
+        BenchCase('http', 'DELETE /imoveis/<id>', remover, prepare=preparar_id_criado),
+    ]
+
+
+def run_case(case, warmup, repeat, time_budget):
+    """Run warmup iterations, then up to `repeat` timed iterations within `time_budget` seconds"""
+    if case.setup is not None:
+        case.setup()
+    try:
+        for i in range(warmup):
+            case.run(case.prepare(i))
+
+        samples = []
+        inicio = time.perf_counter()
+        for i in range(warmup, warmup + repeat):
+            arg = case.prepare(i)
+            t0 = time.perf_counter_ns()
+            case.run(arg)
+            samples.append((time.perf_counter_ns() - t0) / 1e6)
+            # Sempre mede pelo menos 3 repetições, mesmo com orçamento estourado
+            if len(samples) >= 3 and time.perf_counter() - inicio > time_budget:
+                break
+        return samples
+    finally:
+        if case.teardown is not None:
+            case.teardown()
+
+
+# Metadados e comparação
+
+def git_info():
+    """Current commit and dirty flag, so results can be attributed to a revision"""
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True,
+                                         stderr=subprocess.DEVNULL).strip()
+        dirty = bool(subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                             text=True, stderr=subprocess.DEVNULL).strip())
+        return {'commit': commit, 'dirty': dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+
+def compare_results(base, novo, metric='p50', threshold=10.0):
+    """
+    Compare two result documents case by case.
+
+    Returns a list of rows with the relative change of `metric` (in percent)
+    and a `regression` flag when the new run is slower than `threshold`.
+    """
+    def index(doc):
+        return {(r['size'], r['layer'], r['case']): r['stats'] for r in doc['results']}
+
+    base_idx, novo_idx = index(base), index(novo)
+    linhas = []
+    for key in sorted(base_idx.keys() & novo_idx.keys()):
+        antes = base_idx[key].get(metric)
+        depois = novo_idx[key].get(metric)
+        if not antes or depois is None:
+            continue
+        variacao = (depois - antes) / antes * 100.0
+        linhas.append({
+            'size': key[0],
+            'layer': key[1],
+            'case': key[2],
+            'base': antes,
+            'new': depois,
+            'change_pct': variacao,
+            'regression': variacao > threshold,
+        })
+    return linhas
+
+
+def print_comparison(linhas, metric):
+    print(f"{'size':>8}  {'layer':<5} {'case':<36} {metric + ' base':>12} {metric + ' new':>12} {'change':>9}")
+    for l in linhas:
+        flag = '  <-- regressão' if l['regression'] else ''
+        print(f"{l['size']:>8}  {l['layer']:<5} {l['case']:<36} {l['base']:>10.3f}ms "
+              f"{l['new']:>10.3f}ms {l['change_pct']:>+8.1f}%{flag}")
+
+
+def print_stats(tamanho, case, stats):
+    print(f"   {case.layer:<5} {case.name:<36} n={stats['count']:<4} "
+          f"p50={stats['p50']:.3f}ms p95={stats['p95']:.3f}ms p99={stats['p99']:.3f}ms max={stats['max']:.3f}ms")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark da API de imóveis')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Quantidades de linhas do dataset (default: 1000 100000 1000000)')
+    parser.add_argument('--layers', nargs='+', choices=['func', 'http'], default=['func', 'http'])
+    parser.add_argument('--cases', nargs='*', default=None,
+                        help='Executa apenas os casos cujo nome contém algum destes textos')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--time-budget', type=float, default=30.0,
+                        help='Tempo máximo (s) de medição por caso; mínimo de 3 repetições')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reseed', action='store_true', help='Força recriar os dados do benchmark')
+    parser.add_argument('--output', help='Arquivo JSON de saída (default: bench_results/<data>-<commit>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'),
+                        help='Compara dois arquivos de resultado em vez de executar')
+    parser.add_argument('--metric', default='p50', choices=['p50', 'p90', 'p95', 'p99', 'mean', 'max'])
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='Variação percentual considerada regressão no --compare')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f:
+            base = json.load(f)
+        with open(args.compare[1], encoding='utf-8') as f:
+            novo = json.load(f)
+        linhas = compare_results(base, novo, metric=args.metric, threshold=args.threshold)
+        print_comparison(linhas, args.metric)
+        return 1 if any(l['regression'] for l in linhas) else 0
+
+    bench_db = os.getenv('BENCH_DB_NAME', 'imoveis_bench')
+    if bench_db == os.getenv('DB_NAME'):
+        print('❌ BENCH_DB_NAME não pode ser igual a DB_NAME: o benchmark apaga a tabela imoveis')
+        return 2
+    os.environ['DB_NAME'] = bench_db
+
+    info = git_info()
+    documento = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git': info,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': bench_db,
+            'args': {k: v for k, v in vars(args).items() if k not in ('compare', 'output')},
+        },
+        'results': [],
+    }
+
+    builders = {'func': build_func_cases, 'http': build_http_cases}
+    for tamanho in args.sizes:
+        print(f"📊 Dataset com {tamanho} linhas")
+        preparar_banco(tamanho, reseed=args.reseed, seed=args.seed)
+        for layer in args.layers:
+            for case in builders[layer](tamanho, random.Random(args.seed)):
+                if args.cases and not any(c in case.name for c in args.cases):
+                    continue
+                resultado = {'size': tamanho, 'layer': case.layer, 'case': case.name}
+                try:
+                    samples = run_case(case, args.warmup, args.repeat, args.time_budget)
+                except Exception as e:
+                    # Um caso quebrado não invalida o resto da execução
+                    print(f"   {case.layer:<5} {case.name:<36} ERRO: {e}")
+                    resultado['stats'] = {'count': 0}
+                    resultado['error'] = str(e)
+                else:
+                    resultado['stats'] = summarize(samples)
+                    print_stats(tamanho, case, resultado['stats'])
+                documento['results'].append(resultado)
+
+    output = args.output
+    if not output:
+        commit = (info['commit'] or 'nogit')[:8]
+        output = os.path.join('bench_results', f"{datetime.now():%Y%m%d-%H%M%S}-{commit}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(documento, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados salvos em {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
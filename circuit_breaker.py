@@ -0,0 +1,103 @@
+import math
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the database while the circuit is open"""
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(
+            f"Banco de dados indisponível (circuito aberto). Tente novamente em {retry_after}s"
+        )
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for the database connection.
+
+    closed: calls go through; `failure_threshold` consecutive failures open
+    the circuit.
+    open: calls fail immediately with CircuitOpenError for `reset_timeout`
+    seconds.
+    half_open: up to `half_open_max_calls` trial calls go through; a success
+    closes the circuit and a failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=5.0, half_open_max_calls=1, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self._trials = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Ask permission to call the database.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with every
+                trial slot already taken
+        """
+        with self._lock:
+            if self.state == OPEN:
+                elapsed = self.clock() - self.opened_at
+                if elapsed < self.reset_timeout:
+                    raise CircuitOpenError(self._retry_after(elapsed))
+                self.state = HALF_OPEN
+                self._trials = 0
+            if self.state == HALF_OPEN:
+                if self._trials >= self.half_open_max_calls:
+                    raise CircuitOpenError(1)
+                self._trials += 1
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self._trials = 0
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error) if error is not None else None
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = self.clock()
+                self._trials = 0
+
+    def call(self, func, *args, **kwargs):
+        """Run func through the breaker; any exception it raises counts as a failure"""
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    def _retry_after(self, elapsed):
+        return max(1, math.ceil(self.reset_timeout - elapsed))
+
+    def status(self):
+        with self._lock:
+            status = {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'last_error': self.last_error
+            }
+            if self.state == OPEN:
+                status['retry_after'] = self._retry_after(self.clock() - self.opened_at)
+            return status
@@ -0,0 +1,106 @@
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_MIN_SIZE = 1024
+
+# Tipos de conteúdo que valem a pena comprimir (texto); imagens e arquivos já comprimidos ficam de fora
+COMPRESSIBLE_TYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'text/event-stream',
+    'text/csv',
+    'text/plain',
+    'text/html',
+}
+
+
+class _ZlibEncoder:
+    def __init__(self, wbits, level=6):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self, final=False):
+        return self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _BrotliEncoder:
+    def __init__(self, quality=4):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self, final=False):
+        return self._compressor.finish() if final else self._compressor.flush()
+
+
+class _ZstdEncoder:
+    def __init__(self, level=3):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self, final=False):
+        if final:
+            return self._compressor.flush()
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+
+# Em ordem de preferência do servidor quando o cliente aceita várias com a mesma qualidade
+ENCODERS = {}
+if brotli is not None:
+    ENCODERS['br'] = _BrotliEncoder
+if zstandard is not None:
+    ENCODERS['zstd'] = _ZstdEncoder
+ENCODERS['gzip'] = lambda: _ZlibEncoder(wbits=31)
+# "deflate" no HTTP é o formato zlib (RFC 1950), não o deflate cru
+ENCODERS['deflate'] = lambda: _ZlibEncoder(wbits=15)
+
+
+def available_encodings():
+    """Content codings this process can produce, most preferred first"""
+    return list(ENCODERS)
+
+
+def compress(body, encoding):
+    """Compress a complete body"""
+    encoder = ENCODERS[encoding]()
+    return encoder.compress(body) + encoder.flush(final=True)
+
+
+def compress_stream(chunks, encoding):
+    """
+    Compress a chunked body as it is produced.
+
+    Each chunk is flushed right away, so a client reading a long-lived stream
+    (e.g. /imoveis/stream) still receives every event as soon as it is sent.
+    `chunks` is closed when the compressed stream ends or is closed.
+
+    Args:
+        chunks (iterable): Byte strings of the original body
+        encoding (str): One of available_encodings()
+
+    Yields:
+        bytes: Compressed data
+    """
+    encoder = ENCODERS[encoding]()
+    try:
+        for chunk in chunks:
+            if chunk:
+                yield encoder.compress(chunk) + encoder.flush()
+        yield encoder.flush(final=True)
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
@@ -0,0 +1,110 @@
+import datetime
+
+import pytest
+
+import admission
+import events
+import response_cache
+import shared_cache
+import snapshot
+import swr_cache
+
+# Configuração de banco válida que nunca abre conexão (pool desligado, sem réplicas)
+CONFIG_TESTE = {
+    'mysql': {'host': 'localhost', 'port': 3306, 'user': 'u', 'password': 'p', 'database': 'n'},
+    'pool_size': 0,
+    'replicas': [],
+    'replication': {},
+    'circuit_breaker': {},
+}
+
+
+class FakeTx:
+    """Transação falsa: guarda os comandos e simula uma linha existente de imoveis"""
+
+    def __init__(self, existente=('casa', 'Recife')):
+        self.existente = existente
+        self.comandos = []
+        self.wrote = False
+
+    def execute(self, query, params=None, fetch_one=False, fetch_all=False, get_lastrowid=False):
+        query = ' '.join(query.split())
+        self.comandos.append((query, params))
+        if 'FOR UPDATE' in query and 'SELECT tipo, cidade' in query:
+            return self.existente
+        if 'FROM imoveis WHERE id' in query and fetch_one:
+            tipo, cidade = self.existente
+            return (1, 'Rua A', 'Rua', 'Centro', cidade, '50000000', tipo, 1.0, None)
+        if fetch_all:
+            return []
+        if get_lastrowid:
+            return 10
+        return 1
+
+    def executemany(self, query, seq_params):
+        self.comandos.append((' '.join(query.split()), seq_params))
+        return len(seq_params)
+
+    def on_commit(self, callback):
+        pass
+
+    def ajustes(self):
+        """Variações aplicadas em imoveis_contagens, como {(dimensao, valor): delta}"""
+        resultado = {}
+        for query, params in self.comandos:
+            if query.startswith('INSERT INTO imoveis_contagens'):
+                for i in range(0, len(params), 3):
+                    resultado[(params[i], params[i + 1])] = resultado.get((params[i], params[i + 1]), 0) + params[i + 2]
+        return resultado
+
+
+def _linha_imovel(imovel_id, **campos):
+    valores = {
+        'logradouro': f'Rua {imovel_id}', 'tipo_logradouro': 'Rua', 'bairro': 'Centro', 'cidade': 'Recife',
+        'cep': '50000-000', 'tipo': 'casa', 'valor': 1000.0, 'data_aquisicao': datetime.date(2020, 1, 2),
+    }
+    valores.update(campos)
+    return (imovel_id,) + tuple(valores.values())
+
+
+@pytest.fixture
+def config_teste():
+    return CONFIG_TESTE
+
+
+@pytest.fixture
+def fake_tx():
+    """Classe FakeTx; cada chamada cria uma transação falsa nova"""
+    return FakeTx
+
+
+@pytest.fixture
+def linha():
+    """linha(id, **campos): linha de imoveis na ordem do SELECT, com valores padrão para os campos omitidos"""
+    return _linha_imovel
+
+
+@pytest.fixture
+def criar_app(tmp_path):
+    """
+    criar_app(linhas=None, **config): aplicação de teste com CONFIG_TESTE
+
+    Com `linhas`, as leituras vêm de um snapshot com essas linhas. No fim do
+    teste os módulos configurados por create_app voltam ao estado padrão.
+    """
+    from app import create_app
+
+    def criar(linhas=None, **config):
+        if linhas is not None:
+            caminho = str(tmp_path / 'imoveis.snap')
+            snapshot.build_snapshot(linhas, caminho)
+            config = {'SNAPSHOT_PATH': caminho, **config}
+        return create_app({'DATABASE': CONFIG_TESTE, **config})
+
+    yield criar
+    snapshot.configure(None)
+    response_cache.configure(0)
+    swr_cache.configure(0)
+    shared_cache.configure('none')
+    admission.configure()
+    events.configure()
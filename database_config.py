@@ -1,5 +1,5 @@
 import os
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 class DatabaseConfig:
     """
@@ -17,6 +17,7 @@ class DatabaseConfig:
         DB_USER: MySQL username
         DB_PASSWORD: MySQL password
         DB_NAME: MySQL database name
+        DB_CONNECT_TIMEOUT: seconds to wait for a connection (default: 3)
         """
         return {
             'host': os.getenv('DB_HOST', 'localhost'),
@@ -24,6 +25,7 @@ class DatabaseConfig:
             'user': os.getenv('DB_USER'),
             'password': os.getenv('DB_PASSWORD'),
             'database': os.getenv('DB_NAME'),
+            'connection_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 3)),
             'charset': 'utf8mb4',
             'collation': 'utf8mb4_unicode_ci',
             'autocommit': False,
@@ -42,3 +44,81 @@ class DatabaseConfig:
             raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
         
         return True
+
+    @staticmethod
+    def get_replica_configs() -> List[Dict[str, Any]]:
+        """
+        Get the read replica configurations from environment variables.
+        Replicas use the same user, password and database as the primary:
+
+        DB_REPLICAS: comma-separated list of host[:port] (default: no replicas)
+        """
+        primary = DatabaseConfig.get_mysql_config()
+        replicas = []
+        for entry in os.getenv('DB_REPLICAS', '').split(','):
+            entry = entry.strip()
+            if not entry:
+                continue
+            host, _, port = entry.partition(':')
+            config = dict(primary)
+            config['host'] = host
+            config['port'] = int(port) if port else primary['port']
+            replicas.append(config)
+        return replicas
+
+    @staticmethod
+    def get_replication_settings() -> Dict[str, float]:
+        """
+        Get the replica routing settings from environment variables:
+
+        DB_REPLICA_MAX_LAG: replicas further behind than this (seconds) stop receiving reads (default: 5)
+        DB_REPLICA_CHECK_INTERVAL: seconds between replication lag checks (default: 2)
+        DB_READ_YOUR_WRITES_MARGIN: extra seconds a client's reads stay on the primary after a write (default: 1)
+        """
+        return {
+            'max_lag': float(os.getenv('DB_REPLICA_MAX_LAG', 5)),
+            'check_interval': float(os.getenv('DB_REPLICA_CHECK_INTERVAL', 2)),
+            'margin': float(os.getenv('DB_READ_YOUR_WRITES_MARGIN', 1)),
+        }
+
+    @staticmethod
+    def get_circuit_breaker_settings() -> Dict[str, float]:
+        """
+        Get the database circuit breaker settings from environment variables:
+
+        DB_BREAKER_FAILURES: consecutive connection failures that open the circuit (default: 3)
+        DB_BREAKER_RESET_TIMEOUT: seconds the circuit stays open before a trial request (default: 5)
+        DB_BREAKER_HALF_OPEN_CALLS: concurrent trial requests allowed while half-open (default: 1)
+        """
+        return {
+            'failure_threshold': int(os.getenv('DB_BREAKER_FAILURES', 3)),
+            'reset_timeout': float(os.getenv('DB_BREAKER_RESET_TIMEOUT', 5)),
+            'half_open_max_calls': int(os.getenv('DB_BREAKER_HALF_OPEN_CALLS', 1)),
+        }
+
+    @staticmethod
+    def get_pool_size() -> int:
+        """
+        Get the size of the primary's connection pool from the environment:
+
+        DB_POOL_SIZE: pooled connections per process, 0 disables pooling (default: 5, max: 32)
+        """
+        pool_size = int(os.getenv('DB_POOL_SIZE', 5))
+        if not 0 <= pool_size <= 32:
+            raise ValueError("DB_POOL_SIZE must be between 0 and 32")
+        return pool_size
+
+    @staticmethod
+    def load() -> Dict[str, Any]:
+        """
+        Validate and read every database setting from the environment at once,
+        so the application parses its configuration a single time at startup.
+        """
+        DatabaseConfig.validate_mysql_config()
+        return {
+            'mysql': DatabaseConfig.get_mysql_config(),
+            'pool_size': DatabaseConfig.get_pool_size(),
+            'replicas': DatabaseConfig.get_replica_configs(),
+            'replication': DatabaseConfig.get_replication_settings(),
+            'circuit_breaker': DatabaseConfig.get_circuit_breaker_settings(),
+        }
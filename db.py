@@ -0,0 +1,395 @@
+import os
+import threading
+from contextlib import contextmanager
+from database_config import DatabaseConfig
+from replication import ReplicaRouter
+from circuit_breaker import CircuitBreaker
+
+# Erros do cliente que indicam que o servidor caiu no meio de uma operação
+# (CR_SERVER_GONE_ERROR, CR_SERVER_LOST, CR_SERVER_LOST_EXTENDED)
+CONNECTION_LOST_ERRNOS = {2006, 2013, 2055}
+
+# mysql.connector é importado no primeiro uso: é o import mais lento da camada de dados
+mysql = None
+
+_settings = None
+_settings_lock = threading.RLock()
+_pool = None
+_pool_lock = threading.Lock()
+_replica_router = None
+_replica_router_loaded = False
+_replica_router_lock = threading.Lock()
+_circuit_breaker = None
+_circuit_breaker_lock = threading.Lock()
+
+
+def _driver():
+    """The mysql.connector module, imported on first use"""
+    global mysql
+    if mysql is None:
+        import mysql.connector
+        import mysql.connector.pooling
+    return mysql.connector
+
+
+def configure(settings=None):
+    """
+    Set the database settings used by every connection.
+
+    Args:
+        settings (dict, optional): Output of DatabaseConfig.load(); read (and
+            validated) from the environment when omitted
+
+    Returns:
+        dict: The settings in use
+
+    The pool, replica router and circuit breaker are rebuilt from the new
+    settings the next time they are needed.
+    """
+    global _settings
+    if settings is None:
+        settings = DatabaseConfig.load()
+    with _settings_lock:
+        _settings = settings
+    reset()
+    return settings
+
+
+def get_settings():
+    """Database settings, loaded from the environment once if configure() was not called"""
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                return configure()
+    return _settings
+
+
+def reset():
+    """
+    Drop the connection pool, replica router and circuit breaker.
+
+    Used after configure() and after fork: a child process must not share
+    the parent's sockets.
+    """
+    global _pool, _replica_router, _replica_router_loaded, _circuit_breaker
+    with _pool_lock:
+        _pool = None
+    with _replica_router_lock:
+        if _replica_router is not None:
+            _replica_router.stop()
+        _replica_router = None
+        _replica_router_loaded = False
+    with _circuit_breaker_lock:
+        _circuit_breaker = None
+
+
+def _reset_after_fork():
+    # O filho herda os sockets do pool do pai e os locks no estado em que
+    # estavam no fork: recria tudo sem tentar adquirir nada
+    global _pool, _pool_lock, _replica_router, _replica_router_loaded, _replica_router_lock
+    global _circuit_breaker, _circuit_breaker_lock, _settings_lock
+    _settings_lock = threading.RLock()
+    _pool = None
+    _pool_lock = threading.Lock()
+    _replica_router = None
+    _replica_router_loaded = False
+    _replica_router_lock = threading.Lock()
+    _circuit_breaker = None
+    _circuit_breaker_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _connection_config(config):
+    config = dict(config)
+    # rowcount de UPDATE conta linhas encontradas, não só as alteradas,
+    # para distinguir "não encontrado" de "sem mudança" sem uma leitura extra
+    config['client_flags'] = [_driver().constants.ClientFlag.FOUND_ROWS]
+    return config
+
+
+def _connect(config):
+    driver = _driver()
+    try:
+        return driver.connect(**_connection_config(config))
+    except driver.Error as e:
+        raise Exception(f"Erro ao conectar com MySQL: {e}")
+
+
+def _get_pool():
+    """The primary's connection pool, created (and filled) on first use; None if disabled"""
+    global _pool
+    settings = get_settings()
+    if _pool is None and settings['pool_size'] > 0:
+        with _pool_lock:
+            if _pool is None:
+                driver = _driver()
+                try:
+                    _pool = driver.pooling.MySQLConnectionPool(
+                        pool_name='imoveis', pool_size=settings['pool_size'],
+                        **_connection_config(settings['mysql'])
+                    )
+                except driver.Error as e:
+                    raise Exception(f"Erro ao conectar com MySQL: {e}")
+    return _pool
+
+
+def _connect_primary():
+    pool = _get_pool()
+    if pool is None:
+        return _connect(get_settings()['mysql'])
+    driver = _driver()
+    try:
+        return pool.get_connection()
+    except driver.errors.PoolError:
+        # Pool esgotado: abre uma conexão avulsa em vez de recusar a requisição
+        return _connect(get_settings()['mysql'])
+    except driver.Error as e:
+        raise Exception(f"Erro ao conectar com MySQL: {e}")
+
+
+def warm_pool():
+    """Open the pool's connections now instead of on the first request"""
+    get_circuit_breaker().call(_get_pool)
+
+
+def _replica_lag(config):
+    """Seconds the replica is behind its source, or None if replication is not running"""
+    driver = _driver()
+    conn = driver.connect(**dict(config, connection_timeout=2))
+    try:
+        cursor = conn.cursor(dictionary=True, buffered=True)
+        try:
+            cursor.execute("SHOW REPLICA STATUS")
+        except driver.Error:
+            # MySQL anterior a 8.0.22
+            cursor.execute("SHOW SLAVE STATUS")
+        row = cursor.fetchone()
+        cursor.close()
+    finally:
+        conn.close()
+    if not row:
+        return None
+    lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+    return float(lag) if lag is not None else None
+
+
+def get_circuit_breaker():
+    """
+    Get the CircuitBreaker guarding connections to the primary.
+    """
+    global _circuit_breaker
+    if _circuit_breaker is None:
+        with _circuit_breaker_lock:
+            if _circuit_breaker is None:
+                _circuit_breaker = CircuitBreaker(**get_settings()['circuit_breaker'])
+    return _circuit_breaker
+
+
+def get_replica_router():
+    """
+    Get the ReplicaRouter for the configured read replicas (DB_REPLICAS).
+    Returns None when no replica is configured.
+    """
+    global _replica_router, _replica_router_loaded
+    if not _replica_router_loaded:
+        with _replica_router_lock:
+            if not _replica_router_loaded:
+                settings = get_settings()
+                if settings['replicas']:
+                    _replica_router = ReplicaRouter(settings['replicas'], probe=_replica_lag,
+                                                    **settings['replication'])
+                _replica_router_loaded = True
+    return _replica_router
+
+
+def get_database_connection(read_only=False):
+    """
+    Get MySQL database connection.
+    Returns connection object.
+
+    Read-only connections go to a read replica when one is available and
+    caught up with the current client's writes; everything else goes to the
+    primary.
+
+    Connections to the primary go through the circuit breaker: while it is
+    open this raises CircuitOpenError immediately instead of waiting for
+    the connect timeout.
+    """
+    if read_only:
+        router = get_replica_router()
+        replica = router.choose() if router else None
+        if replica is not None:
+            try:
+                return _connect(replica.config)
+            except Exception as e:
+                # Réplica fora do ar: tira de rotação e cai para o primário
+                router.mark_failed(replica, e)
+    return get_circuit_breaker().call(_connect_primary)
+
+
+class Transaction:
+    """
+    Unit of work over a single MySQL connection.
+
+    Every statement executed through the same Transaction shares one
+    connection and is committed (or rolled back) once, when the
+    `transaction()` block ends.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.wrote = False
+        self.after_commit = []
+        # Buffered: cada SELECT é lido por inteiro, liberando a conexão para o próximo comando
+        self.cursor = conn.cursor(buffered=True)
+
+    def execute(self, query, params=None, fetch_one=False, fetch_all=False, get_lastrowid=False):
+        """
+        Execute a query inside the transaction.
+
+        Args:
+            query (str): SQL query to execute
+            params (tuple, optional): Parameters for the query
+            fetch_one (bool): Whether to fetch one row
+            fetch_all (bool): Whether to fetch all rows
+            get_lastrowid (bool): Whether to return the last inserted row ID
+
+        Returns:
+            Query result based on the fetch parameters
+        """
+        if not self.wrote and _is_write(query):
+            self.wrote = True
+        try:
+            if params:
+                self.cursor.execute(query, params)
+            else:
+                self.cursor.execute(query)
+
+            if fetch_one:
+                return self.cursor.fetchone()
+            if fetch_all:
+                return self.cursor.fetchall()
+            if get_lastrowid:
+                return self.cursor.lastrowid
+            # For UPDATE/DELETE operations, return affected rows
+            return self.cursor.rowcount
+
+        except _driver().Error as e:
+            _record_connection_lost(e)
+            raise Exception(f"Erro na operação do banco de dados: {e}")
+
+    def executemany(self, query, seq_params):
+        """
+        Execute the same statement for every parameter tuple.
+
+        Returns:
+            int: Number of affected rows
+        """
+        self.wrote = True
+        try:
+            self.cursor.executemany(query, seq_params)
+            return self.cursor.rowcount
+        except _driver().Error as e:
+            _record_connection_lost(e)
+            raise Exception(f"Erro na operação do banco de dados: {e}")
+
+    def on_commit(self, callback):
+        """
+        Run callback() once the transaction commits. Nothing runs if it
+        rolls back.
+        """
+        self.after_commit.append(callback)
+
+    def close(self):
+        self.cursor.close()
+        self.conn.close()
+
+
+def _record_connection_lost(error):
+    # Conexão perdida durante a consulta conta como falha do banco;
+    # erros da própria consulta (sintaxe, constraint) não
+    if getattr(error, 'errno', None) in CONNECTION_LOST_ERRNOS:
+        get_circuit_breaker().record_failure(error)
+
+
+def _is_write(query):
+    verbo = query.lstrip().split(None, 1)[0].upper() if query.strip() else ''
+    return verbo not in ('SELECT', 'SHOW')
+
+
+@contextmanager
+def transaction(read_only=False):
+    """
+    Open a unit of work: one connection, one commit.
+
+    Usage:
+        with db.transaction() as tx:
+            imovel = listar_imovel_por_id(imovel_id, tx=tx)
+            atualizar_imovel(imovel_id, valor=100000.0, tx=tx)
+
+    The transaction is committed when the block exits normally and rolled
+    back if it raises. With read_only=True it may run on a read replica.
+    """
+    tx = Transaction(get_database_connection(read_only=read_only))
+    try:
+        yield tx
+        tx.conn.commit()
+        if tx.wrote:
+            router = get_replica_router()
+            if router is not None:
+                router.record_write()
+    except Exception:
+        tx.conn.rollback()
+        raise
+    finally:
+        tx.close()
+    for callback in tx.after_commit:
+        callback()
+
+
+def execute_query(query, params=None, fetch_one=False, fetch_all=False, get_lastrowid=False, tx=None,
+                  read_only=False):
+    """
+    Execute a MySQL database query with proper connection handling.
+
+    Args:
+        query (str): SQL query to execute
+        params (tuple, optional): Parameters for the query
+        fetch_one (bool): Whether to fetch one row
+        fetch_all (bool): Whether to fetch all rows
+        get_lastrowid (bool): Whether to return the last inserted row ID
+        tx (Transaction, optional): Run inside this transaction instead of
+            opening (and committing) a connection of its own
+        read_only (bool): The query only reads, so it may run on a read replica
+
+    Returns:
+        Query result based on the fetch parameters
+    """
+    if tx is not None:
+        return tx.execute(query, params, fetch_one=fetch_one, fetch_all=fetch_all, get_lastrowid=get_lastrowid)
+
+    with transaction(read_only=read_only) as own_tx:
+        return own_tx.execute(query, params, fetch_one=fetch_one, fetch_all=fetch_all,
+                              get_lastrowid=get_lastrowid)
+
+
+def execute_many(query, seq_params, tx=None):
+    """
+    Execute the same MySQL statement for every parameter tuple in one transaction.
+
+    Args:
+        query (str): SQL query to execute
+        seq_params (list): List of parameter tuples
+        tx (Transaction, optional): Run inside this transaction
+
+    Returns:
+        int: Number of affected rows
+    """
+    if tx is not None:
+        return tx.executemany(query, seq_params)
+
+    with transaction() as own_tx:
+        return own_tx.executemany(query, seq_params)
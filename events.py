@@ -0,0 +1,392 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+import shared_cache
+
+DEFAULT_BUFFER_SIZE = 1000
+DEFAULT_HEARTBEAT = 15.0
+DEFAULT_MAX_SUBSCRIBERS = 1000
+# Segundos entre leituras do log compartilhado por processo (não por assinante)
+DEFAULT_POLL_INTERVAL = 0.25
+
+
+class StreamUnavailableError(Exception):
+    """The broker cannot take another subscriber (limit reached or process stopping)"""
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _message(event_id, event, payload):
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n".encode('utf-8')
+
+
+class SQLiteEventLog:
+    """
+    Event log shared by every process on the host, stored in one SQLite file.
+
+    Each channel (one per database) numbers its events 1, 2, 3... without
+    gaps and has a random epoch stored in the file, so event ids are the same
+    in every worker and a recreated file is detected. Only the last `keep`
+    events of a channel are kept.
+    """
+
+    def __init__(self, path, channel='', keep=DEFAULT_BUFFER_SIZE):
+        self.path = path
+        self.channel = channel
+        self.keep = keep
+        self._local = threading.local()
+        if os.path.exists(path):
+            shared_cache.check_owned(path)
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS epochs (
+                channel TEXT PRIMARY KEY,
+                epoch TEXT NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS events (
+                channel TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                message BLOB NOT NULL,
+                PRIMARY KEY (channel, seq)
+            )
+        """)
+        conn.execute("INSERT OR IGNORE INTO epochs (channel, epoch) VALUES (?, ?)",
+                     (channel, uuid.uuid4().hex[:8]))
+        self.epoch = conn.execute("SELECT epoch FROM epochs WHERE channel = ?", (channel,)).fetchone()[0]
+
+    def _connection(self):
+        # Uma conexão por thread e por processo (o filho de um fork não reusa a do pai)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def append(self, event, payload):
+        """Append an event; returns its sequence number"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM events WHERE channel = ?",
+                               (self.channel,)).fetchone()[0]
+            conn.execute("INSERT INTO events (channel, seq, message) VALUES (?, ?, ?)",
+                         (self.channel, seq, _message(f"{self.epoch}-{seq}", event, payload)))
+            if seq % 100 == 0:
+                conn.execute("DELETE FROM events WHERE channel = ? AND seq <= ?", (self.channel, seq - self.keep))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return seq
+
+    def read_after(self, seq, limit):
+        """The newest `limit` events after `seq`, oldest first, as (seq, message)"""
+        rows = self._connection().execute(
+            "SELECT seq, message FROM events WHERE channel = ? AND seq > ? ORDER BY seq DESC LIMIT ?",
+            (self.channel, seq, limit)
+        ).fetchall()
+        return rows[::-1]
+
+    def last_seq(self):
+        return self._connection().execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM events WHERE channel = ?", (self.channel,)
+        ).fetchone()[0]
+
+
+class EventBroker:
+    """
+    Fan-out of change events to Server-Sent Events subscribers.
+
+    Each event is serialized once and kept in a fixed-size ring buffer, so a
+    publish costs the same with 1 or 10,000 subscribers. Idle subscribers
+    sleep on a condition variable and only wake up for a new event or a
+    heartbeat. Event ids are '<epoch>-<seq>', so an id from before a restart
+    is detected instead of being resumed from the wrong place.
+
+    Without a log the broker only sees events published by its own process
+    and the epoch changes with every process. With a SQLiteEventLog, publish()
+    appends to the log and one relay thread per process copies new events
+    into the ring, so every worker streams every event with the same ids, and
+    a client can resume on any worker.
+
+    At most `max_subscribers` streams are open at once; close() ends them all
+    (the worker is stopping) and refuses new ones.
+    """
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, max_subscribers=DEFAULT_MAX_SUBSCRIBERS,
+                 log=None, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.log = log
+        self.poll_interval = poll_interval
+        self.epoch = log.epoch if log is not None else uuid.uuid4().hex[:8]
+        self.seq = 0
+        self.subscribers = 0
+        self.closed = False
+        self.publish_errors = 0
+        self._ring = [None] * buffer_size
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._relay = None
+        if log is not None:
+            # Worker novo ou reciclado: carrega os últimos eventos para retomar ids de outros workers
+            self._poll()
+
+    def publish(self, event, data):
+        """
+        Publish an event to every subscriber.
+
+        Args:
+            event (str): Event type (insert, update, delete, ...)
+            data (dict): JSON-serializable payload
+
+        Returns:
+            str: The event id (None if the shared log could not be written)
+        """
+        payload = json.dumps(data, default=_json_default, ensure_ascii=False)
+        if self.log is not None:
+            try:
+                seq = self.log.append(event, payload)
+            except sqlite3.Error:
+                # Roda depois do commit: a escrita já valeu, só o evento se perde
+                with self._cond:
+                    self.publish_errors += 1
+                return None
+            # Os assinantes deste processo não esperam o próximo ciclo do relay
+            self._wake.set()
+            return f"{self.epoch}-{seq}"
+        with self._cond:
+            self.seq += 1
+            event_id = f"{self.epoch}-{self.seq}"
+            self._ring[self.seq % self.buffer_size] = _message(event_id, event, payload)
+            self._cond.notify_all()
+        return event_id
+
+    def _poll(self):
+        """Copy the events other processes appended to the log into the ring"""
+        rows = self.log.read_after(self.seq, self.buffer_size)
+        if not rows:
+            return
+        with self._cond:
+            for seq, message in rows:
+                if seq > self.seq:
+                    self._ring[seq % self.buffer_size] = bytes(message)
+            self.seq = max(self.seq, rows[-1][0])
+            self._cond.notify_all()
+
+    def _run_relay(self):
+        while not self.closed:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                self._poll()
+            except sqlite3.Error:
+                # Arquivo travado ou indisponível: tenta de novo no próximo ciclo
+                pass
+
+    def _resume_point(self, last_event_id):
+        """Sequence to resume after, or None if the client missed events we no longer have"""
+        if not last_event_id:
+            return self.seq
+        epoch, _, seq = last_event_id.partition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        if seq > self.seq or seq < self.seq - self.buffer_size:
+            return None
+        return seq
+
+    def stream(self, last_event_id=None, heartbeat=DEFAULT_HEARTBEAT):
+        """
+        Open the SSE byte stream for one subscriber.
+
+        Events after `last_event_id` still in the buffer are replayed first.
+        If they are gone, a `reset` event tells the client to reload the
+        collection before continuing.
+
+        Returns:
+            Subscription: Iterator of byte chunks; close() frees the place
+
+        Raises:
+            StreamUnavailableError: max_subscribers reached or broker closed
+        """
+        if self.log is not None:
+            # Um id recém-publicado por outro worker precisa estar no ring antes de retomar
+            try:
+                self._poll()
+            except sqlite3.Error:
+                pass
+        with self._cond:
+            if self.closed:
+                raise StreamUnavailableError("Worker encerrando")
+            if self.subscribers >= self.max_subscribers:
+                raise StreamUnavailableError(f"Limite de {self.max_subscribers} conexões atingido")
+            cursor = self._resume_point(last_event_id)
+            self.subscribers += 1
+            if self.log is not None and self._relay is None:
+                self._relay = threading.Thread(target=self._run_relay, name='events-relay', daemon=True)
+                self._relay.start()
+        return Subscription(self, self._events(cursor, heartbeat))
+
+    def _events(self, cursor, heartbeat):
+        yield b"retry: 3000\n\n"
+        if cursor is None:
+            with self._cond:
+                cursor = self.seq
+            reset = json.dumps({'last_event_id': f"{self.epoch}-{cursor}"})
+            yield f"id: {self.epoch}-{cursor}\nevent: reset\ndata: {reset}\n\n".encode('utf-8')
+
+        while True:
+            with self._cond:
+                if self.seq == cursor and not self.closed:
+                    self._cond.wait(heartbeat)
+                if self.closed:
+                    # O cliente reconecta (retry) em outro worker com o Last-Event-ID
+                    return
+                if self.seq - cursor > self.buffer_size:
+                    # Assinante lento demais: perdeu eventos que já saíram do buffer
+                    cursor = self.seq
+                    pending = None
+                else:
+                    pending = [self._ring[s % self.buffer_size] for s in range(cursor + 1, self.seq + 1)]
+                    if None in pending:
+                        # O log compartilhado já descartou parte desses eventos
+                        pending = None
+                    cursor = self.seq
+            if pending is None:
+                reset = json.dumps({'last_event_id': f"{self.epoch}-{cursor}"})
+                yield f"id: {self.epoch}-{cursor}\nevent: reset\ndata: {reset}\n\n".encode('utf-8')
+            elif pending:
+                yield b"".join(pending)
+            else:
+                # Comentário SSE: mantém a conexão viva e detecta clientes que saíram
+                yield b": ping\n\n"
+
+    def _unsubscribe(self):
+        with self._cond:
+            self.subscribers -= 1
+
+    def close(self):
+        """End every open stream and refuse new ones"""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        self._wake.set()
+
+    def status(self):
+        return {
+            'backend': 'sqlite' if self.log is not None else 'memory',
+            'subscribers': self.subscribers,
+            'max_subscribers': self.max_subscribers,
+            'last_event_id': f"{self.epoch}-{self.seq}",
+            'buffer_size': self.buffer_size,
+            'publish_errors': self.publish_errors
+        }
+
+
+class Subscription:
+    """One subscriber's stream; its place is freed by close(), even if never iterated"""
+
+    def __init__(self, broker, events):
+        self._broker = broker
+        self._events = events
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._events)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._events.close()
+            self._broker._unsubscribe()
+
+
+broker = EventBroker()
+_settings = {}
+
+
+def configure(buffer_size=DEFAULT_BUFFER_SIZE, max_subscribers=DEFAULT_MAX_SUBSCRIBERS, backend='memory',
+              path=None, channel=''):
+    """
+    Replace the process broker (drops buffered events and current ids).
+
+    Args:
+        buffer_size (int): Events kept for clients that reconnect
+        max_subscribers (int): Streams open at once in this process
+        backend (str): 'memory' (this process only) or 'sqlite' (every process on the host)
+        path (str, optional): SQLite file (default: imoveis-events.sqlite3 next to the shared cache)
+        channel (str): Separates databases sharing the same file
+
+    Raises:
+        ValueError: Unknown backend
+    """
+    global broker, _settings
+    if backend == 'memory':
+        log = None
+    elif backend == 'sqlite':
+        log = SQLiteEventLog(path or os.path.join(shared_cache.default_cache_dir(), 'imoveis-events.sqlite3'),
+                             channel, keep=buffer_size)
+    else:
+        raise ValueError(f"Backend de eventos desconhecido: {backend}")
+    broker = EventBroker(buffer_size, max_subscribers, log=log)
+    _settings = dict(buffer_size=buffer_size, max_subscribers=max_subscribers, backend=backend,
+                     path=path, channel=channel)
+    return broker
+
+
+def settings():
+    """Arguments of the last configure() call ({} before the first)"""
+    return dict(_settings)
+
+
+def publish(event, data, tx=None):
+    """
+    Publish a change event, or queue it until `tx` commits.
+
+    Args:
+        event (str): Event type
+        data (dict): Payload
+        tx (Transaction, optional): Transaction the change belongs to
+    """
+    if tx is None:
+        broker.publish(event, data)
+    else:
+        tx.on_commit(lambda: broker.publish(event, data))
+
+
+def close():
+    """End the streams of this process (called when the worker stops)"""
+    broker.close()
+
+
+def _reset_after_fork():
+    # Cada worker tem seus próprios assinantes e sua própria thread de relay;
+    # com o log compartilhado, os ids continuam os mesmos
+    if _settings:
+        configure(**_settings)
+    else:
+        configure(broker.buffer_size)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
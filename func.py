@@ -1,138 +1,319 @@
-import mysql.connector
-from mysql.connector import Error as MySQLError
-from database_config import DatabaseConfig
+import base64
+from collections import Counter
+from datetime import datetime, timedelta
+from db import execute_query, execute_many, transaction, get_replica_router
+import events
+import response_cache
+import shared_cache
+import singleflight
+import swr_cache
+import snapshot
 
+# Campos que podem ser alterados por atualizar_imovel, na ordem das colunas
+CAMPOS_EDITAVEIS = ['logradouro', 'tipo_logradouro', 'bairro', 'cidade', 'cep', 'tipo', 'valor', 'data_aquisicao']
 
-def get_database_connection():
+# Sincronização incremental (listar_alteracoes)
+# Escritas cujo commit demora mais que isto podem aparecer com updated_at
+# anterior a um token já entregue; o último token de cada sincronização
+# recua esta janela para que elas sejam entregues na próxima
+JANELA_SEGURANCA_SYNC = 5
+# Por quanto tempo os tombstones de imóveis removidos são mantidos
+RETENCAO_REMOVIDOS_DIAS = 30
+
+
+class TokenExpiradoError(Exception):
+    """O token de sincronização é mais antigo que a retenção dos tombstones"""
+
+
+# Contagens por tipo e por cidade (tabela imoveis_contagens), mantidas nas
+# mesmas transações das escritas. O total geral fica em ('total', '') e
+# imóveis sem tipo contam em ('tipo', '').
+CONSULTAS_RECONSTRUCAO_CONTAGENS = (
+    "DELETE FROM imoveis_contagens",
     """
-    Get MySQL database connection.
-    Returns connection object.
+        INSERT INTO imoveis_contagens (dimensao, valor, total)
+        SELECT 'total', '', COUNT(*) FROM imoveis
+    """,
     """
-    DatabaseConfig.validate_mysql_config()
-    config = DatabaseConfig.get_mysql_config()
-    try:
-        conn = mysql.connector.connect(**config)
-        return conn
-    except MySQLError as e:
-        raise Exception(f"Erro ao conectar com MySQL: {e}")
+        INSERT INTO imoveis_contagens (dimensao, valor, total)
+        SELECT 'tipo', COALESCE(tipo, ''), COUNT(*) FROM imoveis GROUP BY COALESCE(tipo, '')
+    """,
+    """
+        INSERT INTO imoveis_contagens (dimensao, valor, total)
+        SELECT 'cidade', cidade, COUNT(*) FROM imoveis GROUP BY cidade
+    """,
+)
+
+
+def _deltas_contagem(tipo, cidade, sinal):
+    """Variações das contagens ao incluir (sinal=1) ou remover (sinal=-1) um imóvel"""
+    return Counter({('total', ''): sinal, ('tipo', tipo or ''): sinal, ('cidade', cidade or ''): sinal})
 
 
-def execute_query(query, params=None, fetch_one=False, fetch_all=False, get_lastrowid=False):
+def _ajustar_contagens(deltas, tx):
     """
-    Execute a MySQL database query with proper connection handling.
+    Aplica as variações às contagens em um único comando
     
-    Args:
-        query (str): SQL query to execute
-        params (tuple, optional): Parameters for the query
-        fetch_one (bool): Whether to fetch one row
-        fetch_all (bool): Whether to fetch all rows
-        get_lastrowid (bool): Whether to return the last inserted row ID
-        
-    Returns:
-        Query result based on the fetch parameters
+    As linhas são tocadas sempre na mesma ordem (dimensão, valor), então
+    transações concorrentes não travam umas às outras em deadlock. Usa o
+    alias de linha (AS novo) em vez de VALUES(total), obsoleto desde o
+    MySQL 8.0.20: o aviso 1287 viraria exceção com raise_on_warnings.
     """
-    conn = get_database_connection()
-    cursor = conn.cursor()
+    deltas = sorted((chave, delta) for chave, delta in deltas.items() if delta)
+    if not deltas:
+        return
     
-    try:
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-        
-        result = None
-        
-        if fetch_one:
-            result = cursor.fetchone()
-        elif fetch_all:
-            result = cursor.fetchall()
-        elif get_lastrowid:
-            result = cursor.lastrowid
-        else:
-            # For UPDATE/DELETE operations, return affected rows
-            result = cursor.rowcount
-        
-        conn.commit()
-        return result
-        
-    except MySQLError as e:
-        conn.rollback()
-        raise Exception(f"Erro na operação do banco de dados: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    valores = ', '.join(['(%s, %s, %s)'] * len(deltas))
+    query = f"""
+        INSERT INTO imoveis_contagens (dimensao, valor, total) VALUES {valores} AS novo
+        ON DUPLICATE KEY UPDATE total = total + novo.total
+    """
+    params = [item for (dimensao, valor), delta in deltas for item in (dimensao, valor, delta)]
+    execute_query(query, params=tuple(params), tx=tx)
+
+
+# Colunas de imoveis devolvidas pelas leituras, na ordem das respostas
+COLUNAS_IMOVEL = ('id', 'logradouro', 'tipo_logradouro', 'bairro', 'cidade', 'cep', 'tipo', 'valor', 'data_aquisicao')
+
+
+def _row_para_imovel(row, colunas=COLUNAS_IMOVEL):
+    """Converte uma linha com as colunas dadas (default: todas) no dicionário do imóvel"""
+    imovel = dict(zip(colunas, row))
+    if imovel.get('valor') is not None:
+        imovel['valor'] = float(imovel['valor'])
+    return imovel
+
+
+def _colunas(campos):
+    """
+    Colunas do SELECT para os campos pedidos, na ordem de COLUNAS_IMOVEL
+    
+    O id vem sempre (identifica o imóvel e monta os links); nomes fora de
+    COLUNAS_IMOVEL são ignorados, então nada do cliente chega ao SQL.
+    """
+    if campos is None:
+        return COLUNAS_IMOVEL
+    return tuple(coluna for coluna in COLUNAS_IMOVEL if coluna == 'id' or coluna in campos)
+
+
+def _chave_campos(chave, colunas):
+    """Chave de cache de uma leitura só com algumas colunas"""
+    return chave if colunas == COLUNAS_IMOVEL else f"{chave}|{','.join(colunas)}"
+
+
+# Namespace do cache compartilhado com as listagens; qualquer escrita o invalida
+CACHE_NAMESPACE = 'imoveis'
+
+# Ids por consulta WHERE id IN (...) na busca de vários imóveis
+LOTE_IDS = 500
+
+
+def versao_dados():
+    """
+    Versão do namespace compartilhado, que muda a cada escrita confirmada em
+    qualquer worker do host (sempre 0 com CACHE_BACKEND=none)
+    
+    Os caches locais de cada worker guardam a versão junto com a entrada e a
+    comparam a cada acerto, para não servir um dado que outro worker alterou.
+    """
+    return shared_cache.get_cache().version(CACHE_NAMESPACE)
+
+
+def _em_cache(chave, carregar, tx):
+    """
+    Lê do cache compartilhado entre os workers ou carrega do banco
+    
+    Dentro de uma transação o cache não é usado: a leitura precisa ver as
+    escritas ainda não confirmadas da própria transação.
+    """
+    if tx is not None:
+        return carregar()
+    return shared_cache.get_cache().get_or_load(CACHE_NAMESPACE, chave, lambda: _coalescer(chave, carregar))
+
+
+def _coalescer(chave, carregar):
+    """
+    Chamadas simultâneas com a mesma chave compartilham uma única consulta
+    
+    Uma sessão que acabou de escrever só aproveita consultas iniciadas depois
+    da sua escrita, para continuar lendo o que escreveu.
+    """
+    router = get_replica_router()
+    ultima_escrita = router.last_write() if router is not None else None
+    return singleflight.group.do(chave, carregar, not_before=ultima_escrita)
+
+
+def _snapshot_ativo(tx):
+    """Snapshot mapeado em memória que substitui o banco nas leituras, se configurado"""
+    return snapshot.get_snapshot() if tx is None else None
+
+
+def _filtros(*tipos_e_cidades):
+    """Tags ('tipo'/'cidade', valor) das listagens filtradas que mudam com os imóveis dados"""
+    tags = set()
+    for tipo, cidade in tipos_e_cidades:
+        if tipo is not None:
+            tags.add(('tipo', snapshot.normalize_key(tipo)))
+        if cidade is not None:
+            tags.add(('cidade', snapshot.normalize_key(cidade)))
+    return tags
+
+
+def _com_revalidacao(chave, carregar, tx, tags):
+    """
+    Listagens filtradas: servidas do cache stale-while-revalidate do processo
+    
+    Uma entrada vencida é devolvida na hora e atualizada em segundo plano;
+    as escritas removem só as entradas do tipo e da cidade que tocaram. Uma
+    escrita feita em outro worker muda versao_dados(), e as entradas guardadas
+    com a versão anterior são recarregadas em vez de servidas.
+    """
+    if tx is not None:
+        return carregar()
+    cache = swr_cache.get_cache()
+    if isinstance(cache, swr_cache.NullSWRCache):
+        return _em_cache(chave, carregar, None)
+    return cache.get_or_load(chave, lambda: _em_cache(chave, carregar, None), tags, versao_dados())
+
+
+def _invalidar_leituras(filtros=None):
+    shared_cache.get_cache().invalidate(CACHE_NAMESPACE)
+    swr_cache.get_cache().invalidate(filtros)
+    response_cache.invalidate()
+    # Consultas em andamento podem ter lido o dado antigo: ninguém mais se junta a elas
+    singleflight.group.forget()
+
+
+def _notificar_escrita(evento, dados, tx, filtros=None):
+    """
+    Depois do commit: publica o evento em /imoveis/stream e invalida os caches
+    
+    filtros são as tags das listagens por tipo/cidade afetadas (veja _filtros);
+    None quando não se sabe quais são, e então todas são invalidadas.
+    """
+    events.publish(evento, dados, tx=tx)
+    if tx is None:
+        _invalidar_leituras(filtros)
+    else:
+        tx.on_commit(lambda: _invalidar_leituras(filtros))
 
 
-def listar_todos_imoveis():
+def listar_todos_imoveis(tx=None, campos=None):
     """
     Lista todos os imóveis da database
     
+    Args:
+        tx (Transaction, optional): Transação aberta com db.transaction()
+        campos (iterable, optional): Colunas desejadas (veja COLUNAS_IMOVEL); o id
+            vem sempre. Só essas colunas são lidas do banco
+
     Returns:
         list: Lista de dicionários com todos os imóveis
     """
-    query = """
-        SELECT id, logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data_aquisicao
+    colunas = _colunas(campos)
+    query = f"""
+        SELECT {', '.join(colunas)}
         FROM imoveis
         ORDER BY id
     """
     
-    rows = execute_query(query, fetch_all=True)
+    snap = _snapshot_ativo(tx)
+    if snap is not None:
+        return snap.all(colunas)
     
-    imoveis = []
-    for row in rows:
-        imovel = {
-            'id': row[0],
-            'logradouro': row[1],
-            'tipo_logradouro': row[2],
-            'bairro': row[3],
-            'cidade': row[4],
-            'cep': row[5],
-            'tipo': row[6],
-            'valor': float(row[7]) if row[7] is not None else None,
-            'data_aquisicao': row[8]
-        }
-        imoveis.append(imovel)
+    def carregar():
+        rows = execute_query(query, fetch_all=True, tx=tx, read_only=True)
+        return [_row_para_imovel(row, colunas) for row in rows]
     
-    return imoveis
+    return _em_cache(_chave_campos('todos', colunas), carregar, tx)
 
 
-def listar_imovel_por_id(imovel_id):
+def listar_imovel_por_id(imovel_id, tx=None, campos=None):
     """
     Busca um imóvel específico pelo ID no banco MySQL
     
     Args:
         imovel_id (int): ID do imóvel a ser buscado
+        tx (Transaction, optional): Transação aberta com db.transaction()
+        campos (iterable, optional): Colunas desejadas; o id vem sempre
         
     Returns:
         dict or None: Dicionário com os dados do imóvel ou None se não encontrado
     """
-    query = """
-        SELECT id, logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data_aquisicao
+    colunas = _colunas(campos)
+    query = f"""
+        SELECT {', '.join(colunas)}
         FROM imoveis
         WHERE id = %s
     """
     
-    row = execute_query(query, params=(imovel_id,), fetch_one=True)
+    snap = _snapshot_ativo(tx)
+    if snap is not None:
+        return snap.get(imovel_id, colunas)
+    
+    def carregar():
+        row = execute_query(query, params=(imovel_id,), fetch_one=True, tx=tx, read_only=True)
+        return _row_para_imovel(row, colunas) if row else None
     
-    if row:
-        return {
-            'id': row[0],
-            'logradouro': row[1],
-            'tipo_logradouro': row[2],
-            'bairro': row[3],
-            'cidade': row[4],
-            'cep': row[5],
-            'tipo': row[6],
-            'valor': float(row[7]) if row[7] is not None else None,
-            'data_aquisicao': row[8]
-        }
-    return None
+    return _em_cache(_chave_campos(f'id:{imovel_id}', colunas), carregar, tx)
 
 
-def inserir_imovel(logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data_aquisicao):
+def listar_imoveis_por_ids(ids, tx=None, campos=None):
+    """
+    Busca vários imóveis de uma vez, na ordem em que os ids foram pedidos
+    
+    Os ids que já estão no cache compartilhado (as mesmas entradas de
+    listar_imovel_por_id) não vão ao banco; os demais são buscados com
+    WHERE id IN (...), em lotes de LOTE_IDS, e guardados no cache.
+    
+    Args:
+        ids (iterable): IDs dos imóveis; repetidos são considerados uma vez
+        tx (Transaction, optional): Transação aberta com db.transaction()
+        campos (iterable, optional): Colunas desejadas; o id vem sempre
+        
+    Returns:
+        tuple: (lista dos imóveis encontrados, na ordem de ids, lista dos ids não encontrados)
+    """
+    colunas = _colunas(campos)
+    pedidos = list(dict.fromkeys(ids))
+    
+    snap = _snapshot_ativo(tx)
+    if snap is not None:
+        por_id = {imovel_id: snap.get(imovel_id, colunas) for imovel_id in pedidos}
+    else:
+        chaves = {imovel_id: _chave_campos(f'id:{imovel_id}', colunas) for imovel_id in pedidos}
+        # Dentro de uma transação o cache não é usado (veja _em_cache)
+        cache = shared_cache.get_cache() if tx is None else shared_cache.NullCache()
+        guardados, versao = cache.get_many(CACHE_NAMESPACE, list(chaves.values()))
+        por_id = {imovel_id: guardados[chave] for imovel_id, chave in chaves.items() if chave in guardados}
+        
+        faltando = [imovel_id for imovel_id in pedidos if imovel_id not in por_id]
+        for inicio in range(0, len(faltando), LOTE_IDS):
+            lote = faltando[inicio:inicio + LOTE_IDS]
+            query = f"""
+                SELECT {', '.join(colunas)}
+                FROM imoveis
+                WHERE id IN ({', '.join(['%s'] * len(lote))})
+            """
+            rows = execute_query(query, params=tuple(lote), fetch_all=True, tx=tx, read_only=True)
+            carregados = dict.fromkeys(lote)
+            for row in rows:
+                imovel = _row_para_imovel(row, colunas)
+                carregados[imovel['id']] = imovel
+            por_id.update(carregados)
+            cache.set_many(CACHE_NAMESPACE, {chaves[imovel_id]: imovel for imovel_id, imovel in carregados.items()}, versao)
+    
+    encontrados = [por_id[imovel_id] for imovel_id in pedidos if por_id[imovel_id] is not None]
+    nao_encontrados = [imovel_id for imovel_id in pedidos if por_id[imovel_id] is None]
+    return encontrados, nao_encontrados
+
+
+def inserir_imovel(logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data_aquisicao, tx=None):
     """
     Insere um novo imóvel na database MySQL
     
+    Publica o evento 'insert' em /imoveis/stream depois do commit.
+    
     Args:
         logradouro (str): Nome da rua/logradouro
         tipo_logradouro (str): Tipo do logradouro (Rua, Avenida, etc.)
@@ -142,6 +323,7 @@ def inserir_imovel(logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor
         tipo (str): Tipo do imóvel (casa, apartamento, etc.)
         valor (float): Valor do imóvel
         data_aquisicao (str): Data de aquisição no formato YYYY-MM-DD
+        tx (Transaction, optional): Transação aberta com db.transaction()
         
     Returns:
         int: ID do imóvel inserido
@@ -152,105 +334,172 @@ def inserir_imovel(logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor
     """
     params = (logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data_aquisicao)
     
-    return execute_query(query, params, get_lastrowid=True)
+    if tx is None:
+        with transaction() as tx:
+            return inserir_imovel(*params, tx=tx)
+    
+    imovel_id = execute_query(query, params, get_lastrowid=True, tx=tx)
+    _ajustar_contagens(_deltas_contagem(tipo, cidade, 1), tx)
+    _notificar_escrita('insert', _row_para_imovel((imovel_id,) + params), tx=tx,
+                       filtros=_filtros((tipo, cidade)))
+    
+    return imovel_id
 
 
-def deletar_imovel(imovel_id):
+def inserir_imoveis_em_lote(imoveis, tx=None):
+    """
+    Insere vários imóveis de uma vez na database MySQL
+
+    O mysql-connector reescreve o executemany de um INSERT em um único
+    INSERT com vários VALUES, então o lote inteiro vai em uma ida ao banco.
+
+    Args:
+        imoveis (list): Lista de tuplas na ordem (logradouro, tipo_logradouro, bairro,
+            cidade, cep, tipo, valor, data_aquisicao)
+        tx (Transaction, optional): Transação aberta com db.transaction()
+
+    Returns:
+        int: Quantidade de imóveis inseridos
+    """
+    imoveis = list(imoveis)
+    if not imoveis:
+        return 0
+
+    query = """
+        INSERT INTO imoveis (logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data_aquisicao)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """
+
+    if tx is None:
+        with transaction() as tx:
+            return inserir_imoveis_em_lote(imoveis, tx=tx)
+    
+    inseridos = execute_many(query, imoveis, tx=tx)
+    deltas = Counter()
+    for imovel in imoveis:
+        deltas.update(_deltas_contagem(imovel[5], imovel[3], 1))
+    _ajustar_contagens(deltas, tx)
+    # Os ids do lote não são conhecidos: o evento só avisa que a coleção mudou
+    _notificar_escrita('bulk_insert', {'count': inseridos}, tx=tx,
+                       filtros=_filtros(*((imovel[5], imovel[3]) for imovel in imoveis)))
+    
+    return inseridos
+
+
+def deletar_imovel(imovel_id, tx=None):
     """
     Remove um imóvel da database MySQL pelo ID
     
+    Publica o evento 'delete' em /imoveis/stream depois do commit.
+    
     Args:
         imovel_id (int): ID do imóvel a ser removido
+        tx (Transaction, optional): Transação aberta com db.transaction()
         
     Returns:
         bool: True se o imóvel foi removido, False se não foi encontrado
     """
+    if tx is None:
+        with transaction() as tx:
+            return deletar_imovel(imovel_id, tx=tx)
+    
+    row = execute_query("SELECT tipo, cidade FROM imoveis WHERE id = %s FOR UPDATE",
+                        params=(imovel_id,), fetch_one=True, tx=tx)
+    if row is None:
+        return False
+    
     query = "DELETE FROM imoveis WHERE id = %s"
     
-    rows_affected = execute_query(query, params=(imovel_id,))
+    rows_affected = execute_query(query, params=(imovel_id,), tx=tx)
     
-    return rows_affected > 0
+    if rows_affected > 0:
+        _registrar_remocao(imovel_id, tx)
+        _ajustar_contagens(_deltas_contagem(row[0], row[1], -1), tx)
+        _notificar_escrita('delete', {'id': imovel_id}, tx=tx, filtros=_filtros(row))
+        return True
+    return False
+
+
+def _registrar_remocao(imovel_id, tx):
+    """Grava o tombstone do imóvel removido, na mesma transação da remoção"""
+    query = """
+        INSERT INTO imoveis_removidos (id, removido_em) VALUES (%s, CURRENT_TIMESTAMP(6))
+        ON DUPLICATE KEY UPDATE removido_em = CURRENT_TIMESTAMP(6)
+    """
+    execute_query(query, params=(imovel_id,), tx=tx)
 
 
-def listar_imoveis_por_tipo(tipo_imovel):
+def listar_imoveis_por_tipo(tipo_imovel, tx=None, campos=None):
     """
     Lista todos os imóveis de um tipo específico no banco MySQL
     
     Args:
         tipo_imovel (str): Tipo do imóvel (casa, apartamento, terreno, casa em condominio)
+        tx (Transaction, optional): Transação aberta com db.transaction()
+        campos (iterable, optional): Colunas desejadas; o id vem sempre
         
     Returns:
         list: Lista de dicionários com os imóveis do tipo especificado
     """
-    query = """
-        SELECT id, logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data_aquisicao
+    colunas = _colunas(campos)
+    query = f"""
+        SELECT {', '.join(colunas)}
         FROM imoveis
         WHERE tipo = %s
         ORDER BY id
     """
     
-    rows = execute_query(query, params=(tipo_imovel,), fetch_all=True)
+    snap = _snapshot_ativo(tx)
+    if snap is not None:
+        return snap.find('tipo', tipo_imovel, colunas)
     
-    imoveis = []
-    for row in rows:
-        imovel = {
-            'id': row[0],
-            'logradouro': row[1],
-            'tipo_logradouro': row[2],
-            'bairro': row[3],
-            'cidade': row[4],
-            'cep': row[5],
-            'tipo': row[6],
-            'valor': float(row[7]) if row[7] is not None else None,
-            'data_aquisicao': row[8]
-        }
-        imoveis.append(imovel)
+    def carregar():
+        rows = execute_query(query, params=(tipo_imovel,), fetch_all=True, tx=tx, read_only=True)
+        return [_row_para_imovel(row, colunas) for row in rows]
     
-    return imoveis
+    chave = snapshot.normalize_key(tipo_imovel)
+    return _com_revalidacao(_chave_campos(f'tipo:{chave}', colunas), carregar, tx, {('tipo', chave)})
 
 
-def listar_imoveis_por_cidade(cidade):
+def listar_imoveis_por_cidade(cidade, tx=None, campos=None):
     """
     Lista todos os imóveis de uma cidade específica no banco MySQL
     
     Args:
         cidade (str): Nome da cidade
+        tx (Transaction, optional): Transação aberta com db.transaction()
+        campos (iterable, optional): Colunas desejadas; o id vem sempre
         
     Returns:
         list: Lista de dicionários com os imóveis da cidade especificada
     """
-    query = """
-        SELECT id, logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data_aquisicao
+    colunas = _colunas(campos)
+    query = f"""
+        SELECT {', '.join(colunas)}
         FROM imoveis
         WHERE cidade = %s
         ORDER BY id
     """
     
-    rows = execute_query(query, params=(cidade,), fetch_all=True)
+    snap = _snapshot_ativo(tx)
+    if snap is not None:
+        return snap.find('cidade', cidade, colunas)
     
-    imoveis = []
-    for row in rows:
-        imovel = {
-            'id': row[0],
-            'logradouro': row[1],
-            'tipo_logradouro': row[2],
-            'bairro': row[3],
-            'cidade': row[4],
-            'cep': row[5],
-            'tipo': row[6],
-            'valor': float(row[7]) if row[7] is not None else None,
-            'data_aquisicao': row[8]
-        }
-        imoveis.append(imovel)
+    def carregar():
+        rows = execute_query(query, params=(cidade,), fetch_all=True, tx=tx, read_only=True)
+        return [_row_para_imovel(row, colunas) for row in rows]
     
-    return imoveis
+    chave = snapshot.normalize_key(cidade)
+    return _com_revalidacao(_chave_campos(f'cidade:{chave}', colunas), carregar, tx, {('cidade', chave)})
 
 
 def atualizar_imovel(imovel_id, logradouro=None, tipo_logradouro=None, bairro=None, 
-                    cidade=None, cep=None, tipo=None, valor=None, data_aquisicao=None):
+                    cidade=None, cep=None, tipo=None, valor=None, data_aquisicao=None, tx=None):
     """
     Atualiza os dados de um imóvel existente na database MySQL
     
+    Publica o evento 'update' em /imoveis/stream depois do commit.
+    
     Args:
         imovel_id (int): ID do imóvel a ser atualizado
         logradouro (str, optional): Novo nome da rua/logradouro
@@ -261,47 +510,383 @@ def atualizar_imovel(imovel_id, logradouro=None, tipo_logradouro=None, bairro=No
         tipo (str, optional): Novo tipo do imóvel
         valor (float, optional): Novo valor do imóvel
         data_aquisicao (str, optional): Nova data de aquisição
+        tx (Transaction, optional): Transação aberta com db.transaction()
         
     Returns:
         bool: True se o imóvel foi atualizado, False se não foi encontrado
     """
-    # Constrói a query dinamicamente baseado nos campos fornecidos
+    campos = {
+        'logradouro': logradouro,
+        'tipo_logradouro': tipo_logradouro,
+        'bairro': bairro,
+        'cidade': cidade,
+        'cep': cep,
+        'tipo': tipo,
+        'valor': valor,
+        'data_aquisicao': data_aquisicao
+    }
+    
+    # Se nenhum campo foi fornecido para atualização
+    if _montar_update(imovel_id, campos) is None:
+        return False
+    
+    if tx is None:
+        with transaction() as tx:
+            return atualizar_imovel(imovel_id, tx=tx, **campos)
+    
+    rows_affected, anterior = _executar_update(imovel_id, campos, tx)
+    
+    if rows_affected > 0:
+        alterados = {campo: valor for campo, valor in campos.items() if valor is not None}
+        # Sem tipo/cidade no UPDATE, não se sabe em quais listagens filtradas o imóvel está
+        filtros = _filtros(anterior, (tipo, cidade)) if anterior is not None else None
+        _notificar_escrita('update', {'id': imovel_id, **alterados}, tx=tx, filtros=filtros)
+        return True
+    return False
+
+
+def _montar_update(imovel_id, campos):
+    """
+    Constrói o UPDATE apenas com os campos fornecidos (valores diferentes de None)
+    
+    Returns:
+        tuple or None: (query, parâmetros) ou None se nenhum campo foi fornecido
+    """
     campos_atualizacao = []
     valores = []
     
-    if logradouro is not None:
-        campos_atualizacao.append("logradouro = %s")
-        valores.append(logradouro)
-    if tipo_logradouro is not None:
-        campos_atualizacao.append("tipo_logradouro = %s")
-        valores.append(tipo_logradouro)
-    if bairro is not None:
-        campos_atualizacao.append("bairro = %s")
-        valores.append(bairro)
-    if cidade is not None:
-        campos_atualizacao.append("cidade = %s")
-        valores.append(cidade)
-    if cep is not None:
-        campos_atualizacao.append("cep = %s")
-        valores.append(cep)
-    if tipo is not None:
-        campos_atualizacao.append("tipo = %s")
-        valores.append(tipo)
-    if valor is not None:
-        campos_atualizacao.append("valor = %s")
-        valores.append(valor)
-    if data_aquisicao is not None:
-        campos_atualizacao.append("data_aquisicao = %s")
-        valores.append(data_aquisicao)
+    for campo in CAMPOS_EDITAVEIS:
+        if campos.get(campo) is not None:
+            campos_atualizacao.append(f"{campo} = %s")
+            valores.append(campos[campo])
     
-    # Se nenhum campo foi fornecido para atualização
     if not campos_atualizacao:
-        return False
+        return None
     
     # Adiciona o ID no final para a cláusula WHERE
     valores.append(imovel_id)
     
     query = f"UPDATE imoveis SET {', '.join(campos_atualizacao)} WHERE id = %s"
-    rows_affected = execute_query(query, params=valores)
+    return query, valores
+
+
+def _executar_update(imovel_id, campos, tx):
+    """
+    Executa o UPDATE e ajusta as contagens quando tipo ou cidade mudam
+    
+    Returns:
+        tuple: (linhas encontradas pelo UPDATE, 0 se o imóvel não existe;
+            (tipo, cidade) de antes do UPDATE, ou None se nenhum dos dois mudou)
+    """
+    anterior = None
+    if campos.get('tipo') is not None or campos.get('cidade') is not None:
+        anterior = execute_query("SELECT tipo, cidade FROM imoveis WHERE id = %s FOR UPDATE",
+                                 params=(imovel_id,), fetch_one=True, tx=tx)
+        if anterior is None:
+            return 0, None
+    
+    query, valores = _montar_update(imovel_id, campos)
+    rows_affected = execute_query(query, params=valores, tx=tx)
+    
+    if rows_affected > 0 and anterior is not None:
+        novo_tipo = campos['tipo'] if campos.get('tipo') is not None else anterior[0]
+        nova_cidade = campos['cidade'] if campos.get('cidade') is not None else anterior[1]
+        deltas = _deltas_contagem(novo_tipo, nova_cidade, 1)
+        deltas.update(_deltas_contagem(anterior[0], anterior[1], -1))
+        _ajustar_contagens(deltas, tx)
+    
+    return rows_affected, anterior
+
+
+def atualizar_imovel_e_retornar(imovel_id, tx=None, **campos):
+    """
+    Atualiza um imóvel e retorna o estado final dele na mesma transação
+    
+    A existência é verificada pela contagem de linhas do próprio UPDATE
+    (a conexão usa CLIENT_FOUND_ROWS, então conta linhas encontradas mesmo
+    quando os valores não mudam), sem uma leitura antes da escrita.
+    
+    Args:
+        imovel_id (int): ID do imóvel a ser atualizado
+        tx (Transaction, optional): Transação aberta com db.transaction()
+        **campos: Campos a atualizar (mesmos nomes de atualizar_imovel)
+        
+    Returns:
+        dict or None: Imóvel atualizado ou None se não foi encontrado
+        
+    Raises:
+        ValueError: Se nenhum campo válido foi fornecido
+    """
+    invalidos = set(campos) - set(CAMPOS_EDITAVEIS)
+    if invalidos:
+        raise ValueError(f"Campos inválidos para atualização: {', '.join(sorted(invalidos))}")
+    
+    if _montar_update(imovel_id, campos) is None:
+        raise ValueError("Nenhum campo fornecido para atualização")
+    
+    if tx is None:
+        with transaction() as tx:
+            return atualizar_imovel_e_retornar(imovel_id, tx=tx, **campos)
+    
+    rows_affected, anterior = _executar_update(imovel_id, campos, tx)
+    if rows_affected == 0:
+        return None
+    
+    imovel = listar_imovel_por_id(imovel_id, tx=tx)
+    filtros = _filtros((imovel['tipo'], imovel['cidade']), *([anterior] if anterior is not None else []))
+    _notificar_escrita('update', imovel, tx=tx, filtros=filtros)
+    return imovel
+
+
+def deletar_imovel_e_retornar(imovel_id, tx=None):
+    """
+    Remove um imóvel e retorna os dados que ele tinha, em uma única transação
+    
+    A linha é lida com SELECT ... FOR UPDATE e removida na mesma conexão,
+    então nenhuma outra escrita acontece entre a leitura e a remoção.
+    
+    Args:
+        imovel_id (int): ID do imóvel a ser removido
+        tx (Transaction, optional): Transação aberta com db.transaction()
+        
+    Returns:
+        dict or None: Imóvel removido ou None se não foi encontrado
+    """
+    if tx is None:
+        with transaction() as tx:
+            return deletar_imovel_e_retornar(imovel_id, tx=tx)
+    
+    query = """
+        SELECT id, logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data_aquisicao
+        FROM imoveis
+        WHERE id = %s
+        FOR UPDATE
+    """
+    row = execute_query(query, params=(imovel_id,), fetch_one=True, tx=tx)
+    if row is None:
+        return None
+    
+    if execute_query("DELETE FROM imoveis WHERE id = %s", params=(imovel_id,), tx=tx) == 0:
+        return None
+    _registrar_remocao(imovel_id, tx)
+    _ajustar_contagens(_deltas_contagem(row[6], row[4], -1), tx)
+    
+    imovel = _row_para_imovel(row)
+    _notificar_escrita('delete', imovel, tx=tx, filtros=_filtros((row[6], row[4])))
+    return imovel
+
+
+def codificar_token_sync(momento, ultimo_id):
+    """Token opaco da posição (updated_at, id) de uma sincronização"""
+    bruto = f"{momento.isoformat(timespec='microseconds')}|{ultimo_id}"
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip('=')
+
+
+def decodificar_token_sync(token):
+    """
+    Lê um token gerado por codificar_token_sync
+    
+    Returns:
+        tuple: (datetime, id)
+        
+    Raises:
+        ValueError: Se o token for inválido
+    """
+    try:
+        bruto = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        momento, ultimo_id = bruto.split('|')
+        return datetime.fromisoformat(momento), int(ultimo_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Token de sincronização inválido: {token}") from e
+
+
+def listar_alteracoes(desde=None, limite=500, tx=None, campos=None):
+    """
+    Lista os imóveis alterados e removidos depois de um token de sincronização
+    
+    As alterações vêm em ordem de (updated_at, id), lidas pelos índices
+    idx_imoveis_updated_at e idx_imoveis_removidos_em. Sem token, devolve o
+    catálogo inteiro (paginado). Enquanto tem_mais for True, o cliente deve
+    chamar de novo com o token devolvido. O token da última página recua
+    JANELA_SEGURANCA_SYNC segundos, então algumas alterações recentes podem
+    vir repetidas; aplicá-las de novo não muda o resultado.
+    
+    Args:
+        desde (str, optional): Token devolvido pela sincronização anterior
+        limite (int): Máximo de alterações por página
+        tx (Transaction, optional): Transação aberta com db.transaction()
+        campos (iterable, optional): Colunas desejadas dos imóveis alterados; o id vem sempre
+        
+    Returns:
+        dict: {'alterados': [imóveis], 'removidos': [ids], 'token': str, 'tem_mais': bool}
+        
+    Raises:
+        ValueError: Se o token for inválido
+        TokenExpiradoError: Se o token for mais antigo que a retenção dos tombstones
+    """
+    if desde:
+        momento, ultimo_id = decodificar_token_sync(desde)
+    else:
+        momento, ultimo_id = datetime(1970, 1, 2), 0
+    
+    if tx is None:
+        # Sempre no primário: numa réplica atrasada, linhas aplicadas depois de
+        # o token ser entregue ficariam para trás do token
+        with transaction() as tx:
+            return listar_alteracoes(desde, limite, tx=tx, campos=campos)
+    
+    agora = execute_query("SELECT CURRENT_TIMESTAMP(6)", fetch_one=True, tx=tx)[0]
+    if desde and (agora - momento).days >= RETENCAO_REMOVIDOS_DIAS:
+        raise TokenExpiradoError("Token de sincronização expirado: faça uma sincronização completa")
+    
+    colunas = _colunas(campos)
+    # Os removidos só têm o id: as demais colunas vêm NULL para o UNION
+    query = f"""
+        SELECT * FROM (
+            (SELECT {', '.join(colunas)},
+                    updated_at AS alterado_em, 0 AS removido
+             FROM imoveis
+             WHERE updated_at > %s OR (updated_at = %s AND id > %s)
+             ORDER BY updated_at, id
+             LIMIT %s)
+            UNION ALL
+            (SELECT id{', NULL' * (len(colunas) - 1)},
+                    removido_em AS alterado_em, 1 AS removido
+             FROM imoveis_removidos
+             WHERE removido_em > %s OR (removido_em = %s AND id > %s)
+             ORDER BY removido_em, id
+             LIMIT %s)
+        ) AS alteracoes
+        ORDER BY alterado_em, id
+        LIMIT %s
+    """
+    posicao = (momento, momento, ultimo_id, limite + 1)
+    rows = execute_query(query, params=posicao + posicao + (limite + 1,), fetch_all=True, tx=tx)
+    
+    tem_mais = len(rows) > limite
+    rows = rows[:limite]
+    
+    n = len(colunas)
+    alterados = [_row_para_imovel(row[:n], colunas) for row in rows if not row[n + 1]]
+    removidos = [row[0] for row in rows if row[n + 1]]
+    
+    if rows:
+        momento, ultimo_id = rows[-1][n], rows[-1][0]
+    if not tem_mais:
+        corte = agora - timedelta(seconds=JANELA_SEGURANCA_SYNC)
+        if momento > corte:
+            momento, ultimo_id = corte, 0
+    
+    return {
+        'alterados': alterados,
+        'removidos': removidos,
+        'token': codificar_token_sync(momento, ultimo_id),
+        'tem_mais': tem_mais
+    }
+
+
+def limpar_removidos(dias=RETENCAO_REMOVIDOS_DIAS, tx=None):
+    """
+    Apaga tombstones mais antigos que a retenção
+    
+    Args:
+        dias (int): Retenção em dias
+        tx (Transaction, optional): Transação aberta com db.transaction()
+        
+    Returns:
+        int: Quantidade de tombstones apagados
+    """
+    query = "DELETE FROM imoveis_removidos WHERE removido_em < CURRENT_TIMESTAMP(6) - INTERVAL %s DAY"
+    return execute_query(query, params=(dias,), tx=tx)
+
+
+def contar_imoveis(tipo=None, cidade=None, tx=None):
+    """
+    Quantidade de imóveis no total, de um tipo ou de uma cidade
+    
+    Lê uma linha de imoveis_contagens pela chave primária, sem percorrer imoveis,
+    ou o tamanho do índice do snapshot quando as leituras vêm dele.
+    
+    Args:
+        tipo (str, optional): Conta apenas este tipo
+        cidade (str, optional): Conta apenas esta cidade (ignorado se tipo for informado)
+        tx (Transaction, optional): Transação aberta com db.transaction()
+        
+    Returns:
+        int: Quantidade de imóveis
+    """
+    snap = _snapshot_ativo(tx)
+    if snap is not None:
+        if tipo is not None:
+            return snap.count_matching('tipo', tipo)
+        if cidade is not None:
+            return snap.count_matching('cidade', cidade)
+        return snap.count
+    
+    if tipo is not None:
+        chave = ('tipo', tipo)
+    elif cidade is not None:
+        chave = ('cidade', cidade)
+    else:
+        chave = ('total', '')
+    
+    query = "SELECT total FROM imoveis_contagens WHERE dimensao = %s AND valor = %s"
+    row = execute_query(query, params=chave, fetch_one=True, tx=tx, read_only=True)
+    
+    return row[0] if row else 0
+
+
+def listar_contagens(dimensao, tx=None):
+    """
+    Contagens de todos os valores de uma dimensão
+    
+    Args:
+        dimensao (str): 'tipo' ou 'cidade'
+        tx (Transaction, optional): Transação aberta com db.transaction()
+        
+    Returns:
+        dict: {valor: quantidade}, só com valores que têm imóveis
+    """
+    if dimensao not in ('tipo', 'cidade'):
+        raise ValueError(f"Dimensão inválida: {dimensao}")
+    
+    query = """
+        SELECT valor, total FROM imoveis_contagens
+        WHERE dimensao = %s AND total > 0
+        ORDER BY valor
+    """
+    rows = execute_query(query, params=(dimensao,), fetch_all=True, tx=tx, read_only=True)
+    
+    return {valor: total for valor, total in rows}
+
+
+def reconstruir_contagens(tx=None):
+    """
+    Recalcula imoveis_contagens do zero a partir de imoveis
+    
+    O INSERT ... SELECT trava as linhas lidas de imoveis até o commit, então
+    escritas concorrentes esperam em vez de se perderem na reconstrução.
+    
+    Args:
+        tx (Transaction, optional): Transação aberta com db.transaction()
+        
+    Returns:
+        dict: Contagens que estavam erradas, {(dimensao, valor): (antes, depois)}
+    """
+    if tx is None:
+        with transaction() as tx:
+            return reconstruir_contagens(tx=tx)
+    
+    consulta = "SELECT dimensao, valor, total FROM imoveis_contagens FOR UPDATE"
+    antes = {(d, v): t for d, v, t in execute_query(consulta, fetch_all=True, tx=tx)}
+    
+    for query in CONSULTAS_RECONSTRUCAO_CONTAGENS:
+        execute_query(query, tx=tx)
+    
+    depois = {(d, v): t for d, v, t in execute_query(consulta, fetch_all=True, tx=tx)}
     
-    return rows_affected > 0
\ No newline at end of file
+    return {
+        chave: (antes.get(chave, 0), depois.get(chave, 0))
+        for chave in set(antes) | set(depois)
+        if antes.get(chave, 0) != depois.get(chave, 0)
+    }
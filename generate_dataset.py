@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+High-volume synthetic dataset generator for the imoveis table
+
+Produces realistic listings with the same columns as the table: cities and
+property types follow skewed (Zipf-like) distributions, prices follow a
+log-uniform range per tipo scaled by city, CEPs have 8 digits inside the
+city's real CEP range and acquisition dates span 2000 to 2025.
+
+Rows are generated column by column in batches, each batch with its own
+seed derived from --seed, so the output is the same for a given --seed and
+--batch-size whether batches are produced by one or several processes.
+
+Usage:
+    python generate_dataset.py --rows 10000000 --format csv --output imoveis.csv.gz
+    python generate_dataset.py --rows 1000000 --format ndjson --output - > imoveis.ndjson
+    python generate_dataset.py --rows 100000 --format mysql
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import random
+import sys
+import time
+from datetime import date, timedelta
+from itertools import accumulate
+from multiprocessing import Pool
+
+COLUNAS = ['logradouro', 'tipo_logradouro', 'bairro', 'cidade', 'cep', 'tipo', 'valor', 'data_aquisicao']
+DEFAULT_BATCH_SIZE = 50000
+
+# (cidade, faixa de CEP [início, fim) em prefixos de 5 dígitos, multiplicador de preço)
+CIDADES = [
+    ('São Paulo', (1000, 5999), 1.6),
+    ('Rio de Janeiro', (20000, 23799), 1.5),
+    ('Belo Horizonte', (30000, 31999), 1.1),
+    ('Brasília', (70000, 72799), 1.4),
+    ('Salvador', (40000, 42599), 0.9),
+    ('Fortaleza', (60000, 61599), 0.85),
+    ('Curitiba', (80000, 82999), 1.1),
+    ('Recife', (50000, 52999), 0.9),
+    ('Porto Alegre', (90000, 91999), 1.05),
+    ('Manaus', (69000, 69099), 0.8),
+    ('Belém', (66000, 66999), 0.8),
+    ('Goiânia', (74000, 74899), 0.9),
+    ('Campinas', (13000, 13139), 1.2),
+    ('Guarulhos', (7000, 7399), 1.0),
+    ('São Luís', (65000, 65109), 0.75),
+    ('Maceió', (57000, 57099), 0.8),
+    ('Natal', (59000, 59139), 0.8),
+    ('Florianópolis', (88000, 88099), 1.3),
+    ('Santos', (11000, 11099), 1.2),
+    ('Vitória', (29000, 29099), 1.1),
+    ('Ribeirão Preto', (14000, 14114), 0.95),
+    ('Sorocaba', (18000, 18109), 0.9),
+    ('João Pessoa', (58000, 58099), 0.8),
+    ('Uberlândia', (38400, 38415), 0.85),
+    ('Londrina', (86000, 86099), 0.85),
+    ('Joinville', (89200, 89239), 0.95),
+    ('Niterói', (24000, 24399), 1.25),
+    ('Teresina', (64000, 64099), 0.7),
+    ('Campo Grande', (79000, 79129), 0.85),
+    ('Cuiabá', (78000, 78109), 0.85),
+    ('Aracaju', (49000, 49099), 0.8),
+    ('São José dos Campos', (12200, 12249), 1.0),
+    ('Juiz de Fora', (36000, 36099), 0.8),
+    ('Feira de Santana', (44000, 44099), 0.7),
+    ('Blumenau', (89000, 89099), 0.95),
+    ('Caxias do Sul', (95000, 95129), 0.9),
+    ('Pelotas', (96000, 96099), 0.7),
+    ('Petrópolis', (25600, 25799), 1.0),
+    ('Maringá', (87000, 87099), 0.9),
+    ('Balneário Camboriú', (88330, 88339), 1.6),
+]
+
+# (tipo, peso, valor mínimo, valor máximo)
+TIPOS = [
+    ('apartamento', 45, 180000, 2500000),
+    ('casa', 30, 150000, 1800000),
+    ('casa em condominio', 15, 400000, 4000000),
+    ('terreno', 10, 60000, 900000),
+]
+
+TIPOS_LOGRADOURO = [('Rua', 60), ('Avenida', 20), ('Travessa', 8), ('Alameda', 7), ('Praça', 3), ('Estrada', 2)]
+
+NOMES_LOGRADOURO = [
+    'Tiradentes', 'Sete de Setembro', 'XV de Novembro', 'Dom Pedro II', 'Getúlio Vargas',
+    'Santos Dumont', 'Rui Barbosa', 'Marechal Deodoro', 'Floriano Peixoto', 'Duque de Caxias',
+    'José Bonifácio', 'Barão do Rio Branco', 'Castro Alves', 'Machado de Assis', 'Princesa Isabel',
+    'das Flores', 'das Palmeiras', 'dos Andradas', 'Brasil', 'Paraná', 'São João', 'Santa Catarina',
+    'Independência', 'da República', 'Amazonas', 'Bahia', 'Minas Gerais', 'Goiás', 'Pernambuco',
+    'Carlos Gomes', 'Olavo Bilac', 'Monteiro Lobato', 'Anita Garibaldi', 'Benjamin Constant',
+    'Voluntários da Pátria', 'Coronel Fonseca', 'Padre Anchieta', 'Frei Caneca', 'Ipiranga', 'Paulista',
+]
+
+BAIRROS = [
+    'Centro', 'Jardim América', 'Vila Nova', 'Boa Vista', 'Santa Cecília', 'Jardim Europa',
+    'Vila Mariana', 'Bela Vista', 'Liberdade', 'Copacabana', 'Tijuca', 'Savassi', 'Pituba',
+    'Aldeota', 'Batel', 'Boa Viagem', 'Moinhos de Vento', 'Jardim Paulista', 'Cidade Nova',
+    'São José', 'Santo Antônio', 'Industrial', 'Parque das Nações', 'Alto da Glória',
+    'Jardim Botânico', 'Campo Belo', 'Vila Olímpia', 'Barra', 'Ponta Verde', 'Lagoa Nova',
+]
+
+DATA_INICIAL = date(2000, 1, 1)
+DATA_FINAL = date(2025, 12, 31)
+
+
+def _zipf_cum_weights(n, s=1.1):
+    """Cumulative Zipf weights for n ranked items (rank 1 is the most frequent)"""
+    return list(accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+class _Tabelas:
+    """Lookup tables shared by every batch, built once per process"""
+
+    def __init__(self):
+        self.cidades = [c[0] for c in CIDADES]
+        self.cidades_cum = _zipf_cum_weights(len(CIDADES))
+        self.cidade_cep = {c[0]: c[1] for c in CIDADES}
+        self.cidade_mult = {c[0]: c[2] for c in CIDADES}
+        self.tipos = [t[0] for t in TIPOS]
+        self.tipos_cum = list(accumulate(t[1] for t in TIPOS))
+        self.tipo_faixa = {t[0]: (t[2], t[3] / t[2]) for t in TIPOS}
+        self.tipos_logradouro = [t[0] for t in TIPOS_LOGRADOURO]
+        self.tipos_logradouro_cum = list(accumulate(t[1] for t in TIPOS_LOGRADOURO))
+        self.nomes_cum = _zipf_cum_weights(len(NOMES_LOGRADOURO), s=0.8)
+        self.bairros_cum = _zipf_cum_weights(len(BAIRROS), s=0.9)
+        dias = (DATA_FINAL - DATA_INICIAL).days + 1
+        self.datas = [(DATA_INICIAL + timedelta(days=d)).isoformat() for d in range(dias)]
+
+
+_TABELAS = None
+
+
+def _tabelas():
+    global _TABELAS
+    if _TABELAS is None:
+        _TABELAS = _Tabelas()
+    return _TABELAS
+
+
+def gerar_lote(seed, indice, quantidade):
+    """
+    Generate one batch of `quantidade` rows as tuples in COLUNAS order.
+
+    The batch is fully determined by (`seed`, `indice`), so batches can be
+    produced in parallel and still yield the same dataset.
+    """
+    t = _tabelas()
+    rng = random.Random(f'{seed}:{indice}')
+    choices = rng.choices
+    aleatorio = rng.random
+
+    cidades = choices(t.cidades, cum_weights=t.cidades_cum, k=quantidade)
+    tipos = choices(t.tipos, cum_weights=t.tipos_cum, k=quantidade)
+    tipos_logradouro = choices(t.tipos_logradouro, cum_weights=t.tipos_logradouro_cum, k=quantidade)
+    nomes = choices(NOMES_LOGRADOURO, cum_weights=t.nomes_cum, k=quantidade)
+    numeros = choices(range(1, 3000), k=quantidade)
+    bairros = choices(BAIRROS, cum_weights=t.bairros_cum, k=quantidade)
+    datas = choices(t.datas, k=quantidade)
+
+    cidade_cep = t.cidade_cep
+    ceps = []
+    for cidade in cidades:
+        inicio, fim = cidade_cep[cidade]
+        ceps.append('%05d%03d' % (inicio + int(aleatorio() * (fim - inicio)), int(aleatorio() * 1000)))
+
+    # Valor log-uniforme na faixa do tipo, escalado pela cidade
+    tipo_faixa = t.tipo_faixa
+    cidade_mult = t.cidade_mult
+    valores = []
+    for tipo, cidade in zip(tipos, cidades):
+        minimo, razao = tipo_faixa[tipo]
+        valores.append(round(minimo * razao ** aleatorio() * cidade_mult[cidade], 2))
+
+    logradouros = [f'{nome}, {numero}' for nome, numero in zip(nomes, numeros)]
+    return list(zip(logradouros, tipos_logradouro, bairros, cidades, ceps, tipos, valores, datas))
+
+
+def gerar_lotes(total, seed=42, batch_size=DEFAULT_BATCH_SIZE, workers=1, formatar=None):
+    """
+    Yield successive batches until `total` rows have been generated.
+
+    When `formatar(lote, primeiro_id)` is given it runs inside the worker and
+    its result is yielded instead of the rows, so serialization is
+    parallelized together with generation.
+    """
+    tarefas = []
+    indice = 0
+    for inicio in range(0, total, batch_size):
+        tarefas.append((seed, indice, min(batch_size, total - inicio), inicio + 1, formatar))
+        indice += 1
+
+    if workers <= 1:
+        for tarefa in tarefas:
+            yield _executar_tarefa(tarefa)
+        return
+
+    with Pool(workers) as pool:
+        # imap preserva a ordem dos lotes, mantendo a saída determinística
+        yield from pool.imap(_executar_tarefa, tarefas)
+
+
+def _executar_tarefa(tarefa):
+    seed, indice, quantidade, primeiro_id, formatar = tarefa
+    lote = gerar_lote(seed, indice, quantidade)
+    return formatar(lote, primeiro_id) if formatar else lote
+
+
+# Formatos de saída
+
+def cabecalho_csv(com_ids=False):
+    saida = io.StringIO()
+    csv.writer(saida).writerow((['id'] if com_ids else []) + COLUNAS)
+    return saida.getvalue()
+
+
+def formatar_csv(lote, primeiro_id=None):
+    """Serialize a batch as CSV lines; ids are prepended when `primeiro_id` is set"""
+    if primeiro_id is not None:
+        lote = [(primeiro_id + i,) + linha for i, linha in enumerate(lote)]
+    saida = io.StringIO()
+    csv.writer(saida).writerows(lote)
+    return saida.getvalue()
+
+
+_ENCODE_JSON = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+
+def formatar_ndjson(lote, primeiro_id=None):
+    """Serialize a batch as one JSON object per line"""
+    if primeiro_id is None:
+        return ''.join(_ENCODE_JSON(dict(zip(COLUNAS, linha))) + '\n' for linha in lote)
+    colunas = ['id'] + COLUNAS
+    return ''.join(_ENCODE_JSON(dict(zip(colunas, (primeiro_id + i,) + linha))) + '\n'
+                   for i, linha in enumerate(lote))
+
+
+def _formatar_csv_com_ids(lote, primeiro_id):
+    return formatar_csv(lote, primeiro_id)
+
+
+def _formatar_csv_sem_ids(lote, primeiro_id):
+    return formatar_csv(lote)
+
+
+def _formatar_ndjson_com_ids(lote, primeiro_id):
+    return formatar_ndjson(lote, primeiro_id)
+
+
+def _formatar_ndjson_sem_ids(lote, primeiro_id):
+    return formatar_ndjson(lote)
+
+
+FORMATADORES = {
+    ('csv', True): _formatar_csv_com_ids,
+    ('csv', False): _formatar_csv_sem_ids,
+    ('ndjson', True): _formatar_ndjson_com_ids,
+    ('ndjson', False): _formatar_ndjson_sem_ids,
+}
+
+
+def abrir_saida(caminho):
+    """Open the output path for text writing; '-' is stdout and '.gz' is compressed"""
+    if caminho == '-':
+        return sys.stdout
+    if caminho.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(caminho, 'wb', compresslevel=1), encoding='utf-8', newline='')
+    return open(caminho, 'w', encoding='utf-8', newline='')
+
+
+def escrever_arquivo(args, saida):
+    """Write CSV/NDJSON batches formatted by the workers, yielding the rows written"""
+    if args.format == 'csv':
+        saida.write(cabecalho_csv(args.with_ids))
+    formatar = FORMATADORES[(args.format, args.with_ids)]
+    restantes = args.rows
+    for texto in gerar_lotes(args.rows, seed=args.seed, batch_size=args.batch_size,
+                             workers=args.workers, formatar=formatar):
+        saida.write(texto)
+        quantidade = min(args.batch_size, restantes)
+        restantes -= quantidade
+        yield quantidade
+
+
+def escrever_mysql(args):
+    """Insert batches through the bulk insert path of func.py"""
+    from func import inserir_imoveis_em_lote
+
+    for lote in gerar_lotes(args.rows, seed=args.seed, batch_size=args.batch_size, workers=args.workers):
+        yield inserir_imoveis_em_lote(lote)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Gerador de dataset sintético de imóveis')
+    parser.add_argument('--rows', type=int, required=True, help='Quantidade de linhas')
+    parser.add_argument('--format', choices=['csv', 'ndjson', 'mysql'], default='csv')
+    parser.add_argument('--output', default='-', help="Arquivo de saída ('-' = stdout, '.gz' comprime)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=1, help='Processos gerando e serializando lotes em paralelo')
+    parser.add_argument('--with-ids', action='store_true', help='Inclui a coluna id (1..N) em CSV/NDJSON')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    inicio = time.perf_counter()
+    saida = None
+    try:
+        if args.format == 'mysql':
+            progresso = escrever_mysql(args)
+        else:
+            saida = abrir_saida(args.output)
+            progresso = escrever_arquivo(args, saida)
+
+        gerado = 0
+        for quantidade in progresso:
+            gerado += quantidade
+            print(f"\r   {gerado}/{args.rows} linhas", end='', file=sys.stderr, flush=True)
+    finally:
+        if saida is not None and saida is not sys.stdout:
+            saida.close()
+
+    duracao = time.perf_counter() - inicio
+    print(f"\n✅ {gerado} linhas em {duracao:.1f}s ({gerado / max(duracao, 1e-9):,.0f} linhas/s)",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+
+from func import inserir_imoveis_em_lote
+from validation import imovel_validator
+
+TAMANHO_LOTE = 500
+# Arquivos de rejeitados mais antigos que isto são apagados na próxima importação
+RETENCAO_REJEITADOS_SEGUNDOS = 24 * 60 * 60
+
+FORMATOS = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonlines': 'ndjson',
+}
+
+
+def diretorio_importacoes():
+    """Diretório onde ficam os arquivos de rejeitados das importações"""
+    caminho = os.path.join(tempfile.gettempdir(), 'imoveis-importacoes')
+    os.makedirs(caminho, exist_ok=True)
+    return caminho
+
+
+def ler_csv(stream):
+    """
+    Lê um CSV com cabeçalho linha a linha, sem carregar o arquivo inteiro
+
+    Args:
+        stream: Stream binário (ex.: request.stream)
+
+    Yields:
+        tuple: (número da linha, dicionário do registro ou None, erro ou None)
+    """
+    texto = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    leitor = csv.DictReader(texto)
+    for registro in leitor:
+        if None in registro:
+            yield leitor.line_num, None, 'Linha com mais colunas que o cabeçalho'
+        else:
+            yield leitor.line_num, registro, None
+
+
+def ler_ndjson(stream):
+    """
+    Lê um objeto JSON por linha, sem carregar o arquivo inteiro
+
+    Args:
+        stream: Stream binário (ex.: request.stream)
+
+    Yields:
+        tuple: (número da linha, dicionário do registro ou None, erro ou None)
+    """
+    for numero, linha in enumerate(stream, start=1):
+        linha = linha.strip()
+        if not linha:
+            continue
+        try:
+            registro = json.loads(linha)
+        except (ValueError, UnicodeDecodeError):
+            yield numero, None, 'JSON inválido'
+            continue
+        if not isinstance(registro, dict):
+            yield numero, None, 'A linha deve ser um objeto JSON'
+        else:
+            yield numero, registro, None
+
+
+def validar_lote(registros):
+    """
+    Valida e normaliza um lote de registros de uma vez
+
+    Usa o mesmo validador do POST /imoveis (validation.imovel_validator).
+
+    Args:
+        registros (list): Lista de dicionários
+
+    Returns:
+        tuple: (lista de tuplas prontas para inserir_imoveis_em_lote ou None,
+            lista de erros {field, code, message} de cada registro)
+    """
+    normalizados, erros = imovel_validator.validate_batch(registros)
+    campos = imovel_validator.fields
+    return [tuple(imovel[campo] for campo in campos) if imovel is not None else None
+            for imovel in normalizados], erros
+
+
+def _limpar_rejeitados_antigos(diretorio):
+    limite = time.time() - RETENCAO_REJEITADOS_SEGUNDOS
+    for nome in os.listdir(diretorio):
+        caminho = os.path.join(diretorio, nome)
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.unlink(caminho)
+        except OSError:
+            pass
+
+
+def caminho_rejeitados(importacao_id, diretorio=None):
+    """Arquivo de rejeitados de uma importação, ou None se o id for inválido"""
+    if not re.fullmatch(r'[0-9a-f]{32}', importacao_id):
+        return None
+    return os.path.join(diretorio or diretorio_importacoes(), f'{importacao_id}.ndjson')
+
+
+def importar_imoveis(leitor, tamanho_lote=TAMANHO_LOTE, diretorio=None):
+    """
+    Importa os registros de um leitor (ler_csv/ler_ndjson) em lotes
+
+    Cada lote é validado de uma vez e os registros válidos são inseridos em
+    uma transação própria com inserir_imoveis_em_lote, então a memória usada
+    depende do tamanho do lote e não do arquivo. Os registros rejeitados vão
+    para um arquivo NDJSON com a linha, os erros e o registro original.
+
+    Lotes já confirmados continuam no banco se um lote seguinte falhar; a
+    exceção sai com o atributo `resumo` (o mesmo dict do retorno) contando o
+    que foi gravado até a falha.
+
+    Args:
+        leitor: Iterável de (linha, registro, erro)
+        tamanho_lote (int): Registros por validação e por transação
+        diretorio (str, optional): Onde gravar os rejeitados (default: diretorio_importacoes())
+
+    Returns:
+        dict: id, total, importados, rejeitados e lotes da importação
+    """
+    diretorio = diretorio or diretorio_importacoes()
+    _limpar_rejeitados_antigos(diretorio)
+    importacao_id = uuid.uuid4().hex
+    resumo = {'id': importacao_id, 'total': 0, 'importados': 0, 'rejeitados': 0, 'lotes': 0}
+    caminho = caminho_rejeitados(importacao_id, diretorio)
+
+    try:
+        with open(caminho, 'w', encoding='utf-8') as rejeitados:
+            def rejeitar(linha, erros, registro):
+                resumo['rejeitados'] += 1
+                rejeitados.write(json.dumps({'linha': linha, 'erros': erros, 'registro': registro},
+                                            ensure_ascii=False) + '\n')
+
+            def processar(lote):
+                normalizados, erros = validar_lote([registro for _, registro in lote])
+                validos = []
+                for (linha, registro), imovel, problemas in zip(lote, normalizados, erros):
+                    if imovel is None:
+                        rejeitar(linha, problemas, registro)
+                    else:
+                        validos.append(imovel)
+                if validos:
+                    resumo['importados'] += inserir_imoveis_em_lote(validos)
+                    resumo['lotes'] += 1
+
+            lote = []
+            for linha, registro, erro in leitor:
+                resumo['total'] += 1
+                if erro:
+                    rejeitar(linha, [{'field': None, 'code': 'invalid_record', 'message': erro}], registro)
+                    continue
+                lote.append((linha, registro))
+                if len(lote) >= tamanho_lote:
+                    processar(lote)
+                    lote = []
+            if lote:
+                processar(lote)
+    except Exception as e:
+        # Os lotes anteriores já foram confirmados: quem chamou precisa saber o que foi gravado
+        e.resumo = resumo
+        raise
+    finally:
+        if not resumo['rejeitados'] and os.path.exists(caminho):
+            os.unlink(caminho)
+    return resumo
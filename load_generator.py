@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Concurrent HTTP load generator for the Imoveis API
+
+Drives a configurable mix of GET/POST/PUT/DELETE and filter requests against a
+running server, either with a fixed number of concurrent clients (closed loop)
+or at a target request rate (open loop), and reports p50/p95/p99/max latency,
+throughput and errors per endpoint.
+
+Usage:
+    python load_generator.py --concurrency 16 --duration 30
+    python load_generator.py --rate 200 --concurrency 64 --duration 60
+    python load_generator.py --ramp 1 2 4 8 16 32 64 --duration 15 --output load.json
+    python load_generator.py --mix get=70,tipo=10,cidade=10,post=4,put=4,delete=2
+
+In --ramp mode each stage increases the concurrency and the run reports the
+saturation point: the first stage where throughput stops growing while tail
+latency rises, or where the error rate crosses --max-error-rate.
+"""
+
+import argparse
+import http.client
+import json
+import random
+import socket
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlsplit
+
+from benchmark import summarize
+
+DEFAULT_MIX = 'get=50,list=2,tipo=15,cidade=15,post=6,put=8,delete=4'
+TIPOS = ['casa', 'apartamento', 'terreno', 'casa em condominio']
+
+# Status considerados corretos para cada tipo de requisição
+EXPECTED_STATUS = {
+    'list': {200},
+    'get': {200, 404},
+    'tipo': {200},
+    'cidade': {200},
+    'post': {201},
+    'put': {200, 404},
+    'delete': {200, 404},
+}
+
+
+def parse_mix(texto):
+    """Parse 'get=50,post=5' into a {kind: weight} dict, validating the kinds"""
+    mix = {}
+    for parte in texto.split(','):
+        if not parte.strip():
+            continue
+        nome, _, peso = parte.partition('=')
+        nome = nome.strip()
+        if nome not in EXPECTED_STATUS:
+            raise ValueError(f"Tipo de requisição desconhecido no mix: {nome} "
+                             f"(válidos: {', '.join(EXPECTED_STATUS)})")
+        mix[nome] = float(peso or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError('O mix precisa ter pelo menos um peso positivo')
+    return mix
+
+
+class LoadClient:
+    """
+    Builds and sends requests for the configured mix.
+
+    Each worker thread keeps its own keep-alive connection; ids created by POST
+    are shared so DELETE only removes rows created by the load test itself.
+    """
+
+    def __init__(self, base_url, mix, id_range, cidades, timeout=10.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.prefix = parts.path.rstrip('/')
+        self.kinds = list(mix)
+        self.weights = [mix[k] for k in self.kinds]
+        self.id_range = id_range
+        self.cidades = cidades or ['São Paulo']
+        self.timeout = timeout
+        self.created_ids = []
+        self.created_lock = threading.Lock()
+        self.local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn = cls(self.host, self.port, timeout=self.timeout)
+            conn.connect()
+            # Sem Nagle: requisições pequenas não ficam esperando ACK atrasado
+            conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.local.conn = conn
+        return conn
+
+    def _reset_connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+        self.local.conn = None
+
+    def _payload(self, rng):
+        return {
+            'logradouro': f'Rua Carga {rng.randrange(10**6)}',
+            'tipo_logradouro': 'Rua',
+            'bairro': 'Centro',
+            'cidade': rng.choice(self.cidades),
+            'cep': f'{rng.randrange(10**8):08d}',
+            'tipo': rng.choice(TIPOS),
+            'valor': round(rng.uniform(50000, 2000000), 2),
+            'data_aquisicao': '2024-01-01',
+        }
+
+    def build_request(self, kind, rng):
+        """Return (kind, method, path, body) for a request of the given kind"""
+        if kind == 'delete':
+            with self.created_lock:
+                imovel_id = self.created_ids.pop() if self.created_ids else None
+            if imovel_id is None:
+                # Nada criado ainda: cria em vez de apagar dados pré-existentes
+                kind = 'post'
+            else:
+                return kind, 'DELETE', f'/imoveis/{imovel_id}', None
+        if kind == 'list':
+            return kind, 'GET', '/imoveis', None
+        if kind == 'get':
+            return kind, 'GET', f'/imoveis/{rng.randint(*self.id_range)}', None
+        if kind == 'tipo':
+            return kind, 'GET', f'/imoveis/tipo/{quote(rng.choice(TIPOS))}', None
+        if kind == 'cidade':
+            return kind, 'GET', f'/imoveis/cidade/{quote(rng.choice(self.cidades))}', None
+        if kind == 'post':
+            return kind, 'POST', '/imoveis', self._payload(rng)
+        if kind == 'put':
+            body = {'valor': round(rng.uniform(50000, 2000000), 2)}
+            return kind, 'PUT', f'/imoveis/{rng.randint(*self.id_range)}', body
+        raise ValueError(kind)
+
+    def send(self, method, path, body=None):
+        """Send one request and return (status, response body); status None on network errors"""
+        headers = {}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        try:
+            conn = self._connection()
+            conn.request(method, self.prefix + path, body=data, headers=headers)
+            response = conn.getresponse()
+            payload = response.read()
+            if response.getheader('Connection', '').lower() == 'close':
+                self._reset_connection()
+            return response.status, payload
+        except (OSError, http.client.HTTPException) as e:
+            self._reset_connection()
+            return None, str(e)
+
+    def execute(self, rng):
+        """Pick a request from the mix, send it and return (kind, status, error)"""
+        kind = rng.choices(self.kinds, weights=self.weights)[0]
+        kind, method, path, body = self.build_request(kind, rng)
+        status, payload = self.send(method, path, body)
+        error = None
+        if status is None:
+            error = payload
+        elif status not in EXPECTED_STATUS[kind]:
+            error = f'HTTP {status}'
+        elif kind == 'post':
+            try:
+                novo_id = json.loads(payload)['data']['id']
+                with self.created_lock:
+                    self.created_ids.append(novo_id)
+            except (ValueError, KeyError, TypeError):
+                pass
+        return kind, status, error
+
+
+class StageResult:
+    """Latencies and errors of one load stage, grouped by request kind"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.elapsed = 0.0
+
+    def merge(self, records):
+        for kind, latency_ms, error in records:
+            self.latencies[kind].append(latency_ms)
+            if error:
+                self.errors[kind][error] += 1
+
+    def report(self):
+        """Per-kind and overall statistics as a JSON-serialisable dict"""
+        endpoints = {}
+        todos = []
+        total_erros = 0
+        for kind in sorted(self.latencies):
+            amostras = self.latencies[kind]
+            erros = sum(self.errors[kind].values())
+            total_erros += erros
+            todos.extend(amostras)
+            endpoints[kind] = {
+                'requests': len(amostras),
+                'errors': erros,
+                'error_rate': erros / len(amostras) if amostras else 0.0,
+                'error_kinds': dict(self.errors[kind]),
+                'throughput_rps': len(amostras) / self.elapsed if self.elapsed else 0.0,
+                'latency_ms': summarize(amostras),
+            }
+        return {
+            'elapsed_s': self.elapsed,
+            'requests': len(todos),
+            'errors': total_erros,
+            'error_rate': total_erros / len(todos) if todos else 0.0,
+            'throughput_rps': len(todos) / self.elapsed if self.elapsed else 0.0,
+            'latency_ms': summarize(todos),
+            'endpoints': endpoints,
+        }
+
+
+def run_closed_loop(client, concurrency, duration, seed=None):
+    """N workers send requests back to back until `duration` seconds have passed"""
+    result = StageResult()
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(None if seed is None else seed + index)
+        records = []
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            kind, _status, error = client.execute(rng)
+            records.append((kind, (time.perf_counter() - t0) * 1000.0, error))
+        return records
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for records in pool.map(worker, range(concurrency)):
+            result.merge(records)
+    result.elapsed = time.perf_counter() - inicio
+    return result
+
+
+def run_open_loop(client, rate, concurrency, duration, seed=None):
+    """
+    Issue requests at a fixed `rate` per second using up to `concurrency` workers.
+
+    Latency is measured from the scheduled start time, so time spent waiting
+    for a free worker counts (no coordinated omission when the server slows).
+    """
+    result = StageResult()
+    records = []
+    records_lock = threading.Lock()
+    worker_rng = threading.local()
+
+    def job(index, scheduled):
+        rng = getattr(worker_rng, 'rng', None)
+        if rng is None:
+            rng = worker_rng.rng = random.Random(None if seed is None else seed + index)
+        kind, _status, error = client.execute(rng)
+        latency = (time.perf_counter() - scheduled) * 1000.0
+        with records_lock:
+            records.append((kind, latency, error))
+
+    interval = 1.0 / rate
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        k = 0
+        while True:
+            scheduled = inicio + k * interval
+            if scheduled - inicio >= duration:
+                break
+            espera = scheduled - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            pool.submit(job, k, scheduled)
+            k += 1
+    result.elapsed = time.perf_counter() - inicio
+    result.merge(records)
+    return result
+
+
+def detect_saturation(stages, max_error_rate=0.01, min_gain=0.10, latency_growth=1.5):
+    """
+    Return the index of the first saturated stage, or None.
+
+    A stage is saturated when its error rate exceeds `max_error_rate`, or when
+    throughput grew less than `min_gain` over the previous stage while p99
+    latency grew by more than `latency_growth` times.
+    """
+    for i, stage in enumerate(stages):
+        if stage['error_rate'] > max_error_rate:
+            return i
+        if i == 0:
+            continue
+        anterior = stages[i - 1]
+        ganho = (stage['throughput_rps'] - anterior['throughput_rps']) / max(anterior['throughput_rps'], 1e-9)
+        p99_antes = anterior['latency_ms'].get('p99') or 0.0
+        p99_agora = stage['latency_ms'].get('p99') or 0.0
+        if ganho < min_gain and p99_antes and p99_agora > p99_antes * latency_growth:
+            return i
+    return None
+
+
+def discover_cidades(client, limite=50):
+    """Read a sample of cities from the API root statistics"""
+    status, payload = client.send('GET', '/')
+    if status != 200:
+        return []
+    try:
+        return json.loads(payload)['statistics']['cidades_disponiveis'][:limite]
+    except (ValueError, KeyError, TypeError):
+        return []
+
+
+def print_report(titulo, report):
+    print(f"\n{titulo}: {report['requests']} req em {report['elapsed_s']:.1f}s "
+          f"→ {report['throughput_rps']:.1f} req/s, erros {report['error_rate']:.2%}")
+    print(f"   {'endpoint':<8} {'req':>7} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'erros':>6}")
+    for kind, ep in report['endpoints'].items():
+        lat = ep['latency_ms']
+        print(f"   {kind:<8} {ep['requests']:>7} {ep['throughput_rps']:>8.1f} "
+              f"{lat['p50']:>7.1f}ms {lat['p95']:>7.1f}ms {lat['p99']:>7.1f}ms {lat['max']:>7.1f}ms "
+              f"{ep['errors']:>6}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Gerador de carga HTTP para a API de imóveis')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='URL base da API')
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help=f'Pesos por tipo de requisição (default: {DEFAULT_MIX})')
+    parser.add_argument('--concurrency', type=int, default=8, help='Clientes/threads simultâneos')
+    parser.add_argument('--rate', type=float, help='Taxa alvo em req/s (modo open loop)')
+    parser.add_argument('--ramp', type=int, nargs='+',
+                        help='Sequência de concorrências para detectar o ponto de saturação')
+    parser.add_argument('--duration', type=float, default=30.0, help='Duração de cada estágio (s)')
+    parser.add_argument('--id-range', default='1-1000', help='Faixa de ids usada em GET/PUT (ex: 1-1000)')
+    parser.add_argument('--cidades', nargs='*', help='Cidades usadas no filtro (default: descobre via GET /)')
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--output', help='Salva o relatório em JSON')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    mix = parse_mix(args.mix)
+    inicio_id, _, fim_id = args.id_range.partition('-')
+    id_range = (int(inicio_id), int(fim_id or inicio_id))
+
+    client = LoadClient(args.url, mix, id_range, args.cidades, timeout=args.timeout)
+    if not args.cidades:
+        client.cidades = discover_cidades(client) or client.cidades
+
+    documento = {'url': args.url, 'mix': mix, 'duration_s': args.duration, 'stages': []}
+
+    if args.ramp:
+        for concurrency in args.ramp:
+            result = run_closed_loop(client, concurrency, args.duration, seed=args.seed)
+            report = result.report()
+            report['concurrency'] = concurrency
+            documento['stages'].append(report)
+            print_report(f'Concorrência {concurrency}', report)
+
+        saturado = detect_saturation(documento['stages'], max_error_rate=args.max_error_rate)
+        documento['saturation_stage'] = saturado
+        if saturado is None:
+            print('\n✅ Nenhum ponto de saturação detectado na faixa testada')
+        else:
+            stage = documento['stages'][saturado]
+            print(f"\n⚠️  Saturação a partir de concorrência {stage['concurrency']} "
+                  f"({stage['throughput_rps']:.1f} req/s, p99 {stage['latency_ms']['p99']:.1f}ms, "
+                  f"erros {stage['error_rate']:.2%})")
+    elif args.rate:
+        result = run_open_loop(client, args.rate, args.concurrency, args.duration, seed=args.seed)
+        report = result.report()
+        report['target_rps'] = args.rate
+        report['concurrency'] = args.concurrency
+        documento['stages'].append(report)
+        print_report(f'Taxa alvo {args.rate} req/s', report)
+    else:
+        result = run_closed_loop(client, args.concurrency, args.duration, seed=args.seed)
+        report = result.report()
+        report['concurrency'] = args.concurrency
+        documento['stages'].append(report)
+        print_report(f'Concorrência {args.concurrency}', report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(documento, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Relatório salvo em {args.output}")
+
+    piores = max((s['error_rate'] for s in documento['stages']), default=0.0)
+    return 1 if piores > args.max_error_rate and not args.ramp else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
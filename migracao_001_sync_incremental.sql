@@ -0,0 +1,14 @@
+-- Migração para bancos criados antes da sincronização incremental
+-- Adiciona updated_at (mantido pelo próprio MySQL em INSERT e UPDATE) e a
+-- tabela de tombstones usada por GET /imoveis/changes.
+-- As linhas existentes recebem o horário da migração como updated_at.
+
+ALTER TABLE imoveis
+    ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    ADD INDEX idx_imoveis_updated_at (updated_at, id);
+
+CREATE TABLE IF NOT EXISTS imoveis_removidos (
+    id INT PRIMARY KEY,
+    removido_em TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    INDEX idx_imoveis_removidos_em (removido_em, id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
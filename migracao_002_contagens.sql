@@ -0,0 +1,21 @@
+-- Migração: contagens por tipo e por cidade mantidas pelas escritas
+-- Cria imoveis_contagens e a preenche a partir de imoveis. As mesmas
+-- consultas de preenchimento são usadas por reconciliar_contagens.py.
+
+CREATE TABLE IF NOT EXISTS imoveis_contagens (
+    dimensao VARCHAR(10) NOT NULL,
+    valor VARCHAR(255) NOT NULL,
+    total INT NOT NULL,
+    PRIMARY KEY (dimensao, valor)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+DELETE FROM imoveis_contagens;
+
+INSERT INTO imoveis_contagens (dimensao, valor, total)
+SELECT 'total', '', COUNT(*) FROM imoveis;
+
+INSERT INTO imoveis_contagens (dimensao, valor, total)
+SELECT 'tipo', COALESCE(tipo, ''), COUNT(*) FROM imoveis GROUP BY COALESCE(tipo, '');
+
+INSERT INTO imoveis_contagens (dimensao, valor, total)
+SELECT 'cidade', cidade, COUNT(*) FROM imoveis GROUP BY cidade;
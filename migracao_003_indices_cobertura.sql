@@ -0,0 +1,11 @@
+-- Migração: índices de cobertura para as listagens por tipo e por cidade
+-- Com ?fields= as listagens leem só algumas colunas (por exemplo id, cidade,
+-- tipo e valor). Estes índices contêm essas colunas, na ordem do ORDER BY id,
+-- então a consulta é respondida só pelo índice, sem ler as linhas da tabela.
+-- Substituem idx_imoveis_tipo e idx_imoveis_cidade, que são prefixos deles.
+
+ALTER TABLE imoveis
+    ADD INDEX idx_imoveis_tipo_lista (tipo, id, cidade, valor),
+    ADD INDEX idx_imoveis_cidade_lista (cidade, id, tipo, valor),
+    DROP INDEX idx_imoveis_tipo,
+    DROP INDEX idx_imoveis_cidade;
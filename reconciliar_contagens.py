@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Rebuild the per-type and per-city counters (imoveis_contagens) from imoveis
+
+The counters are kept up to date by the writes in func.py; this job fixes any
+drift (rows loaded outside func.py, manual edits, restores) and reports what
+was wrong. Safe to run from cron while the API is serving traffic.
+
+Usage:
+    python reconciliar_contagens.py
+"""
+
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from func import reconstruir_contagens
+
+
+def main():
+    print("🔄 Reconstruindo contagens de imóveis...")
+    try:
+        diferencas = reconstruir_contagens()
+    except Exception as e:
+        print(f"❌ Falha ao reconstruir contagens: {e}")
+        return 2
+
+    if not diferencas:
+        print("✅ Contagens já estavam corretas")
+        return 0
+
+    print(f"⚠️  {len(diferencas)} contagens estavam erradas e foram corrigidas:")
+    for (dimensao, valor), (antes, depois) in sorted(diferencas.items()):
+        print(f"   {dimensao:<7} {valor or '(vazio)':<30} {antes:>8} -> {depois}")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
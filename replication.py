@@ -0,0 +1,153 @@
+import contextvars
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+# Sessão do cliente da requisição atual: (chave, último write conhecido pelo cliente)
+_request_session = contextvars.ContextVar('db_request_session', default=(None, None))
+_request_wrote = contextvars.ContextVar('db_request_wrote', default=False)
+
+
+def begin_request(session_key, last_write_hint=None):
+    """
+    Bind the current request to a client session.
+
+    Args:
+        session_key (str): Identifies the client (session header or IP)
+        last_write_hint (float, optional): Timestamp of the client's last write
+            as reported by the client itself (cookie), which also covers writes
+            handled by another worker process
+    """
+    _request_session.set((session_key, last_write_hint))
+    _request_wrote.set(False)
+
+
+def request_wrote():
+    """Whether the current request committed a write"""
+    return _request_wrote.get()
+
+
+class Replica:
+    """State of one read replica as seen by the router"""
+
+    def __init__(self, config):
+        self.config = config
+        self.name = f"{config['host']}:{config['port']}"
+        self.lag = None
+        self.healthy = False
+        self.checked_at = None
+        self.error = None
+
+    def status(self):
+        return {
+            'name': self.name,
+            'healthy': self.healthy,
+            'lag_seconds': self.lag,
+            'checked_at': self.checked_at,
+            'error': self.error
+        }
+
+
+class ReplicaRouter:
+    """
+    Route read-only work to read replicas and writes to the primary.
+
+    Replicas are probed periodically by a background thread; a replica whose
+    lag is unknown or above `max_lag` stops receiving reads until it catches
+    up. After a client writes, its reads go to the primary until a replica's
+    lag (plus `margin`) is smaller than the time elapsed since that write.
+    """
+
+    def __init__(self, replica_configs, probe, max_lag=5.0, check_interval=2.0, margin=1.0,
+                 max_sessions=100000, clock=time.time):
+        self.replicas = [Replica(config) for config in replica_configs]
+        self.probe = probe
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.margin = margin
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._round_robin = itertools.count()
+        self._monitor = None
+        self._stop = threading.Event()
+
+    # Monitoramento de atraso
+
+    def check_replicas(self):
+        """Probe every replica once and update its lag and health"""
+        for replica in self.replicas:
+            try:
+                lag = self.probe(replica.config)
+            except Exception as e:
+                replica.lag = None
+                replica.healthy = False
+                replica.error = str(e)
+            else:
+                replica.lag = lag
+                replica.healthy = lag is not None and lag <= self.max_lag
+                replica.error = None if lag is not None else 'Replicação parada'
+            replica.checked_at = self.clock()
+
+    def start(self):
+        """Start the background lag monitor (idempotent)"""
+        if self._monitor is not None and self._monitor.is_alive():
+            return
+        self._stop.clear()
+        self._monitor = threading.Thread(target=self._monitor_loop, name='replica-monitor', daemon=True)
+        self._monitor.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _monitor_loop(self):
+        while not self._stop.is_set():
+            self.check_replicas()
+            self._stop.wait(self.check_interval)
+
+    # Sessões (read-your-writes)
+
+    def record_write(self):
+        """Remember that the current request's session has just written"""
+        session_key, _hint = _request_session.get()
+        _request_wrote.set(True)
+        with self._lock:
+            self._sessions[session_key] = self.clock()
+            self._sessions.move_to_end(session_key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def last_write(self):
+        """Timestamp of the current session's last write, or None"""
+        session_key, hint = _request_session.get()
+        with self._lock:
+            local = self._sessions.get(session_key)
+        candidates = [t for t in (local, hint) if t is not None]
+        return max(candidates) if candidates else None
+
+    # Roteamento
+
+    def choose(self):
+        """
+        Pick the replica for a read, or None when the read must go to the primary.
+        """
+        self.start()
+        last_write = self.last_write()
+        now = self.clock()
+        candidates = [
+            r for r in self.replicas
+            if r.healthy and (last_write is None or now - last_write > r.lag + self.margin)
+        ]
+        if not candidates:
+            return None
+        return candidates[next(self._round_robin) % len(candidates)]
+
+    def mark_failed(self, replica, error):
+        """Take a replica out of rotation until the next successful probe"""
+        replica.healthy = False
+        replica.error = str(error)
+
+    def status(self):
+        return [replica.status() for replica in self.replicas]
@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_ENTRY_BYTES = 4 * 1024 * 1024
+
+
+class CachedResponse:
+    """Final bytes and headers of a response, ready to be sent again"""
+
+    __slots__ = ('key', 'status', 'headers', 'body', 'stored_at', 'version', 'variants')
+
+    def __init__(self, key, status, headers, body, stored_at, version=None):
+        self.key = key
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.stored_at = stored_at
+        # Versão dos dados compartilhada entre os processos quando a resposta foi gerada
+        self.version = version
+        # Corpo já comprimido em cada Content-Encoding pedido até agora
+        self.variants = {}
+
+    @property
+    def size(self):
+        return len(self.body) + sum(len(variant) for variant in self.variants.values())
+
+
+class ResponseCache:
+    """
+    In-process LRU cache of serialized responses, bounded by total bytes.
+
+    Keys are built by the caller from everything the body depends on
+    (route, query string, host, Accept). Compressed variants are kept in
+    the same entry and count towards the byte limit. invalidate() drops
+    every entry; a response rendered from data read before an invalidation
+    is not stored, because set() checks the generation seen by the request.
+
+    invalidate() only reaches this process. Writes made by other processes
+    are caught through `version`, a data version shared across processes
+    (see func.versao_dados): set() stores the version read before the
+    response was rendered, and get() treats an entry stored under any other
+    version as a miss.
+    """
+
+    def __init__(self, ttl, max_bytes=DEFAULT_MAX_BYTES, max_entry_bytes=DEFAULT_MAX_ENTRY_BYTES,
+                 clock=time.monotonic):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.clock = clock
+        self.generation = 0
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if (entry is not None and self.clock() - entry.stored_at < self.ttl
+                    and entry.version == version):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                del self._entries[key]
+                self.size -= entry.size
+            self.misses += 1
+            return None
+
+    def _evict(self):
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted.size
+
+    def set(self, key, status, headers, body, generation, version=None):
+        """
+        Store a response rendered while the cache was at `generation` and the
+        shared data at `version`.
+
+        Returns:
+            CachedResponse: The stored entry, or None if it was not stored
+        """
+        if len(body) > self.max_entry_bytes:
+            return None
+        with self._lock:
+            if generation != self.generation:
+                return None
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old.size
+            entry = self._entries[key] = CachedResponse(key, status, headers, body, self.clock(), version)
+            self.size += entry.size
+            self._evict()
+            return entry
+
+    def variant(self, entry, encoding, compress):
+        """
+        Body of `entry` compressed with `encoding`, compressed only once.
+
+        Args:
+            entry (CachedResponse): Entry returned by get() or set()
+            encoding (str): Content-Encoding, e.g. 'gzip'
+            compress (callable): compress(body, encoding) -> bytes
+        """
+        variant = entry.variants.get(encoding)
+        if variant is not None:
+            return variant
+        # Comprime fora do lock; duas threads podem comprimir ao mesmo tempo, e a segunda descarta
+        variant = compress(entry.body, encoding)
+        with self._lock:
+            # Só conta no tamanho se a entrada ainda estiver no cache
+            if encoding not in entry.variants and self._entries.get(entry.key) is entry:
+                entry.variants[encoding] = variant
+                self.size += len(variant)
+                self._evict()
+        return variant
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self.size = 0
+
+    def status(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else None
+            }
+
+
+_cache = None
+
+
+def configure(ttl=0, max_bytes=DEFAULT_MAX_BYTES):
+    """Set the process response cache; ttl=0 disables it"""
+    global _cache
+    _cache = ResponseCache(ttl, max_bytes) if ttl and ttl > 0 else None
+    return _cache
+
+
+def get_cache():
+    """The process ResponseCache, or None when disabled"""
+    return _cache
+
+
+def invalidate():
+    """Drop every cached response (called after each committed write)"""
+    if _cache is not None:
+        _cache.invalidate()
+
+
+def _reset_after_fork():
+    # O lock pode ter sido copiado travado por outra thread do pai
+    if _cache is not None:
+        configure(_cache.ttl, _cache.max_bytes)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,38 @@
+-- Schema MySQL da tabela imoveis
+-- Equivalente ao CREATE TABLE de imoveis.sql (que foi escrito para SQLite),
+-- com os tipos ajustados para MySQL e índices para as buscas por tipo e cidade.
+-- updated_at e imoveis_removidos alimentam a sincronização incremental
+-- (GET /imoveis/changes) e imoveis_contagens guarda as contagens por tipo e
+-- cidade. Para bancos já existentes, veja os arquivos migracao_*.sql.
+
+CREATE TABLE IF NOT EXISTS imoveis (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    logradouro VARCHAR(255) NOT NULL,
+    tipo_logradouro VARCHAR(50),
+    bairro VARCHAR(255),
+    cidade VARCHAR(255) NOT NULL,
+    cep VARCHAR(9),
+    tipo VARCHAR(50),
+    valor DECIMAL(12, 2),
+    data_aquisicao DATE,
+    updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    -- Índices de cobertura das listagens com ?fields=id,cidade,tipo,valor
+    INDEX idx_imoveis_tipo_lista (tipo, id, cidade, valor),
+    INDEX idx_imoveis_cidade_lista (cidade, id, tipo, valor),
+    INDEX idx_imoveis_updated_at (updated_at, id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Tombstones: imóveis removidos, para que clientes sincronizados apaguem suas cópias
+CREATE TABLE IF NOT EXISTS imoveis_removidos (
+    id INT PRIMARY KEY,
+    removido_em TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    INDEX idx_imoveis_removidos_em (removido_em, id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Contagens mantidas pelas escritas de func.py: ('total', ''), ('tipo', <tipo>), ('cidade', <cidade>)
+CREATE TABLE IF NOT EXISTS imoveis_contagens (
+    dimensao VARCHAR(10) NOT NULL,
+    valor VARCHAR(255) NOT NULL,
+    total INT NOT NULL,
+    PRIMARY KEY (dimensao, valor)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
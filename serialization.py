@@ -0,0 +1,192 @@
+import datetime
+import decimal
+import json
+import operator
+from json.encoder import encode_basestring
+
+from flask import has_request_context, request
+from flask.json.provider import JSONProvider as _BaseJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Valores de ?pretty= que pedem a saída indentada
+PRETTY_VALUES = {'1', 'true', 'yes'}
+
+
+def _default(value):
+    """Types json does not know: dates as ISO 8601 and Decimal as float"""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+class StdlibBackend:
+    """json from the standard library, UTF-8 output"""
+
+    name = 'stdlib'
+
+    def __init__(self):
+        self._compact = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default)
+        self._pretty = json.JSONEncoder(ensure_ascii=False, indent=2, default=_default)
+
+    def dumps(self, obj, pretty=False):
+        return (self._pretty if pretty else self._compact).encode(obj).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonBackend:
+    """orjson: serializes straight to UTF-8 bytes, with dates handled natively"""
+
+    name = 'orjson'
+
+    def dumps(self, obj, pretty=False):
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_INDENT_2 if pretty else 0)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+BACKENDS = {'stdlib': StdlibBackend}
+if orjson is not None:
+    BACKENDS['orjson'] = OrjsonBackend
+
+
+def get_backend(name='auto'):
+    """
+    Serialization backend by name.
+
+    Args:
+        name (str): 'stdlib', 'orjson', or 'auto' for the fastest one installed
+
+    Raises:
+        ValueError: Unknown or not installed backend
+    """
+    if name == 'auto':
+        name = 'orjson' if 'orjson' in BACKENDS else 'stdlib'
+    if name not in BACKENDS:
+        raise ValueError(f"Backend JSON '{name}' indisponível; opções: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+class Fragment:
+    """Already encoded JSON, spliced as is into a response body by JSONProvider"""
+
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+
+def _encode_date(value):
+    return '"' + value.isoformat() + '"'
+
+
+# Codificação direta (em str) dos tipos que vêm do banco/snapshot, sem passar pelo encoder genérico
+_SCALARS = {
+    str: encode_basestring,
+    int: int.__repr__,
+    float: float.__repr__,
+    bool: lambda value: 'true' if value else 'false',
+    type(None): lambda value: 'null',
+    decimal.Decimal: lambda value: float.__repr__(float(value)),
+    datetime.date: _encode_date,
+    datetime.datetime: _encode_date,
+}
+
+
+class RowEncoder:
+    """
+    Encodes rows straight to a JSON array of objects.
+
+    The key of each column is encoded once and every value goes through a
+    per-type encoder, so no dict is built per row; the text is encoded to
+    UTF-8 once for the whole array. `suffix(row)`, if given, returns the
+    extra members closing each object as str (e.g. its links, as
+    ',"link":{...}').
+
+    Args:
+        columns (tuple): Column names, in the order of the row values
+        suffix (callable, optional): Extra members of each object
+        backend: Encoder for values of other types (default: get_backend())
+    """
+
+    def __init__(self, columns, suffix=None, backend=None):
+        self.columns = tuple(columns)
+        self.suffix = suffix
+        self.backend = backend or get_backend()
+        self._keys = [('{' if i == 0 else ',') + encode_basestring(column) + ':'
+                      for i, column in enumerate(self.columns)]
+        getter = operator.itemgetter(*self.columns)
+        self._values = getter if len(self.columns) > 1 else lambda mapping: (getter(mapping),)
+
+    def _value(self, value):
+        return self.backend.dumps(value).decode('utf-8')
+
+    def encode(self, rows):
+        """Fragment with the JSON array of `rows` (sequences of values in column order)"""
+        keys, suffix, other = self._keys, self.suffix, self._value
+        objects = []
+        for row in rows:
+            parts = [key + _SCALARS.get(type(value), other)(value) for key, value in zip(keys, row)]
+            if suffix is not None:
+                parts.append(suffix(row))
+            parts.append('}')
+            objects.append(''.join(parts))
+        return Fragment(('[' + ','.join(objects) + ']').encode('utf-8'))
+
+    def encode_mappings(self, mappings):
+        """Same as encode(), for dicts keyed by column (e.g. the imoveis returned by func)"""
+        return self.encode(map(self._values, mappings))
+
+
+class JSONProvider(_BaseJSONProvider):
+    """
+    Flask JSON provider (app.json) on top of a pluggable backend.
+
+    jsonify() bodies are encoded straight to bytes, compact unless the
+    application sets JSON_PRETTY or the request asks for ?pretty=1. Keys keep
+    their insertion order. Fragment values at the top level of a dict body
+    are spliced in without being encoded again.
+    """
+
+    def __init__(self, app, backend='auto'):
+        super().__init__(app)
+        self.backend = get_backend(backend)
+
+    def _pretty(self):
+        if has_request_context() and request.args.get('pretty', '').lower() in PRETTY_VALUES:
+            return True
+        return self._app.config.get('JSON_PRETTY', False)
+
+    def dumps(self, obj, **kwargs):
+        return self.backend.dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return self.backend.loads(s)
+
+    def _dumps_with_fragments(self, obj, pretty):
+        if pretty:
+            # Modo de depuração: decodifica os fragmentos para indentar tudo junto
+            obj = {key: self.backend.loads(value.data) if isinstance(value, Fragment) else value
+                   for key, value in obj.items()}
+            return self.backend.dumps(obj, pretty=True)
+        members = [encode_basestring(key).encode('utf-8') + b':'
+                   + (value.data if isinstance(value, Fragment) else self.backend.dumps(value))
+                   for key, value in obj.items()]
+        return b'{' + b','.join(members) + b'}'
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self._pretty()
+        if isinstance(obj, dict) and any(isinstance(value, Fragment) for value in obj.values()):
+            body = self._dumps_with_fragments(obj, pretty)
+        else:
+            body = self.backend.dumps(obj, pretty=pretty)
+        return self._app.response_class(body, mimetype='application/json')
@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+Pre-fork multi-process server for the Imoveis API
+
+The master process binds the listening socket, loads the application (unless
+--no-preload) and forks N workers that share the socket. Each worker serves
+requests with a bounded thread pool and opens its own database connections
+after the fork (db.py resets its pool in the child).
+
+Usage:
+    python server.py                                  # um worker por CPU
+    python server.py --workers 16 --threads 8 --bind 0.0.0.0:5000
+    python server.py --max-requests 10000 --max-requests-jitter 1000
+    python server.py --app wsgi_module:factory        # qualquer fábrica WSGI
+
+Signals (sent to the master):
+    SIGTERM, SIGINT  stop accepting, finish in-flight requests and exit
+    SIGHUP           graceful reload: start a new generation of workers and
+                     retire the old one once the new workers are ready. With
+                     --no-preload the new workers import the code again, so
+                     code changes are picked up too
+    SIGUSR1          print per-worker stats (also every --stats-interval seconds)
+
+Workers are recycled after --max-requests requests (plus a random jitter, so
+they don't all restart at once) and replaced if they die.
+
+Long-lived responses (Server-Sent Events) call environ['server.detach'] and
+move to up to --streams extra threads per worker (default 8 per --threads
+thread), so open streams never use up the --threads pool. Each open stream
+keeps a mostly idle thread, with its own stack, for the whole connection.
+They are ended when the worker stops or is recycled.
+"""
+
+import argparse
+import functools
+import importlib
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.sharedctypes import RawArray
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from werkzeug.wsgi import ClosingIterator
+
+# Campos de cada worker na memória compartilhada com o master
+PID, GENERATION, STARTED, READY, REQUESTS, ERRORS, IN_FLIGHT, BUSY_TIME = range(8)
+SLOT_FIELDS = 8
+
+# --streams padrão: conexões de /imoveis/stream por thread de --threads
+STREAMS_PER_THREAD = 8
+
+
+def default_workers():
+    """CPUs disponíveis para este processo"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def parse_bind(bind):
+    host, _, port = bind.rpartition(':')
+    return host or '0.0.0.0', int(port)
+
+
+def load_app(spec):
+    """Importa 'modulo:fabrica' e chama a fábrica para criar a aplicação WSGI"""
+    module_name, _, factory_name = spec.partition(':')
+    module = importlib.import_module(module_name)
+    return getattr(module, factory_name or 'create_app')()
+
+
+class StatsTable:
+    """Per-worker counters in shared memory, written by workers and read by the master"""
+
+    def __init__(self, slots):
+        self.slots = slots
+        self.values = RawArray('d', slots * SLOT_FIELDS)
+
+    def get(self, slot, field):
+        return self.values[slot * SLOT_FIELDS + field]
+
+    def set(self, slot, field, value):
+        self.values[slot * SLOT_FIELDS + field] = value
+
+    def add(self, slot, field, value):
+        self.values[slot * SLOT_FIELDS + field] += value
+
+    def claim(self, generation):
+        """Reserve a free slot for a worker about to be forked; None if all are taken"""
+        for slot in range(self.slots):
+            if self.get(slot, PID) == 0:
+                for field in range(SLOT_FIELDS):
+                    self.set(slot, field, 0)
+                self.set(slot, PID, -1)
+                self.set(slot, GENERATION, generation)
+                self.set(slot, STARTED, time.time())
+                return slot
+        return None
+
+    def release(self, slot):
+        self.set(slot, PID, 0)
+
+    def snapshot(self, slot):
+        now = time.time()
+        started = self.get(slot, STARTED)
+        return {
+            'pid': int(self.get(slot, PID)),
+            'generation': int(self.get(slot, GENERATION)),
+            'ready': bool(self.get(slot, READY)),
+            'uptime_s': round(now - started, 1) if started else 0.0,
+            'requests': int(self.get(slot, REQUESTS)),
+            'errors': int(self.get(slot, ERRORS)),
+            'in_flight': int(self.get(slot, IN_FLIGHT)),
+            'busy_s': round(self.get(slot, BUSY_TIME), 3),
+        }
+
+
+class StatsMiddleware:
+    """WSGI middleware that updates the worker's stats slot and triggers recycling"""
+
+    def __init__(self, app, stats, slot, max_requests, on_limit):
+        self.app = app
+        self.stats = stats
+        self.slot = slot
+        self.max_requests = max_requests
+        self.on_limit = on_limit
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self._count += 1
+            self.stats.add(self.slot, REQUESTS, 1)
+            self.stats.add(self.slot, IN_FLIGHT, 1)
+            if self.max_requests and self._count == self.max_requests:
+                self.on_limit()
+        inicio = time.perf_counter()
+
+        def start_response_com_status(status, headers, exc_info=None):
+            if status.startswith('5'):
+                with self._lock:
+                    self.stats.add(self.slot, ERRORS, 1)
+            return start_response(status, headers, exc_info)
+
+        def terminar():
+            with self._lock:
+                self.stats.add(self.slot, IN_FLIGHT, -1)
+                self.stats.add(self.slot, BUSY_TIME, time.perf_counter() - inicio)
+
+        try:
+            resposta = self.app(environ, start_response_com_status)
+        except BaseException:
+            terminar()
+            raise
+        # A requisição só termina quando o corpo da resposta foi todo enviado
+        return ClosingIterator(resposta, terminar)
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Request handler without the per-request access log line"""
+
+    def log_request(self, code='-', size='-'):
+        pass
+
+
+class DetachableRequestHandler(WSGIRequestHandler):
+    """Request handler that offers environ['server.detach'] to the application"""
+
+    def make_environ(self):
+        environ = super().make_environ()
+        environ['server.detach'] = functools.partial(self.server.detach, self)
+        return environ
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """
+    WSGI server that serves connections on a fixed-size thread pool.
+
+    The accept loop blocks while every thread is busy, leaving new
+    connections in the shared backlog for the other workers.
+
+    A request with a long-lived response calls environ['server.detach'](on_stop)
+    to give its slot back to the pool: it keeps its thread, counted against
+    `streams` instead of `threads`, and its connection is closed when the
+    response ends. close_streams() calls every on_stop callback so those
+    responses end before the pool is shut down.
+    """
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads, handler=None, fd=None, streams=0):
+        handler = handler or WSGIRequestHandler
+        if not issubclass(handler, DetachableRequestHandler):
+            handler = type('Handler', (DetachableRequestHandler, handler), {})
+        super().__init__(host, port, app, handler=handler, fd=fd)
+        self.executor = ThreadPoolExecutor(max_workers=threads + streams, thread_name_prefix='http')
+        self.slots = threading.BoundedSemaphore(threads)
+        self.stream_slots = threading.BoundedSemaphore(streams) if streams else None
+        self.stopping = False
+        self._on_stop = []
+        self._stop_lock = threading.Lock()
+        self._local = threading.local()
+
+    def process_request(self, request, client_address):
+        self.slots.acquire()
+        self.executor.submit(self._process_request_thread, request, client_address)
+
+    def _process_request_thread(self, request, client_address):
+        self._local.detached = False
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            (self.stream_slots if self._local.detached else self.slots).release()
+
+    def detach(self, handler, on_stop=None):
+        """
+        Move the current request out of the request pool.
+
+        Args:
+            handler: Request handler of the current connection
+            on_stop (callable, optional): Called by close_streams() to end the response
+
+        Returns:
+            bool: False if there is no free stream thread or the worker is stopping
+        """
+        if self._local.detached:
+            return True
+        with self._stop_lock:
+            if self.stopping or self.stream_slots is None or not self.stream_slots.acquire(blocking=False):
+                return False
+            if on_stop is not None and on_stop not in self._on_stop:
+                self._on_stop.append(on_stop)
+        self._local.detached = True
+        # Uma conexão de streaming não volta a ser usada para outras requisições
+        handler.close_connection = True
+        self.slots.release()
+        return True
+
+    def close_streams(self):
+        """End the detached responses (the worker is stopping)"""
+        with self._stop_lock:
+            self.stopping = True
+            callbacks = list(self._on_stop)
+        for callback in callbacks:
+            callback()
+
+    def server_close(self):
+        super().server_close()
+        if hasattr(self, 'executor'):
+            self.executor.shutdown(wait=True)
+
+
+def run_worker(args, sock, app, stats, slot):
+    """Loop principal de um worker; nunca retorna"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    random.seed()
+    status = 0
+    try:
+        if app is None:
+            app = load_app(args.app)
+
+        server = None
+
+        def parar():
+            # shutdown() espera o loop de accept terminar: não pode rodar nele
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        max_requests = 0
+        if args.max_requests:
+            max_requests = args.max_requests + random.randint(0, args.max_requests_jitter)
+
+        host, port = sock.getsockname()[:2]
+        handler = WSGIRequestHandler if args.access_log else QuietRequestHandler
+        # Conexões keep-alive ociosas liberam a thread depois de --keepalive segundos
+        handler = type('Handler', (handler,), {'timeout': args.keepalive})
+        server = PooledWSGIServer(host, port, StatsMiddleware(app, stats, slot, max_requests, parar),
+                                  threads=args.threads, handler=handler, fd=sock.fileno(),
+                                  streams=args.streams)
+        signal.signal(signal.SIGTERM, lambda signum, frame: parar())
+        stats.set(slot, READY, 1)
+        server.serve_forever()
+        # Sem isso, server_close() esperaria para sempre pelos streams abertos
+        server.close_streams()
+        server.server_close()
+    except Exception as e:
+        print(f"❌ Worker {os.getpid()} falhou: {e}", file=sys.stderr, flush=True)
+        status = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(status)
+
+
+class Master:
+    """Forks the workers, keeps their number constant and handles the control signals"""
+
+    def __init__(self, args):
+        self.args = args
+        self.workers = {}  # pid -> (slot, generation)
+        self.retiring = {}  # pid -> momento do SIGTERM
+        self.generation = 0
+        # Espaço para a geração atual e gerações anteriores ainda terminando requisições
+        self.stats = StatsTable(args.workers * 3)
+        self.spawn_after = 0.0
+        self.app = None
+        self.sock = None
+        self.stopping = False
+        self.reload_requested = False
+        self.stats_requested = False
+
+    def bind(self):
+        host, port = parse_bind(self.args.bind)
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(self.args.backlog)
+        sock.set_inheritable(True)
+        self.sock = sock
+        return sock.getsockname()[:2]
+
+    def spawn(self):
+        slot = self.stats.claim(self.generation)
+        if slot is None:
+            return None
+        pid = os.fork()
+        if pid == 0:
+            self.stats.set(slot, PID, os.getpid())
+            run_worker(self.args, self.sock, self.app, self.stats, slot)
+        self.stats.set(slot, PID, pid)
+        self.workers[pid] = (slot, self.generation)
+        return pid
+
+    def slot_of(self, pid):
+        return self.workers[pid][0]
+
+    def current_workers(self):
+        return [pid for pid, (_slot, gen) in self.workers.items()
+                if gen == self.generation and pid not in self.retiring]
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid not in self.workers:
+                continue
+            self.stats.release(self.slot_of(pid))
+            self.workers.pop(pid)
+            self.retiring.pop(pid, None)
+            codigo = os.waitstatus_to_exitcode(status)
+            if not self.stopping and codigo != 0:
+                print(f"⚠️  Worker {pid} saiu com código {codigo}", file=sys.stderr, flush=True)
+                # Evita recriar em loop um worker que falha ao iniciar
+                self.spawn_after = time.monotonic() + 1.0
+
+    def retire(self, pid):
+        if pid in self.retiring:
+            return
+        self.retiring[pid] = time.monotonic()
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def kill_stuck(self):
+        limite = time.monotonic() - self.args.graceful_timeout
+        for pid, desde in list(self.retiring.items()):
+            if desde < limite:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def reload(self):
+        print('🔄 Recarregando workers', file=sys.stderr, flush=True)
+        self.generation += 1
+        if not self.args.no_preload:
+            self.app = load_app(self.args.app)
+
+    def retire_old_generation(self):
+        """Aposenta a geração anterior quando todos os workers novos estão prontos"""
+        antigos = [pid for pid, (_slot, gen) in self.workers.items()
+                   if gen != self.generation and pid not in self.retiring]
+        if not antigos:
+            return
+        novos = self.current_workers()
+        prontos = [pid for pid in novos if self.stats.get(self.slot_of(pid), READY)]
+        if len(prontos) >= self.args.workers:
+            for pid in antigos:
+                self.retire(pid)
+
+    def print_stats(self):
+        linhas = [self.stats.snapshot(self.slot_of(pid)) for pid in sorted(self.workers)]
+        print(f"\n📊 Workers ({len(linhas)}), geração {self.generation}:", file=sys.stderr)
+        print(f"   {'pid':>7} {'ger':>4} {'pronto':>6} {'uptime':>8} {'req':>9} {'erros':>6} "
+              f"{'ativas':>6} {'ocupado':>9}", file=sys.stderr)
+        for w in linhas:
+            print(f"   {w['pid']:>7} {w['generation']:>4} {'sim' if w['ready'] else 'não':>6} "
+                  f"{w['uptime_s']:>7.0f}s {w['requests']:>9} {w['errors']:>6} {w['in_flight']:>6} "
+                  f"{w['busy_s']:>8.1f}s", file=sys.stderr)
+        total = sum(w['requests'] for w in linhas)
+        print(f"   total: {total} requisições", file=sys.stderr, flush=True)
+        return linhas
+
+    def install_signals(self):
+        def parar(signum, frame):
+            self.stopping = True
+
+        def recarregar(signum, frame):
+            self.reload_requested = True
+
+        def estatisticas(signum, frame):
+            self.stats_requested = True
+
+        signal.signal(signal.SIGTERM, parar)
+        signal.signal(signal.SIGINT, parar)
+        signal.signal(signal.SIGHUP, recarregar)
+        signal.signal(signal.SIGUSR1, estatisticas)
+
+    def run(self):
+        host, port = self.bind()
+        if not self.args.no_preload:
+            self.app = load_app(self.args.app)
+        print(f"🚀 Escutando em http://{host}:{port} ({self.args.workers} workers, "
+              f"{self.args.threads} threads cada)", flush=True)
+        self.install_signals()
+        proximo_stats = time.monotonic() + self.args.stats_interval if self.args.stats_interval else None
+
+        while not self.stopping:
+            self.reap()
+            if self.reload_requested:
+                self.reload_requested = False
+                self.reload()
+            while len(self.current_workers()) < self.args.workers and time.monotonic() >= self.spawn_after:
+                if self.spawn() is None:
+                    break
+            self.retire_old_generation()
+            self.kill_stuck()
+            if self.stats_requested or (proximo_stats and time.monotonic() >= proximo_stats):
+                self.stats_requested = False
+                self.print_stats()
+                if proximo_stats:
+                    proximo_stats = time.monotonic() + self.args.stats_interval
+            time.sleep(0.1)
+
+        self.shutdown()
+
+    def shutdown(self):
+        print('🛑 Encerrando workers', file=sys.stderr, flush=True)
+        self.print_stats()
+        for pid in list(self.workers):
+            self.retire(pid)
+        while self.workers:
+            self.reap()
+            self.kill_stuck()
+            time.sleep(0.05)
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor pre-fork para a API de imóveis')
+    parser.add_argument('--app', default='app:create_app', help='Fábrica da aplicação WSGI (modulo:funcao)')
+    parser.add_argument('--bind', default='0.0.0.0:5000', help='Endereço host:porta')
+    parser.add_argument('--workers', type=int, default=default_workers(),
+                        help='Processos worker (default: número de CPUs)')
+    parser.add_argument('--threads', type=int, default=8, help='Threads por worker')
+    parser.add_argument('--streams', type=int, default=None,
+                        help='Conexões de longa duração (/imoveis/stream) por worker, fora do pool de --threads; '
+                             'cada uma prende uma thread parada, com a própria pilha (até 8 MB de memória '
+                             f'virtual no Linux), enquanto durar (default: {STREAMS_PER_THREAD} * --threads)')
+    parser.add_argument('--backlog', type=int, default=2048, help='Fila de conexões do socket')
+    parser.add_argument('--keepalive', type=float, default=5.0,
+                        help='Segundos que uma conexão keep-alive ociosa segura uma thread')
+    parser.add_argument('--max-requests', type=int, default=0,
+                        help='Recicla o worker depois de N requisições (0 = nunca)')
+    parser.add_argument('--max-requests-jitter', type=int, default=0,
+                        help='Acréscimo aleatório em --max-requests para os workers não reciclarem juntos')
+    parser.add_argument('--graceful-timeout', type=float, default=30.0,
+                        help='Segundos para um worker terminar as requisições antes do SIGKILL')
+    parser.add_argument('--stats-interval', type=float, default=0,
+                        help='Imprime as estatísticas dos workers a cada N segundos (0 = só com SIGUSR1)')
+    parser.add_argument('--no-preload', action='store_true',
+                        help='Carrega a aplicação em cada worker depois do fork em vez de no master')
+    parser.add_argument('--access-log', action='store_true', help='Registra cada requisição')
+    args = parser.parse_args()
+
+    if args.workers < 1 or args.threads < 1:
+        parser.error('--workers e --threads devem ser pelo menos 1')
+    if args.streams is None:
+        args.streams = STREAMS_PER_THREAD * args.threads
+    if args.streams < 0:
+        parser.error('--streams não pode ser negativo')
+    if args.workers > 1:
+        # Cada cliente de /imoveis/stream precisa ver as escritas feitas em qualquer worker
+        os.environ.setdefault('EVENTS_BACKEND', 'sqlite')
+    # A aplicação dimensiona o controle de admissão pelas threads de cada worker
+    os.environ['SERVER_THREADS'] = str(args.threads)
+
+    Master(args).run()
+
+
+if __name__ == '__main__':
+    main()
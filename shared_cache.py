@@ -0,0 +1,329 @@
+import datetime
+import json
+import os
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+
+MISS = object()
+
+DEFAULT_TTL = 30.0
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_ENTRY_BYTES = 4 * 1024 * 1024
+# Chaves por consulta em get_many (o SQLite limita o número de parâmetros)
+MANY_CHUNK = 500
+
+
+def default_cache_dir():
+    """
+    Private directory for the cache file, in tmpfs when available.
+
+    /dev/shm and the temp dir are writable by every local user, so the file
+    goes into a per-user subdirectory with mode 0700 that must already be
+    owned by us: nobody else can create the file first or write to it.
+    """
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    if not hasattr(os, 'getuid'):
+        # Windows: o diretório temporário já é do usuário
+        return base
+    path = os.path.join(base, f'imoveis-cache-{os.getuid()}')
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    check_owned(path, private=True)
+    return path
+
+
+def check_owned(path, private=False):
+    """
+    Refuse a cache file or directory another user could have planted or can modify.
+
+    Raises:
+        PermissionError: path is a symlink, belongs to another user, or is
+            writable by others (readable too, when private)
+    """
+    if not hasattr(os, 'getuid'):
+        return
+    info = os.lstat(path)
+    forbidden = 0o077 if private else 0o022
+    if stat.S_ISLNK(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & forbidden:
+        raise PermissionError(f"Cache recusado: {path} não pertence ao usuário atual ou tem permissões abertas demais")
+
+
+def _json_default(value):
+    if isinstance(value, datetime.datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'__date__': value.isoformat()}
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def _json_object(obj):
+    if len(obj) == 1:
+        if '__date__' in obj:
+            return datetime.date.fromisoformat(obj['__date__'])
+        if '__datetime__' in obj:
+            return datetime.datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+
+def encode(value):
+    """
+    Serialize a cached value as JSON (dates tagged so they come back as dates).
+
+    JSON rather than pickle: reading an entry can never execute code, even
+    if the file was tampered with.
+    """
+    return json.dumps(value, default=_json_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def decode(data):
+    return json.loads(data, object_hook=_json_object)
+
+
+class NullCache:
+    """Cache that never stores anything (caching disabled)"""
+
+    def version(self, namespace):
+        return 0
+
+    def get(self, namespace, key):
+        return MISS, 0
+
+    def set(self, namespace, key, value, version, ttl=None):
+        pass
+
+    def get_many(self, namespace, keys):
+        return {}, 0
+
+    def set_many(self, namespace, items, version, ttl=None):
+        pass
+
+    def invalidate(self, namespace):
+        pass
+
+    def get_or_load(self, namespace, key, loader, ttl=None):
+        return loader()
+
+    def status(self):
+        return {'backend': 'none'}
+
+
+class SQLiteCache:
+    """
+    Cache shared by every process on the host, stored in one SQLite file.
+
+    Keys are versioned per namespace: invalidate() bumps the namespace
+    version, which makes every entry written under the old version
+    unreachable for all processes at once. A reader records the version
+    *before* loading from the database and stores the value under it, so a
+    load that races with a write can never be served after the write's
+    invalidation.
+    """
+
+    def __init__(self, path, prefix='', default_ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES,
+                 max_entry_bytes=DEFAULT_MAX_ENTRY_BYTES, clock=time.time):
+        self.path = path
+        # Separa bancos diferentes que usem o mesmo arquivo de cache
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_entry_bytes = max_entry_bytes
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._local = threading.local()
+        if os.path.exists(path):
+            check_owned(path)
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS versions (
+                    namespace TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    value BLOB NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+
+    def _connection(self):
+        # Uma conexão por thread e por processo (o filho de um fork não reusa a do pai)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def version(self, namespace):
+        row = self._connection().execute(
+            "SELECT version FROM versions WHERE namespace = ?", (self.prefix + namespace,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get(self, namespace, key):
+        """
+        Look up a key.
+
+        Returns:
+            tuple: (value or MISS, current namespace version)
+        """
+        row = self._connection().execute("""
+            SELECT COALESCE(v.version, 0), e.version, e.expires_at, e.value
+            FROM (SELECT ? AS namespace) n
+            LEFT JOIN versions v ON v.namespace = n.namespace
+            LEFT JOIN entries e ON e.namespace = n.namespace AND e.key = ?
+        """, (self.prefix + namespace, key)).fetchone()
+        current, version, expires_at, value = row
+        if value is not None and version == current and expires_at > self.clock():
+            self.hits += 1
+            return decode(value), current
+        self.misses += 1
+        return MISS, current
+
+    def set(self, namespace, key, value, version, ttl=None):
+        """Store a value loaded while the namespace was at `version`"""
+        try:
+            data = encode(value)
+        except (TypeError, ValueError):
+            return
+        if len(data) > self.max_entry_bytes:
+            return
+        expires_at = self.clock() + (self.default_ttl if ttl is None else ttl)
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (namespace, key, version, expires_at, value) VALUES (?, ?, ?, ?, ?)",
+            (self.prefix + namespace, key, version, expires_at, data)
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.prune()
+
+    def get_many(self, namespace, keys):
+        """
+        Look up several keys with one query per MANY_CHUNK keys.
+
+        Returns:
+            tuple: (dict of the keys found and their values, namespace version
+                read with the first chunk, to be passed to set_many)
+        """
+        found = {}
+        version = None
+        conn = self._connection()
+        for start in range(0, len(keys), MANY_CHUNK):
+            chunk = keys[start:start + MANY_CHUNK]
+            # Versão e entradas na mesma consulta: uma invalidação no meio não mistura as duas
+            rows = conn.execute(f"""
+                SELECT v.version, e.key, e.value
+                FROM (SELECT COALESCE((SELECT version FROM versions WHERE namespace = ?), 0) AS version) v
+                LEFT JOIN entries e ON e.namespace = ? AND e.version = v.version AND e.expires_at > ?
+                    AND e.key IN ({', '.join('?' * len(chunk))})
+            """, (self.prefix + namespace, self.prefix + namespace, self.clock(), *chunk)).fetchall()
+            if version is None:
+                version = rows[0][0]
+            for _, key, value in rows:
+                if key is not None:
+                    found[key] = decode(value)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found, version or 0
+
+    def set_many(self, namespace, items, version, ttl=None):
+        """Store several values loaded while the namespace was at `version`"""
+        expires_at = self.clock() + (self.default_ttl if ttl is None else ttl)
+        rows = []
+        for key, value in items.items():
+            try:
+                data = encode(value)
+            except (TypeError, ValueError):
+                continue
+            if len(data) <= self.max_entry_bytes:
+                rows.append((self.prefix + namespace, key, version, expires_at, data))
+        self._connection().executemany(
+            "INSERT OR REPLACE INTO entries (namespace, key, version, expires_at, value) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        before = self._writes
+        self._writes += len(rows)
+        if self._writes // 100 != before // 100:
+            self.prune()
+
+    def invalidate(self, namespace):
+        """Drop every entry of the namespace, in every process"""
+        self._connection().execute("""
+            INSERT INTO versions (namespace, version) VALUES (?, 1)
+            ON CONFLICT(namespace) DO UPDATE SET version = version + 1
+        """, (self.prefix + namespace,))
+
+    def get_or_load(self, namespace, key, loader, ttl=None):
+        value, version = self.get(namespace, key)
+        if value is MISS:
+            value = loader()
+            self.set(namespace, key, value, version, ttl)
+        return value
+
+    def prune(self):
+        """Remove expired and outdated entries, then the oldest ones above max_entries"""
+        conn = self._connection()
+        conn.execute("""
+            DELETE FROM entries
+            WHERE expires_at <= ?
+               OR version <> COALESCE((SELECT version FROM versions v WHERE v.namespace = entries.namespace), 0)
+        """, (self.clock(),))
+        conn.execute("""
+            DELETE FROM entries WHERE rowid IN (
+                SELECT rowid FROM entries ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+
+    def status(self):
+        total = self.hits + self.misses
+        return {
+            'backend': 'sqlite',
+            'path': self.path,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else None
+        }
+
+
+_cache = NullCache()
+
+
+def configure(backend='none', path=None, prefix='', ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+    """
+    Set the process cache.
+
+    Args:
+        backend (str): 'sqlite' or 'none'
+        path (str, optional): SQLite file (default: imoveis-cache.sqlite3 in /dev/shm or the temp dir)
+        prefix (str): Prepended to every namespace, e.g. the database the data comes from
+        ttl (float): Seconds an entry lives even without invalidation
+        max_entries (int): Entries kept after pruning
+    """
+    global _cache
+    if backend == 'sqlite':
+        path = path or os.path.join(default_cache_dir(), 'imoveis-cache.sqlite3')
+        _cache = SQLiteCache(path, prefix=prefix, default_ttl=ttl, max_entries=max_entries)
+    elif backend in ('none', '', None):
+        _cache = NullCache()
+    else:
+        raise ValueError(f"Backend de cache desconhecido: {backend}")
+    return _cache
+
+
+def get_cache():
+    return _cache
@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_KEYS = 1000
+
+
+class _Flight:
+    __slots__ = ('started', 'done', 'result', 'error', 'waiters')
+
+    def __init__(self, started):
+        self.started = started
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class Group:
+    """
+    Collapses concurrent identical calls into one.
+
+    The first caller of do(key, fn) runs fn; callers arriving with the same
+    key while it runs wait for it and receive the same result (or the same
+    exception). Nothing is kept once the call returns, so this is not a
+    cache: it only removes duplicate in-flight work, such as a burst of
+    requests for the same listing hitting the database at once.
+    """
+
+    def __init__(self, max_keys=DEFAULT_MAX_KEYS, clock=time.time):
+        self.max_keys = max_keys
+        self.clock = clock
+        self.calls = 0
+        self.collapsed = 0
+        self._flights = {}
+        self._stats = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _count(self, key, field):
+        self.calls += 1
+        self.collapsed += field == 'collapsed'
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = {'calls': 0, 'executions': 0, 'collapsed': 0}
+            if len(self._stats) > self.max_keys:
+                self._stats.popitem(last=False)
+        else:
+            self._stats.move_to_end(key)
+        stats['calls'] += 1
+        stats[field] += 1
+
+    def do(self, key, fn, not_before=None):
+        """
+        Run fn once for all concurrent callers of `key`.
+
+        Args:
+            key (str): Identifies identical calls
+            fn (callable): Loads the value
+            not_before (float, optional): Only join a call started at or after
+                this timestamp (e.g. the caller's last write), so a caller never
+                receives a result read before its own write
+
+        Returns:
+            The value returned by fn
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and (not_before is None or flight.started >= not_before):
+                flight.waiters += 1
+                self._count(key, 'collapsed')
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight(self.clock())
+                self._count(key, 'executions')
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+    def forget(self):
+        """
+        Stop new callers from joining the calls in flight.
+
+        Called after a write commits: calls started before it may have read
+        the old data, so later callers start fresh ones.
+        """
+        with self._lock:
+            self._flights.clear()
+
+    def status(self, top=10):
+        """Totals and the keys with the most collapsed calls"""
+        with self._lock:
+            stats = [(key, dict(values)) for key, values in self._stats.items()]
+            in_flight = len(self._flights)
+            calls, collapsed = self.calls, self.collapsed
+        stats.sort(key=lambda item: item[1]['collapsed'], reverse=True)
+        return {
+            'in_flight': in_flight,
+            'calls': calls,
+            'collapsed': collapsed,
+            'top_keys': {key: values for key, values in stats[:top] if values['collapsed']}
+        }
+
+
+group = Group()
+
+
+def _reset_after_fork():
+    # O lock pode ter sido copiado travado por outra thread do pai
+    global group
+    group = Group(group.max_keys)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
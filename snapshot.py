@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Read-only binary snapshot of the imoveis table, served through mmap
+
+Read-heavy workers (read-only replicas of the API) can answer the listings
+from a snapshot file instead of the database. The file is memory-mapped, so
+every worker on the host shares the same page-cache copy and nothing is
+parsed at startup. Publishing a new snapshot writes a temporary file and
+renames it over the old one; readers notice the new inode and remap, while
+requests already running keep using the old mapping.
+
+Layout (little-endian):
+    header    magic, format version, row count, creation time, section offsets
+    records   one fixed-width record per imovel, sorted by id
+    heap      deduplicated UTF-8 strings referenced by (offset, length)
+    indexes   tipo and cidade: sorted (key, postings start, postings count)
+    postings  record numbers, in id order, for each index key
+
+Usage:
+    python snapshot.py --out /dev/shm/imoveis.snap
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+import unicodedata
+from datetime import date
+
+MAGIC = b'IMVSNAP1'
+FORMAT_VERSION = 1
+
+# magic, version, count, created_at, records, heap, tipo index, cidade index, postings
+HEADER = struct.Struct('<8sIIdQQQQQ')
+# id, valor em centavos, data_aquisicao (ordinal), 6 strings (offset, tamanho)
+RECORD = struct.Struct('<iqi' + 'II' * 6)
+INDEX_ENTRY = struct.Struct('<IIII')
+POSTING = struct.Struct('<I')
+
+NULL_LENGTH = 0xFFFFFFFF
+NULL_VALOR = -(2 ** 63)
+STRING_COLUMNS = ('logradouro', 'tipo_logradouro', 'bairro', 'cidade', 'cep', 'tipo')
+COLUMNS = ('id',) + STRING_COLUMNS + ('valor', 'data_aquisicao')
+# Posição do (offset, tamanho) de cada string dentro de RECORD
+STRING_FIELDS = {column: 3 + 2 * i for i, column in enumerate(STRING_COLUMNS)}
+
+DEFAULT_CHECK_INTERVAL = 1.0
+
+
+def normalize_key(value):
+    """
+    Index key for tipo and cidade.
+
+    Approximates the utf8mb4_unicode_ci comparison the database uses:
+    case- and accent-insensitive, trailing spaces ignored.
+    """
+    decomposed = unicodedata.normalize('NFKD', value)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold().rstrip(' ')
+
+
+class _Heap:
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = {}
+
+    def add(self, value):
+        if value is None:
+            return 0, NULL_LENGTH
+        encoded = value.encode('utf-8')
+        offset = self.offsets.get(encoded)
+        if offset is None:
+            offset = self.offsets[encoded] = len(self.data)
+            self.data += encoded
+        return offset, len(encoded)
+
+
+def build_snapshot(rows, path):
+    """
+    Write a snapshot atomically.
+
+    Args:
+        rows (iterable): Tuples (id, logradouro, tipo_logradouro, bairro, cidade,
+            cep, tipo, valor, data_aquisicao), as selected from imoveis
+        path (str): Destination file; replaced only once the new file is complete
+
+    Returns:
+        int: Number of records written
+    """
+    rows = sorted(rows, key=lambda row: row[0])
+    heap = _Heap()
+    records = bytearray()
+    postings_by_dimension = {'tipo': {}, 'cidade': {}}
+
+    for number, row in enumerate(rows):
+        imovel_id, logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data_aquisicao = row
+        valor = NULL_VALOR if valor is None else int(round(valor * 100))
+        ordinal = data_aquisicao.toordinal() if data_aquisicao is not None else 0
+        refs = []
+        for value in (logradouro, tipo_logradouro, bairro, cidade, cep, tipo):
+            refs.extend(heap.add(value))
+        records += RECORD.pack(imovel_id, valor, ordinal, *refs)
+        for dimension, value in (('tipo', tipo), ('cidade', cidade)):
+            if value is not None:
+                postings_by_dimension[dimension].setdefault(normalize_key(value), []).append(number)
+
+    postings = bytearray()
+    indexes = {}
+    for dimension, by_key in postings_by_dimension.items():
+        index = bytearray(POSTING.pack(len(by_key)))
+        for key in sorted(by_key, key=lambda k: k.encode('utf-8')):
+            numbers = by_key[key]
+            key_offset, key_length = heap.add(key)
+            index += INDEX_ENTRY.pack(key_offset, key_length, len(postings) // POSTING.size, len(numbers))
+            postings += struct.pack(f'<{len(numbers)}I', *numbers)
+        indexes[dimension] = index
+
+    records_offset = HEADER.size
+    heap_offset = records_offset + len(records)
+    tipo_offset = heap_offset + len(heap.data)
+    cidade_offset = tipo_offset + len(indexes['tipo'])
+    postings_offset = cidade_offset + len(indexes['cidade'])
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(rows), time.time(), records_offset,
+                         heap_offset, tipo_offset, cidade_offset, postings_offset)
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(tmp_path, 'wb') as f:
+            for section in (header, records, heap.data, indexes['tipo'], indexes['cidade'], postings):
+                f.write(section)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return len(rows)
+
+
+class Snapshot:
+    """One mapped snapshot file; immutable once opened"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.count, self.created_at, self._records, self._heap,
+         tipo_offset, cidade_offset, self._postings) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Arquivo de snapshot inválido: {path}")
+        self._indexes = {'tipo': tipo_offset, 'cidade': cidade_offset}
+
+    def _string(self, offset, length):
+        if length == NULL_LENGTH:
+            return None
+        start = self._heap + offset
+        return self._map[start:start + length].decode('utf-8')
+
+    def _imovel(self, number, columns=COLUMNS):
+        """Decode one record; only the strings of the requested columns are read"""
+        fields = RECORD.unpack_from(self._map, self._records + number * RECORD.size)
+        imovel = {}
+        for column in columns:
+            if column == 'id':
+                imovel['id'] = fields[0]
+            elif column == 'valor':
+                imovel['valor'] = fields[1] / 100 if fields[1] != NULL_VALOR else None
+            elif column == 'data_aquisicao':
+                imovel['data_aquisicao'] = date.fromordinal(fields[2]) if fields[2] else None
+            else:
+                i = STRING_FIELDS[column]
+                imovel[column] = self._string(fields[i], fields[i + 1])
+        return imovel
+
+    def _id_at(self, number):
+        return struct.unpack_from('<i', self._map, self._records + number * RECORD.size)[0]
+
+    def get(self, imovel_id, columns=COLUMNS):
+        """Imovel by id (binary search over the records), or None"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._id_at(mid) < imovel_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._id_at(lo) == imovel_id:
+            return self._imovel(lo, columns)
+        return None
+
+    def all(self, columns=COLUMNS):
+        return [self._imovel(number, columns) for number in range(self.count)]
+
+    def _lookup(self, dimension, value):
+        """(start, count) of the postings for a tipo/cidade value"""
+        offset = self._indexes[dimension]
+        entries = POSTING.unpack_from(self._map, offset)[0]
+        offset += POSTING.size
+        key = normalize_key(value).encode('utf-8')
+        lo, hi = 0, entries
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key_offset, key_length, start, count = INDEX_ENTRY.unpack_from(self._map, offset + mid * INDEX_ENTRY.size)
+            candidate = self._map[self._heap + key_offset:self._heap + key_offset + key_length]
+            if candidate == key:
+                return start, count
+            if candidate < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return 0, 0
+
+    def find(self, dimension, value, columns=COLUMNS):
+        """Imoveis whose tipo or cidade matches value, in id order"""
+        start, count = self._lookup(dimension, value)
+        numbers = struct.unpack_from(f'<{count}I', self._map, self._postings + start * POSTING.size)
+        return [self._imovel(number, columns) for number in numbers]
+
+    def count_matching(self, dimension, value):
+        return self._lookup(dimension, value)[1]
+
+    def status(self):
+        return {
+            'path': self.path,
+            'count': self.count,
+            'created_at': self.created_at
+        }
+
+
+class SnapshotReader:
+    """
+    Current snapshot at a path, swapped when a new file is published.
+
+    The path is checked with os.stat at most every `check_interval` seconds;
+    a new inode means a new snapshot was renamed into place.
+    """
+
+    def __init__(self, path, check_interval=DEFAULT_CHECK_INTERVAL, clock=time.monotonic):
+        self.path = path
+        self.check_interval = check_interval
+        self.clock = clock
+        self._snapshot = Snapshot(path)
+        self._checked_at = clock()
+
+    def current(self):
+        now = self.clock()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                # Arquivo removido: continua servindo o último snapshot mapeado
+                return self._snapshot
+            if (stat.st_ino, stat.st_mtime_ns) != self._snapshot.identity:
+                self._snapshot = Snapshot(self.path)
+        return self._snapshot
+
+
+_reader = None
+
+
+def configure(path=None, check_interval=DEFAULT_CHECK_INTERVAL):
+    """
+    Serve reads from the snapshot at `path`, or from the database when path is None.
+
+    The reader is created in the master before the workers fork; each worker
+    then maps the same file.
+    """
+    global _reader
+    _reader = SnapshotReader(path, check_interval) if path else None
+    return _reader
+
+
+def get_snapshot():
+    """The current Snapshot, or None when reads go to the database"""
+    return _reader.current() if _reader is not None else None
+
+
+def export_from_database(path):
+    """Write a snapshot with every row of imoveis"""
+    from db import execute_query
+
+    query = """
+        SELECT id, logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data_aquisicao
+        FROM imoveis
+        ORDER BY id
+    """
+    return build_snapshot(execute_query(query, fetch_all=True, read_only=True), path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta a tabela imoveis para um snapshot binário")
+    parser.add_argument('--out', required=True, help="Arquivo do snapshot (substituído atomicamente)")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    print("📸 Exportando imóveis para o snapshot...")
+    try:
+        inicio = time.perf_counter()
+        total = export_from_database(args.out)
+    except Exception as e:
+        print(f"❌ Falha ao exportar snapshot: {e}")
+        return 2
+    tamanho = os.path.getsize(args.out)
+    print(f"✅ {total} imóveis em {args.out} ({tamanho / 1024 / 1024:.1f} MB, "
+          f"{time.perf_counter() - inicio:.1f}s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,206 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_FRESH_FOR = 5.0
+DEFAULT_STALE_FOR = 60.0
+DEFAULT_MAX_ENTRIES = 1000
+
+
+class _Entry:
+    __slots__ = ('value', 'loaded_at', 'tags', 'version', 'refreshing')
+
+    def __init__(self, value, loaded_at, tags, version):
+        self.value = value
+        self.loaded_at = loaded_at
+        self.tags = tags
+        self.version = version
+        self.refreshing = False
+
+
+class SWRCache:
+    """
+    In-process stale-while-revalidate cache for filtered listings.
+
+    An entry younger than `fresh_for` seconds is served as is. Up to
+    `stale_for` seconds after that it is still served immediately, and the
+    first such request starts a refresh in a background thread, so callers
+    never wait for the database while an entry is being revalidated. Older
+    entries are loaded synchronously.
+
+    Entries carry tags (e.g. ('tipo', 'casa')); invalidate(tags) drops every
+    entry with one of them at once. A load or refresh started before an
+    invalidation is not stored, so it cannot bring the old data back.
+
+    invalidate() only reaches this process. Callers also pass `version`, a
+    data version shared across processes (see func.versao_dados) read before
+    loading; an entry stored under another version is neither served nor
+    revalidated in the background but loaded again, so a write made by
+    another process is never served stale.
+    """
+
+    def __init__(self, fresh_for=DEFAULT_FRESH_FOR, stale_for=DEFAULT_STALE_FOR,
+                 max_entries=DEFAULT_MAX_ENTRIES, clock=time.monotonic, refresh_workers=2):
+        self.fresh_for = fresh_for
+        self.stale_for = stale_for
+        self.max_entries = max_entries
+        self.clock = clock
+        self.refresh_workers = refresh_workers
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _store(self, key, value, tags, generation, version):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = _Entry(value, self.clock(), tags, version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _refresh(self, key, loader, tags, stale):
+        try:
+            value = loader()
+        except Exception:
+            # Continua servindo o valor antigo; a próxima requisição tenta de novo
+            with self._lock:
+                self.refresh_errors += 1
+                stale.refreshing = False
+            return
+        with self._lock:
+            # Se a entrada foi invalidada durante a atualização, o valor lido pode ser anterior à escrita
+            if self._entries.get(key) is stale:
+                self._entries[key] = _Entry(value, self.clock(), tags, stale.version)
+
+    def _submit(self, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.refresh_workers,
+                                                thread_name_prefix='swr-refresh')
+        self._executor.submit(self._refresh, *args)
+
+    def get_or_load(self, key, loader, tags=(), version=None):
+        """
+        Value for key, from the cache when fresh or stale, otherwise from loader.
+
+        Args:
+            key (str): Cache key
+            loader (callable): Loads the value (called in a background thread
+                for refreshes)
+            tags (iterable): Tags used by invalidate()
+            version (optional): Current shared data version; entries stored
+                under another one are reloaded
+        """
+        tags = frozenset(tags)
+        with self._lock:
+            entry = self._entries.get(key)
+            generation = self._generation
+            if entry is not None and entry.version != version:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                age = self.clock() - entry.loaded_at
+                if age <= self.fresh_for:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return entry.value
+                if age <= self.fresh_for + self.stale_for:
+                    self.stale_hits += 1
+                    self._entries.move_to_end(key)
+                    start_refresh = not entry.refreshing
+                    if start_refresh:
+                        entry.refreshing = True
+                        self.refreshes += 1
+                    value = entry.value
+                else:
+                    entry = None
+            if entry is None:
+                self.misses += 1
+
+        if entry is not None:
+            if start_refresh:
+                self._submit(key, loader, tags, entry)
+            return value
+
+        value = loader()
+        self._store(key, value, tags, generation, version)
+        return value
+
+    def invalidate(self, tags=None):
+        """Drop the entries with any of `tags`, or every entry when tags is None"""
+        with self._lock:
+            self._generation += 1
+            if tags is None:
+                self._entries.clear()
+                return
+            tags = set(tags)
+            for key in [key for key, entry in self._entries.items() if entry.tags & tags]:
+                del self._entries[key]
+
+    def status(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'fresh_for': self.fresh_for,
+                'stale_for': self.stale_for,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'refreshes': self.refreshes,
+                'refresh_errors': self.refresh_errors
+            }
+
+
+class NullSWRCache:
+    """Stale-while-revalidate disabled: always loads"""
+
+    def get_or_load(self, key, loader, tags=(), version=None):
+        return loader()
+
+    def invalidate(self, tags=None):
+        pass
+
+    def status(self):
+        return None
+
+
+_cache = NullSWRCache()
+
+
+def configure(fresh_for=0, stale_for=DEFAULT_STALE_FOR, max_entries=DEFAULT_MAX_ENTRIES):
+    """
+    Set the process cache; fresh_for=0 disables it.
+
+    Args:
+        fresh_for (float): Seconds an entry is served without revalidation
+        stale_for (float): Further seconds it is served while refreshing in the background
+        max_entries (int): Least recently used entries beyond this are evicted
+    """
+    global _cache
+    if fresh_for and fresh_for > 0:
+        _cache = SWRCache(fresh_for, stale_for, max_entries)
+    else:
+        _cache = NullSWRCache()
+    return _cache
+
+
+def get_cache():
+    return _cache
+
+
+def _reset_after_fork():
+    # Threads de atualização e o lock não sobrevivem ao fork
+    if isinstance(_cache, SWRCache):
+        configure(_cache.fresh_for, _cache.stale_for, _cache.max_entries)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
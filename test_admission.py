@@ -0,0 +1,101 @@
+import pytest
+
+import admission
+from admission import AdmissionController, Overloaded, RateLimited, TokenBucket
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+def test_balde_reabastece_com_o_tempo():
+    balde = TokenBucket(rate=2, burst=4, now=0)
+    assert balde.take(4, 0) == 0
+    assert balde.take(1, 0) == 0.5
+    assert balde.take(1, 0.5) == 0
+
+
+def test_custo_acima_do_burst_deixa_o_balde_negativo():
+    balde = TokenBucket(rate=2, burst=4, now=0)
+    assert balde.take(10, 0) == 0
+    # 6 tokens de dívida mais o token pedido
+    assert balde.take(1, 0) == 3.5
+
+
+def test_limite_por_cliente_e_custo():
+    relogio = Relogio()
+    controle = AdmissionController(rate=10, burst=20, clock=relogio)
+    controle.admit('a', admission.COSTS['listing'])
+    controle.admit('a', admission.COSTS['listing'])
+    with pytest.raises(RateLimited) as erro:
+        controle.admit('a', admission.COSTS['lookup'])
+    assert erro.value.retry_after == 1
+    # Outro cliente tem o próprio balde
+    controle.admit('b', admission.COSTS['listing'])
+    relogio.agora += 0.1
+    controle.admit('a', admission.COSTS['lookup'])
+    assert controle.status()['rate_limited'] == 1
+
+
+def test_limite_de_concorrencia_rejeita_sem_enfileirar():
+    controle = AdmissionController(max_concurrent=2, queue_timeout=0)
+    controle.admit('a', 1)
+    controle.admit('b', 1)
+    with pytest.raises(Overloaded):
+        controle.admit('c', 1)
+    assert controle.status()['in_flight'] == 2
+    controle.release()
+    controle.admit('c', 1)
+    assert controle.status()['overloaded'] == 1
+
+
+def test_vagas_extras_so_se_estiverem_livres():
+    controle = AdmissionController(max_concurrent=3, queue_timeout=0)
+    controle.admit('a', 1)
+    assert controle.borrow(4) == 2
+    assert controle.borrow(1) == 0
+    controle.release(2)
+    assert controle.status()['in_flight'] == 1
+    assert AdmissionController().borrow(4) == 4
+
+
+def test_rejeicao_por_concorrencia_devolve_os_tokens():
+    controle = AdmissionController(rate=1, burst=10, max_concurrent=1, queue_timeout=0, clock=Relogio())
+    controle.admit('a', 1)
+    with pytest.raises(Overloaded):
+        controle.admit('b', 10)
+    controle.release()
+    controle.admit('b', 10)
+
+
+def test_clientes_parados_sao_descartados():
+    controle = AdmissionController(rate=1, max_clients=2, clock=Relogio())
+    for cliente in 'abc':
+        controle.admit(cliente, 1)
+    assert list(controle._buckets) == ['b', 'c']
+
+
+def test_rotas_respondem_429_com_retry_after(criar_app):
+    client = criar_app([], RATE_LIMIT=1, RATE_LIMIT_BURST=10).test_client()
+    assert client.get('/imoveis/tipo/casa').status_code == 200
+    resposta = client.get('/imoveis/tipo/casa')
+    assert resposta.status_code == 429
+    assert resposta.headers['Retry-After'] == '10'
+    # Outra chave de API tem o próprio limite
+    assert client.get('/imoveis/tipo/casa', headers={'X-API-Key': 'k'}).status_code == 200
+    assert admission.get_controller().status()['in_flight'] == 0
+
+
+def test_limite_padrao_acompanha_as_threads_do_servidor(monkeypatch, criar_app):
+    monkeypatch.delenv('SERVER_THREADS', raising=False)
+    app = criar_app()
+    assert app.config['MAX_CONCURRENT_REQUESTS'] == app.config['DATABASE']['pool_size']
+
+    # Como sob python server.py --threads 8: nenhuma thread livre recebe 503
+    monkeypatch.setenv('SERVER_THREADS', '8')
+    assert criar_app().config['MAX_CONCURRENT_REQUESTS'] == 8
+    assert admission.get_controller().status()['max_concurrent'] == 8
@@ -0,0 +1,125 @@
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+import db
+
+
+@pytest.fixture
+def client(criar_app, linha):
+    """criar_app com três imóveis no snapshot, devolvendo o test client"""
+    return lambda **config: criar_app([linha(1), linha(2), linha(3)], **config).test_client()
+
+
+def test_leituras_em_paralelo_na_ordem_pedida(client, monkeypatch):
+    import app as app_module
+
+    threads = set()
+    original = app_module.listar_imovel_por_id
+
+    def listar(*args, **kwargs):
+        threads.add(threading.get_ident())
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(app_module, 'listar_imovel_por_id', listar)
+    resposta = client(BATCH_READ_WORKERS=3).post('/batch', json={'requests': [
+        {'method': 'GET', 'path': '/imoveis/3'},
+        {'method': 'GET', 'path': '/imoveis/1?fields=valor'},
+        {'method': 'GET', 'path': '/imoveis/99'},
+        {'path': '/imoveis?ids=2,1'},
+    ]})
+    assert resposta.status_code == 200
+    resultados = resposta.get_json()['results']
+    assert [r['status'] for r in resultados] == [200, 200, 404, 200]
+    assert resultados[0]['body']['data']['id'] == 3
+    assert resultados[1]['body']['data'] == {'id': 1, 'valor': 1000.0}
+    assert resultados[3]['body']['total'] == 2
+    assert threading.get_ident() not in threads
+
+
+def test_sem_vagas_livres_as_leituras_rodam_na_vaga_do_batch(client, monkeypatch):
+    import admission
+    import app as app_module
+
+    threads = set()
+    original = app_module.listar_imovel_por_id
+
+    def listar(*args, **kwargs):
+        threads.add(threading.get_ident())
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(app_module, 'listar_imovel_por_id', listar)
+    resposta = client(BATCH_READ_WORKERS=3, MAX_CONCURRENT_REQUESTS=1).post('/batch', json={'requests': [
+        {'path': '/imoveis/1'}, {'path': '/imoveis/2'}, {'path': '/imoveis/3'},
+    ]})
+    assert [r['status'] for r in resposta.get_json()['results']] == [200, 200, 200]
+    assert threads == {threading.get_ident()}
+    assert admission.get_controller().status()['in_flight'] == 0
+
+
+def test_batch_gasta_o_balde_como_as_chamadas_avulsas(client):
+    # Sem reabastecimento que conte durante o teste: 100 tokens de burst, listagem custa 10
+    api = client(RATE_LIMIT=0.001, RATE_LIMIT_BURST=100)
+    assert api.post('/batch', json={'requests': [{'path': '/imoveis'}] * 5}).status_code == 200
+    assert [api.get('/imoveis').status_code for _ in range(6)] == [200] * 5 + [429]
+
+    # Maior que o burst: passa com o balde cheio e deixa dívida
+    api = client(RATE_LIMIT=0.001, RATE_LIMIT_BURST=100)
+    assert api.post('/batch', json={'requests': [{'path': '/imoveis'}] * 20}).status_code == 200
+    assert api.get('/imoveis/1').status_code == 429
+
+
+def test_rotas_fora_do_batch_sao_recusadas(client):
+    cliente = client()
+    for corpo in ({'requests': [{'path': '/imoveis/stream'}]},
+                  {'requests': [{'method': 'POST', 'path': '/batch'}]},
+                  {'requests': []},
+                  {'requests': [{'path': '/imoveis/1'}], 'atomic': 'sim'}):
+        assert cliente.post('/batch', json=corpo).status_code == 400
+
+
+@pytest.fixture
+def transacoes(monkeypatch, fake_tx):
+    """Troca db.transaction por uma que usa FakeTx e registra commit/rollback"""
+    eventos = []
+
+    @contextmanager
+    def transaction(read_only=False):
+        tx = fake_tx()
+        try:
+            yield tx
+            eventos.append(('commit', tx))
+        except Exception:
+            eventos.append(('rollback', tx))
+            raise
+
+    monkeypatch.setattr(db, 'transaction', transaction)
+    return eventos
+
+
+def test_batch_atomico_usa_uma_transacao(client, transacoes):
+    resposta = client().post('/batch', json={'atomic': True, 'requests': [
+        {'method': 'PUT', 'path': '/imoveis/1', 'body': {'valor': 2000.0}},
+        {'method': 'GET', 'path': '/imoveis/1'},
+    ]})
+    assert resposta.status_code == 200
+    assert [r['status'] for r in resposta.get_json()['results']] == [200, 200]
+    assert [evento for evento, _ in transacoes] == ['commit']
+    comandos = [query for query, _ in transacoes[0][1].comandos]
+    assert any(query.startswith('UPDATE imoveis') for query in comandos)
+    # A leitura foi feita na transação, não no snapshot nem no cache
+    assert comandos[-1].startswith('SELECT id, logradouro')
+
+
+def test_falha_desfaz_o_batch_atomico(client, transacoes):
+    resposta = client().post('/batch', json={'atomic': True, 'requests': [
+        {'method': 'PUT', 'path': '/imoveis/1', 'body': {'valor': 2000.0}},
+        {'method': 'PUT', 'path': '/imoveis/2', 'body': {'valor': 'caro'}},
+        {'method': 'DELETE', 'path': '/imoveis/3'},
+    ]})
+    assert resposta.status_code == 409
+    corpo = resposta.get_json()
+    assert corpo['failed'] == 1
+    assert [r['status'] for r in corpo['results']] == [200, 422]
+    assert [evento for evento, _ in transacoes] == ['rollback']
@@ -0,0 +1,69 @@
+import pytest
+from benchmark import percentile, summarize, compare_results, run_case, BenchCase
+
+
+def test_percentile():
+    valores = [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert percentile(valores, 0) == 1.0
+    assert percentile(valores, 50) == 3.0
+    assert percentile(valores, 100) == 5.0
+    # Interpolação linear entre posições
+    assert percentile(valores, 90) == pytest.approx(4.6)
+    assert percentile([], 50) is None
+
+
+def test_summarize():
+    stats = summarize([5.0, 1.0, 3.0])
+    assert stats['count'] == 3
+    assert stats['min'] == 1.0
+    assert stats['max'] == 5.0
+    assert stats['p50'] == 3.0
+    assert stats['mean'] == 3.0
+    assert summarize([]) == {'count': 0}
+
+
+def test_compare_results():
+    base = {'results': [
+        {'size': 1000, 'layer': 'func', 'case': 'a', 'stats': {'p50': 10.0}},
+        {'size': 1000, 'layer': 'func', 'case': 'b', 'stats': {'p50': 10.0}},
+        {'size': 1000, 'layer': 'http', 'case': 'c', 'stats': {'count': 0}},
+    ]}
+    novo = {'results': [
+        {'size': 1000, 'layer': 'func', 'case': 'a', 'stats': {'p50': 12.0}},
+        {'size': 1000, 'layer': 'func', 'case': 'b', 'stats': {'p50': 9.0}},
+        {'size': 1000, 'layer': 'http', 'case': 'c', 'stats': {'p50': 1.0}},
+    ]}
+    linhas = {l['case']: l for l in compare_results(base, novo, threshold=10.0)}
+
+    # Casos sem a métrica na base são ignorados
+    assert set(linhas) == {'a', 'b'}
+    assert linhas['a']['change_pct'] == pytest.approx(20.0)
+    assert linhas['a']['regression'] is True
+    assert linhas['b']['regression'] is False
+
+
+def test_run_case_warmup_e_prepare():
+    chamadas = []
+    case = BenchCase('func', 'teste', run=chamadas.append, prepare=lambda i: i * 10)
+
+    samples = run_case(case, warmup=2, repeat=5, time_budget=60)
+
+    assert len(samples) == 5
+    # Warmup não é medido, mas também passa pelo prepare
+    assert chamadas == [0, 10, 20, 30, 40, 50, 60]
+
+
+def test_run_case_setup_e_teardown_uma_vez():
+    eventos = []
+
+    def run(i):
+        eventos.append('run')
+        if i == 3:
+            raise RuntimeError('falhou')
+
+    case = BenchCase('http', 'teste', run=run, setup=lambda: eventos.append('setup'),
+                     teardown=lambda: eventos.append('teardown'))
+    with pytest.raises(RuntimeError):
+        run_case(case, warmup=1, repeat=5, time_budget=60)
+    # O teardown roda mesmo quando o caso quebra
+    assert eventos == ['setup'] + ['run'] * 4 + ['teardown']
@@ -0,0 +1,106 @@
+import pytest
+import mysql.connector
+import db
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+def falha():
+    raise ConnectionError('connection refused')
+
+
+def _abrir(breaker):
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(ConnectionError):
+            breaker.call(falha)
+
+
+def test_abre_apos_falhas_consecutivas():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=5, clock=Relogio())
+
+    with pytest.raises(ConnectionError):
+        breaker.call(falha)
+    assert breaker.state == CLOSED
+    # Um sucesso zera a contagem
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.failures == 0
+
+    _abrir(breaker)
+    assert breaker.state == OPEN
+
+    chamadas = []
+    with pytest.raises(CircuitOpenError) as erro:
+        breaker.call(chamadas.append, 1)
+    assert chamadas == []
+    assert erro.value.retry_after == 5
+
+
+def test_meio_aberto_fecha_com_sucesso():
+    relogio = Relogio()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=5, clock=relogio)
+    _abrir(breaker)
+
+    relogio.agora = 3.2
+    assert breaker.status()['retry_after'] == 2
+
+    relogio.agora = 5.0
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.state == CLOSED
+
+
+def test_meio_aberto_reabre_com_falha():
+    relogio = Relogio()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=5, clock=relogio)
+    _abrir(breaker)
+
+    relogio.agora = 6.0
+    with pytest.raises(ConnectionError):
+        breaker.call(falha)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: 'ok')
+
+
+def test_meio_aberto_limita_tentativas_simultaneas():
+    relogio = Relogio()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, half_open_max_calls=1, clock=relogio)
+    _abrir(breaker)
+
+    relogio.agora = 5.0
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    breaker.before_call()
+
+
+def test_banco_fora_do_ar_falha_rapido(monkeypatch):
+    monkeypatch.setattr(db, '_settings', {
+        'mysql': {'host': 'localhost', 'port': 3306, 'user': 'u', 'password': 'p', 'database': 'n'},
+        'pool_size': 0,
+        'replicas': [],
+    })
+    monkeypatch.setattr(db, '_circuit_breaker', CircuitBreaker(failure_threshold=2, reset_timeout=30))
+
+    tentativas = []
+
+    def connect(**config):
+        tentativas.append(config)
+        raise mysql.connector.errors.InterfaceError('Connection refused')
+
+    monkeypatch.setattr(mysql.connector, 'connect', connect)
+
+    for _ in range(2):
+        with pytest.raises(Exception, match='Erro ao conectar'):
+            db.get_database_connection()
+    with pytest.raises(CircuitOpenError):
+        db.get_database_connection()
+    assert len(tentativas) == 2
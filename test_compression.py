@@ -0,0 +1,72 @@
+import gzip
+import zlib
+
+import pytest
+
+import compression
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def linhas(linha):
+    """50 imóveis: listagens grandes o bastante para serem comprimidas"""
+    return [linha(i, valor=1000.0 + i) for i in range(1, 51)]
+
+
+def test_gzip_e_deflate_descomprimem():
+    corpo = b'{"imovel": "casa"}' * 100
+    assert gzip.decompress(compression.compress(corpo, 'gzip')) == corpo
+    assert zlib.decompress(compression.compress(corpo, 'deflate')) == corpo
+
+
+def test_stream_entrega_cada_pedaco_na_hora():
+    descompressor = zlib.decompressobj(wbits=31)
+    pedacos = compression.compress_stream([b'data: 1\n\n', b'data: 2\n\n'], 'gzip')
+    assert descompressor.decompress(next(pedacos)) == b'data: 1\n\n'
+    assert descompressor.decompress(next(pedacos)) == b'data: 2\n\n'
+    descompressor.decompress(b''.join(pedacos))
+    assert descompressor.eof
+
+
+def test_variante_comprimida_conta_no_tamanho():
+    cache = ResponseCache(ttl=60)
+    entrada = cache.set('k', 200, [], b'x' * 1000, cache.generation)
+    variante = cache.variant(entrada, 'gzip', compression.compress)
+    assert cache.variant(entrada, 'gzip', lambda corpo, codificacao: b'outra') is variante
+    assert cache.status()['bytes'] == 1000 + len(variante)
+
+
+def test_listagem_comprimida_conforme_accept_encoding(criar_app, linhas):
+    client = criar_app(linhas).test_client()
+    identidade = client.get('/imoveis')
+    assert 'Content-Encoding' not in identidade.headers
+    assert 'Accept-Encoding' in identidade.headers['Vary']
+
+    resposta = client.get('/imoveis', headers={'Accept-Encoding': 'br;q=0.9, gzip;q=0.5, deflate;q=0.1'})
+    assert resposta.headers['Content-Encoding'] == ('br' if compression.brotli else 'gzip')
+    if resposta.headers['Content-Encoding'] == 'gzip':
+        assert gzip.decompress(resposta.get_data()) == identidade.get_data()
+    assert int(resposta.headers['Content-Length']) < len(identidade.get_data())
+
+    etag = resposta.headers['ETag']
+    assert etag.startswith('W/')
+    assert client.get('/imoveis', headers={'Accept-Encoding': 'gzip',
+                                           'If-None-Match': etag}).status_code == 304
+
+    # Respostas pequenas não compensam a compressão
+    pequena = client.get('/imoveis/999', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in pequena.headers
+
+
+def test_resposta_em_cache_comprimida_uma_vez(criar_app, linhas, monkeypatch):
+    client = criar_app(linhas, RESPONSE_CACHE_TTL=60).test_client()
+    chamadas = []
+    original = compression.compress
+    monkeypatch.setattr(compression, 'compress',
+                        lambda corpo, codificacao: chamadas.append(codificacao) or original(corpo, codificacao))
+
+    respostas = [client.get('/imoveis', headers={'Accept-Encoding': 'gzip'}) for _ in range(3)]
+    assert [r.headers['X-Cache'] for r in respostas] == ['MISS', 'HIT', 'HIT']
+    assert chamadas == ['gzip']
+    assert len({r.get_data() for r in respostas}) == 1
+    assert gzip.decompress(respostas[0].get_data()) == client.get('/imoveis').get_data()
@@ -0,0 +1,75 @@
+import func
+from func import (
+    inserir_imovel, inserir_imoveis_em_lote, atualizar_imovel, atualizar_imovel_e_retornar,
+    deletar_imovel, reconstruir_contagens
+)
+
+
+def test_insercao_incrementa_contagens(fake_tx):
+    tx = fake_tx()
+    inserir_imovel('Rua A', 'Rua', 'Centro', 'Recife', '50000000', 'casa', 1.0, '2020-01-01', tx=tx)
+    assert tx.ajustes() == {('total', ''): 1, ('tipo', 'casa'): 1, ('cidade', 'Recife'): 1}
+
+
+def test_insercao_em_lote_agrega_em_um_comando(fake_tx):
+    tx = fake_tx()
+    lote = [
+        ('Rua A', 'Rua', 'Centro', 'Recife', '50000000', 'casa', 1.0, '2020-01-01'),
+        ('Rua B', 'Rua', 'Centro', 'Recife', '50000000', 'terreno', 1.0, '2020-01-01'),
+        ('Rua C', 'Rua', 'Centro', 'Natal', '59000000', None, 1.0, '2020-01-01'),
+    ]
+    inserir_imoveis_em_lote(lote, tx=tx)
+    assert tx.ajustes() == {
+        ('total', ''): 3, ('tipo', 'casa'): 1, ('tipo', 'terreno'): 1, ('tipo', ''): 1,
+        ('cidade', 'Recife'): 2, ('cidade', 'Natal'): 1,
+    }
+    assert sum(q.startswith('INSERT INTO imoveis_contagens') for q, _ in tx.comandos) == 1
+
+
+def test_remocao_decrementa_contagens(fake_tx):
+    tx = fake_tx(existente=('apartamento', 'Natal'))
+    assert deletar_imovel(1, tx=tx)
+    assert tx.ajustes() == {('total', ''): -1, ('tipo', 'apartamento'): -1, ('cidade', 'Natal'): -1}
+
+
+def test_mudanca_de_tipo_e_cidade_move_contagens(fake_tx):
+    tx = fake_tx(existente=('casa', 'Recife'))
+    assert atualizar_imovel(1, tipo='terreno', tx=tx)
+    assert tx.ajustes() == {('tipo', 'casa'): -1, ('tipo', 'terreno'): 1}
+
+    tx = fake_tx(existente=('casa', 'Recife'))
+    atualizar_imovel_e_retornar(1, cidade='Natal', tx=tx)
+    assert tx.ajustes() == {('cidade', 'Natal'): 1, ('cidade', 'Recife'): -1}
+
+
+def test_atualizacao_sem_tipo_ou_cidade_nao_toca_contagens(fake_tx):
+    tx = fake_tx()
+    assert atualizar_imovel(1, valor=10.0, tx=tx)
+    assert tx.ajustes() == {}
+    assert not any('FOR UPDATE' in q for q, _ in tx.comandos)
+
+
+def test_ajustes_em_ordem_fixa(fake_tx):
+    tx = fake_tx(existente=('terreno', 'Natal'))
+    atualizar_imovel(1, tipo='casa', cidade='Recife', tx=tx)
+    (query, params), = [(q, p) for q, p in tx.comandos if q.startswith('INSERT INTO imoveis_contagens')]
+    chaves = [(params[i], params[i + 1]) for i in range(0, len(params), 3)]
+    assert chaves == sorted(chaves)
+
+
+def test_reconstrucao_executa_consultas(fake_tx):
+    tx = fake_tx()
+    assert reconstruir_contagens(tx=tx) == {}
+    executadas = [q for q, _ in tx.comandos]
+    for query in func.CONSULTAS_RECONSTRUCAO_CONTAGENS:
+        assert ' '.join(query.split()) in executadas
+
+
+def test_ajuste_usa_alias_de_linha_e_nao_values(fake_tx):
+    tx = fake_tx()
+    deletar_imovel(1, tx=tx)
+    (query, _), = [(q, p) for q, p in tx.comandos if q.startswith('INSERT INTO imoveis_contagens')]
+    assert query == ('INSERT INTO imoveis_contagens (dimensao, valor, total) '
+                     'VALUES (%s, %s, %s), (%s, %s, %s), (%s, %s, %s) AS novo '
+                     'ON DUPLICATE KEY UPDATE total = total + novo.total')
+    assert 'VALUES(' not in query
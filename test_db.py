@@ -0,0 +1,106 @@
+import pytest
+import db
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 1
+        self.lastrowid = 10
+
+    def execute(self, query, params=None):
+        self.conn.statements.append((query, params))
+
+    def fetchone(self):
+        return (1,)
+
+    def fetchall(self):
+        return [(1,), (2,)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = False
+
+    def cursor(self, buffered=False):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def conexoes(monkeypatch, config_teste):
+    monkeypatch.setattr(db, '_settings', config_teste)
+    monkeypatch.setattr(db, '_replica_router_loaded', False)
+    abertas = []
+
+    def fake_connection(read_only=False):
+        conn = FakeConnection()
+        abertas.append(conn)
+        return conn
+
+    monkeypatch.setattr(db, 'get_database_connection', fake_connection)
+    return abertas
+
+
+def test_transacao_usa_uma_conexao_e_um_commit(conexoes):
+    with db.transaction() as tx:
+        assert db.execute_query("SELECT 1", fetch_one=True, tx=tx) == (1,)
+        assert db.execute_query("UPDATE imoveis SET valor = %s", (1,), tx=tx) == 1
+        assert db.execute_query("SELECT id FROM imoveis", fetch_all=True, tx=tx) == [(1,), (2,)]
+
+    assert len(conexoes) == 1
+    conn = conexoes[0]
+    assert len(conn.statements) == 3
+    assert conn.commits == 1
+    assert conn.rollbacks == 0
+    assert conn.closed
+
+
+def test_transacao_faz_rollback_em_erro(conexoes):
+    with pytest.raises(RuntimeError):
+        with db.transaction() as tx:
+            db.execute_query("DELETE FROM imoveis WHERE id = %s", (1,), tx=tx)
+            raise RuntimeError('falha no meio da operação')
+
+    conn = conexoes[0]
+    assert conn.commits == 0
+    assert conn.rollbacks == 1
+    assert conn.closed
+
+
+def test_execute_query_sem_transacao_abre_conexao_propria(conexoes):
+    assert db.execute_query("INSERT INTO imoveis VALUES (%s)", (1,), get_lastrowid=True) == 10
+    assert db.execute_query("SELECT 1", fetch_one=True) == (1,)
+
+    assert len(conexoes) == 2
+    assert all(c.commits == 1 and c.closed for c in conexoes)
+
+
+def test_configuracao_lida_uma_vez(monkeypatch):
+    monkeypatch.setattr(db, '_settings', None)
+    for var, valor in {'DB_USER': 'u', 'DB_PASSWORD': 'p', 'DB_NAME': 'n', 'DB_POOL_SIZE': '0'}.items():
+        monkeypatch.setenv(var, valor)
+
+    settings = db.get_settings()
+    monkeypatch.setenv('DB_NAME', 'outro')
+    assert db.get_settings() is settings
+    assert settings['mysql']['database'] == 'n'
+    assert settings['pool_size'] == 0
+
+    monkeypatch.delenv('DB_USER')
+    with pytest.raises(ValueError):
+        db.configure()
@@ -0,0 +1,216 @@
+import threading
+
+import pytest
+
+import db
+import events
+from events import EventBroker, SQLiteEventLog, StreamUnavailableError
+
+
+def _eventos(stream, n):
+    """Lê n mensagens SSE (separadas por linha em branco) do stream"""
+    mensagens = []
+    while len(mensagens) < n:
+        chunk = next(stream).decode()
+        mensagens.extend(m for m in chunk.split('\n\n') if m)
+    return mensagens
+
+
+def _campo(mensagem, nome):
+    for linha in mensagem.split('\n'):
+        if linha.startswith(nome + ': '):
+            return linha[len(nome) + 2:]
+    return None
+
+
+def test_publica_para_assinantes():
+    broker = EventBroker(buffer_size=10)
+    stream = broker.stream(heartbeat=0.01)
+    assert next(stream) == b"retry: 3000\n\n"
+    assert broker.subscribers == 1
+
+    broker.publish('insert', {'id': 1, 'cidade': 'São Paulo'})
+    broker.publish('delete', {'id': 1})
+    insert, delete = _eventos(stream, 2)
+    assert _campo(insert, 'event') == 'insert'
+    assert _campo(insert, 'data') == '{"id": 1, "cidade": "São Paulo"}'
+    assert _campo(delete, 'id') == f"{broker.epoch}-2"
+
+    # Sem eventos, o stream envia heartbeats
+    assert next(stream) == b": ping\n\n"
+
+    stream.close()
+    assert broker.subscribers == 0
+
+
+def test_retoma_a_partir_do_last_event_id():
+    broker = EventBroker(buffer_size=10)
+    primeiro = broker.publish('insert', {'id': 1})
+    broker.publish('insert', {'id': 2})
+    broker.publish('update', {'id': 2, 'valor': 10.0})
+
+    stream = broker.stream(primeiro, heartbeat=0.01)
+    next(stream)
+    mensagens = _eventos(stream, 2)
+    assert [_campo(m, 'event') for m in mensagens] == ['insert', 'update']
+
+
+@pytest.mark.parametrize('last_event_id', ['outroprocesso-1', 'lixo'])
+def test_id_desconhecido_envia_reset(last_event_id):
+    broker = EventBroker(buffer_size=10)
+    broker.publish('insert', {'id': 1})
+    stream = broker.stream(last_event_id, heartbeat=0.01)
+    next(stream)
+    (reset,) = _eventos(stream, 1)
+    assert _campo(reset, 'event') == 'reset'
+    assert _campo(reset, 'id') == f"{broker.epoch}-1"
+
+
+def test_eventos_fora_do_buffer_enviam_reset():
+    broker = EventBroker(buffer_size=2)
+    antigo = broker.publish('insert', {'id': 1})
+    for i in range(2, 5):
+        broker.publish('insert', {'id': i})
+    stream = broker.stream(antigo, heartbeat=0.01)
+    next(stream)
+    assert _campo(_eventos(stream, 1)[0], 'event') == 'reset'
+
+
+def test_assinante_acorda_com_publicacao_de_outra_thread():
+    broker = EventBroker()
+    stream = broker.stream(heartbeat=5)
+    next(stream)
+    threading.Timer(0.05, broker.publish, ('insert', {'id': 7})).start()
+    assert _campo(_eventos(stream, 1)[0], 'event') == 'insert'
+
+
+def test_log_compartilhado_entrega_eventos_de_outro_processo(tmp_path):
+    caminho = str(tmp_path / 'eventos.sqlite3')
+    # Dois brokers no mesmo arquivo fazem o papel de dois workers
+    worker_a = EventBroker(buffer_size=10, log=SQLiteEventLog(caminho, 'db'), poll_interval=0.01)
+    worker_b = EventBroker(buffer_size=10, log=SQLiteEventLog(caminho, 'db'), poll_interval=0.01)
+    assert worker_a.epoch == worker_b.epoch
+
+    stream = worker_b.stream(heartbeat=5)
+    next(stream)
+    primeiro = worker_a.publish('insert', {'id': 1})
+    (insert,) = _eventos(stream, 1)
+    assert _campo(insert, 'id') == primeiro
+    stream.close()
+
+    # O cliente reconecta em outro worker e retoma de onde parou
+    worker_b.publish('delete', {'id': 1})
+    retomado = worker_a.stream(primeiro, heartbeat=5)
+    next(retomado)
+    (delete,) = _eventos(retomado, 1)
+    assert _campo(delete, 'event') == 'delete'
+    retomado.close()
+    worker_a.close()
+    worker_b.close()
+
+
+def test_worker_novo_retoma_eventos_publicados_antes_de_subir(tmp_path):
+    caminho = str(tmp_path / 'eventos.sqlite3')
+    antigo = EventBroker(buffer_size=10, log=SQLiteEventLog(caminho, 'db'), poll_interval=0.01)
+    ids = [antigo.publish('update', {'id': i}) for i in range(5)]
+    antigo.close()
+
+    # Worker reciclado: nunca viu esses eventos ao vivo
+    novo = EventBroker(buffer_size=10, log=SQLiteEventLog(caminho, 'db'), poll_interval=0.01)
+    retomado = novo.stream(ids[1], heartbeat=5)
+    next(retomado)
+    assert [_campo(m, 'id') for m in _eventos(retomado, 3)] == ids[2:]
+    retomado.close()
+    novo.close()
+
+def test_canais_separam_bancos(tmp_path):
+    caminho = str(tmp_path / 'eventos.sqlite3')
+    SQLiteEventLog(caminho, 'db1').append('insert', '{}')
+    assert SQLiteEventLog(caminho, 'db2').last_seq() == 0
+
+
+def test_limite_de_assinantes():
+    broker = EventBroker(max_subscribers=1)
+    primeiro = broker.stream(heartbeat=0.01)
+    with pytest.raises(StreamUnavailableError):
+        broker.stream(heartbeat=0.01)
+    # Fechar sem ter lido nada também libera a vaga
+    primeiro.close()
+    broker.stream(heartbeat=0.01).close()
+    assert broker.subscribers == 0
+
+
+def test_close_encerra_os_streams_e_recusa_novos():
+    broker = EventBroker()
+    stream = broker.stream(heartbeat=5)
+    next(stream)
+    threading.Timer(0.05, broker.close).start()
+    with pytest.raises(StopIteration):
+        next(stream)
+    stream.close()
+    assert broker.subscribers == 0
+    with pytest.raises(StreamUnavailableError):
+        broker.stream()
+
+
+def test_rota_responde_503_acima_do_limite(criar_app):
+    client = criar_app(EVENTS_MAX_SUBSCRIBERS=1).test_client()
+    aberto = client.get('/imoveis/stream', buffered=False)
+    assert aberto.status_code == 200
+    recusado = client.get('/imoveis/stream')
+    assert recusado.status_code == 503
+    assert recusado.headers['Retry-After'] == '5'
+    aberto.close()
+    assert client.get('/imoveis/stream', buffered=False).status_code == 200
+
+
+def test_stream_comprimido_libera_a_vaga_ao_fechar(criar_app):
+    client = criar_app(EVENTS_MAX_SUBSCRIBERS=1).test_client()
+    aberto = client.get('/imoveis/stream', headers={'Accept-Encoding': 'gzip'}, buffered=False)
+    assert aberto.headers['Content-Encoding'] == 'gzip'
+    aberto.close()
+    assert events.broker.subscribers == 0
+    assert client.get('/imoveis/stream', headers={'Accept-Encoding': 'gzip'}, buffered=False).status_code == 200
+
+
+class FakeConnection:
+    def __init__(self):
+        self.commits = 0
+
+    def cursor(self, buffered=False):
+        return self
+
+    def execute(self, query, params=None):
+        pass
+
+    rowcount = 1
+    lastrowid = 5
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_evento_so_e_publicado_depois_do_commit(monkeypatch):
+    from func import inserir_imovel
+
+    monkeypatch.setattr(db, 'get_database_connection', lambda read_only=False: FakeConnection())
+    monkeypatch.setattr(db, 'get_replica_router', lambda: None)
+    broker = EventBroker()
+    monkeypatch.setattr(events, 'broker', broker)
+
+    with pytest.raises(RuntimeError):
+        with db.transaction() as tx:
+            inserir_imovel('Rua A', 'Rua', 'Centro', 'Recife', '50000-000', 'casa', 1.0, '2020-01-01', tx=tx)
+            raise RuntimeError('rollback')
+    assert broker.seq == 0
+
+    with db.transaction() as tx:
+        inserir_imovel('Rua A', 'Rua', 'Centro', 'Recife', '50000-000', 'casa', 1.0, '2020-01-01', tx=tx)
+        assert broker.seq == 0
+    assert broker.seq == 1
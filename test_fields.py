@@ -0,0 +1,69 @@
+import datetime
+import json
+
+import func
+import snapshot
+
+
+def test_select_so_com_as_colunas_pedidas(monkeypatch):
+    consultas = []
+
+    def fake_execute_query(query, params=None, fetch_all=False, fetch_one=False, tx=None, read_only=False):
+        consultas.append(' '.join(query.split()))
+        return [(1, 'Recife', 'casa', 1500.5)]
+
+    monkeypatch.setattr(func, 'execute_query', fake_execute_query)
+    # Dentro de uma transação a leitura vai direto ao banco, sem cache
+    imoveis = func.listar_imoveis_por_tipo('casa', tx=object(), campos={'valor', 'tipo', 'cidade'})
+    assert consultas == ['SELECT id, cidade, tipo, valor FROM imoveis WHERE tipo = %s ORDER BY id']
+    assert imoveis == [{'id': 1, 'cidade': 'Recife', 'tipo': 'casa', 'valor': 1500.5}]
+
+
+def test_colunas_desconhecidas_nao_chegam_ao_sql():
+    assert func._colunas({'valor', 'id; DROP TABLE imoveis'}) == ('id', 'valor')
+
+
+def test_snapshot_decodifica_so_as_colunas_pedidas(tmp_path, linha):
+    caminho = str(tmp_path / 'imoveis.snap')
+    snapshot.build_snapshot([linha(1, valor=1500.5)], caminho)
+    snap = snapshot.Snapshot(caminho)
+    assert snap.get(1, ('id', 'cidade', 'valor')) == {'id': 1, 'cidade': 'Recife', 'valor': 1500.5}
+    assert snap.find('cidade', 'recife', ('id', 'data_aquisicao')) == [
+        {'id': 1, 'data_aquisicao': datetime.date(2020, 1, 2)}]
+    assert list(snap.all()[0]) == list(snapshot.COLUMNS)
+
+
+def test_rotas_com_fields(criar_app, linha):
+    client = criar_app([linha(1, valor=1500.5)]).test_client()
+    dados = client.get('/imoveis?fields=cidade,valor').get_json()['data']
+    assert dados == [{'id': 1, 'cidade': 'Recife', 'valor': 1500.5}]
+
+    imovel = client.get('/imoveis/1?fields=tipo,link').get_json()['data']
+    assert list(imovel) == ['id', 'tipo', 'link']
+
+    resposta = client.get('/imoveis/cidade/Recife?fields=cidade,preco')
+    assert resposta.status_code == 400
+    assert 'preco' in json.loads(resposta.get_data())['message']
+
+    completo = client.get('/imoveis/tipo/casa').get_json()['data'][0]
+    assert list(completo) == list(func.COLUNAS_IMOVEL) + ['link']
+
+
+def test_alteracoes_com_fields(monkeypatch, criar_app):
+    import app as app_module
+
+    pedidos = []
+
+    def fake_listar_alteracoes(since, limite, campos=None):
+        pedidos.append(campos)
+        return {'alterados': [{'id': 1, 'cidade': 'Recife'}], 'removidos': [7], 'token': 't', 'tem_mais': False}
+
+    monkeypatch.setattr(app_module, 'listar_alteracoes', fake_listar_alteracoes)
+    client = criar_app().test_client()
+    corpo = client.get('/imoveis/changes?fields=cidade').get_json()
+    assert pedidos == [{'cidade'}]
+    assert corpo['data']['changed'] == [{'id': 1, 'cidade': 'Recife'}]
+    assert 'fields=cidade' in corpo['links']['next']['href']
+
+    assert client.get('/imoveis/changes?fields=preco').status_code == 400
+    assert pedidos == [{'cidade'}]
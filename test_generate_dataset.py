@@ -0,0 +1,56 @@
+import csv
+import io
+import json
+from generate_dataset import gerar_lote, gerar_lotes, cabecalho_csv, formatar_csv, formatar_ndjson, COLUNAS, TIPOS
+
+
+def test_lote_deterministico():
+    assert gerar_lote(7, 0, 100) == gerar_lote(7, 0, 100)
+    assert gerar_lote(7, 0, 100) != gerar_lote(8, 0, 100)
+    assert gerar_lote(7, 0, 100) != gerar_lote(7, 1, 100)
+
+
+def test_gerar_lotes_quantidade_e_workers():
+    lotes = list(gerar_lotes(2500, seed=1, batch_size=1000))
+    assert [len(l) for l in lotes] == [1000, 1000, 500]
+
+    # Gerar em paralelo produz exatamente o mesmo dataset
+    paralelo = list(gerar_lotes(2500, seed=1, batch_size=1000, workers=2))
+    assert paralelo == lotes
+
+
+def test_linhas_validas():
+    tipos_validos = {t[0] for t in TIPOS}
+    faixas = {t[0]: (t[2], t[3]) for t in TIPOS}
+
+    for linha in gerar_lote(3, 0, 2000):
+        assert len(linha) == len(COLUNAS)
+        logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data = linha
+        assert len(cep) == 8 and cep.isdigit()
+        assert tipo in tipos_validos
+        minimo, maximo = faixas[tipo]
+        # Multiplicadores por cidade ficam entre 0.7 e 1.6
+        assert minimo * 0.7 <= valor <= maximo * 1.6
+        assert len(data) == 10 and data[4] == '-' and '2000' <= data[:4] <= '2025'
+
+
+def test_distribuicao_de_cidades_enviesada():
+    cidades = [linha[3] for linha in gerar_lote(5, 0, 20000)]
+    contagem = {c: cidades.count(c) for c in set(cidades)}
+    # A cidade mais frequente (Zipf rank 1) aparece muito mais que a mediana
+    mais_comum = max(contagem.values())
+    mediana = sorted(contagem.values())[len(contagem) // 2]
+    assert mais_comum > 5 * mediana
+
+
+def test_formatos():
+    lote = gerar_lote(2, 0, 10)
+
+    linhas = list(csv.reader(io.StringIO(cabecalho_csv(com_ids=True) + formatar_csv(lote, 1))))
+    assert linhas[0] == ['id'] + COLUNAS
+    assert linhas[1][0] == '1' and linhas[-1][0] == '10'
+    assert len(linhas) == 11
+
+    registros = [json.loads(l) for l in formatar_ndjson(lote).splitlines()]
+    assert len(registros) == 10
+    assert set(registros[0]) == set(COLUNAS)
@@ -207,4 +207,116 @@ def test_listar_imoveis_cidade():
     # Testa cidade que não existe
     cidade_inexistente = listar_imoveis_por_cidade("Cidade Inexistente")
     assert isinstance(cidade_inexistente, list)
-    assert len(cidade_inexistente) == 0
\ No newline at end of file
+    assert len(cidade_inexistente) == 0
+
+def test_atualizar_imovel_e_retornar():
+    teste_id = inserir_imovel(
+        logradouro="Rua Retorno",
+        tipo_logradouro="Rua",
+        bairro="Bairro Teste",
+        cidade="Cidade Teste",
+        cep="12345678",
+        tipo="casa",
+        valor=400000.00,
+        data_aquisicao="2023-01-01"
+    )
+    
+    # Retorna o estado final do imóvel
+    imovel = atualizar_imovel_e_retornar(teste_id, valor=450000.00, bairro="Bairro Novo")
+    assert imovel['id'] == teste_id
+    assert imovel['valor'] == 450000.00
+    assert imovel['bairro'] == "Bairro Novo"
+    assert imovel['logradouro'] == "Rua Retorno"
+    
+    # Atualizar com os mesmos valores ainda encontra o imóvel
+    imovel_igual = atualizar_imovel_e_retornar(teste_id, valor=450000.00)
+    assert imovel_igual is not None
+    
+    # Imóvel inexistente retorna None
+    assert atualizar_imovel_e_retornar(99999, valor=1.0) is None
+    
+    # Sem campos é erro de uso
+    with pytest.raises(ValueError):
+        atualizar_imovel_e_retornar(teste_id)
+    
+    deletar_imovel(teste_id)
+
+
+def test_deletar_imovel_e_retornar():
+    teste_id = inserir_imovel(
+        logradouro="Rua Para Remover",
+        tipo_logradouro="Rua",
+        bairro="Bairro Teste",
+        cidade="Cidade Teste",
+        cep="12345678",
+        tipo="terreno",
+        valor=150000.00,
+        data_aquisicao="2024-01-01"
+    )
+    
+    # Retorna os dados que o imóvel tinha
+    removido = deletar_imovel_e_retornar(teste_id)
+    assert removido['id'] == teste_id
+    assert removido['logradouro'] == "Rua Para Remover"
+    assert listar_imovel_por_id(teste_id) is None
+    
+    # Remover de novo não encontra nada
+    assert deletar_imovel_e_retornar(teste_id) is None
+
+
+def test_listar_alteracoes():
+    # Sincronização completa, página a página, até o fim
+    token = None
+    while True:
+        pagina = listar_alteracoes(token, limite=1000)
+        token = pagina['token']
+        if not pagina['tem_mais']:
+            break
+    
+    teste_id = inserir_imovel(
+        logradouro="Rua Sync",
+        tipo_logradouro="Rua",
+        bairro="Bairro Teste",
+        cidade="Cidade Teste",
+        cep="12345678",
+        tipo="casa",
+        valor=100000.00,
+        data_aquisicao="2024-01-01"
+    )
+    alteracoes = listar_alteracoes(token)
+    assert teste_id in [i['id'] for i in alteracoes['alterados']]
+    
+    deletar_imovel(teste_id)
+    alteracoes = listar_alteracoes(alteracoes['token'])
+    assert teste_id in alteracoes['removidos']
+    assert teste_id not in [i['id'] for i in alteracoes['alterados']]
+
+
+def test_contagens_acompanham_escritas():
+    reconstruir_contagens()
+    total = contar_imoveis()
+    casas = contar_imoveis(tipo='casa')
+    terrenos = contar_imoveis(tipo='terreno')
+    
+    teste_id = inserir_imovel(
+        logradouro="Rua Contagem",
+        tipo_logradouro="Rua",
+        bairro="Bairro Teste",
+        cidade="Cidade Contagem",
+        cep="12345678",
+        tipo="casa",
+        valor=100000.00,
+        data_aquisicao="2024-01-01"
+    )
+    assert contar_imoveis() == total + 1
+    assert contar_imoveis(tipo='casa') == casas + 1
+    assert listar_contagens('cidade')['Cidade Contagem'] == 1
+    
+    atualizar_imovel(teste_id, tipo='terreno')
+    assert contar_imoveis(tipo='casa') == casas
+    assert contar_imoveis(tipo='terreno') == terrenos + 1
+    
+    deletar_imovel(teste_id)
+    assert contar_imoveis() == total
+    assert contar_imoveis(cidade='Cidade Contagem') == 0
+    assert reconstruir_contagens() == {}
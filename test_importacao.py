@@ -0,0 +1,128 @@
+import io
+import json
+import os
+
+import pytest
+
+import importacao
+from importacao import importar_imoveis, ler_csv, ler_ndjson, validar_lote
+
+CABECALHO = 'logradouro,tipo_logradouro,bairro,cidade,cep,tipo,valor,data_aquisicao\n'
+VALIDO = {
+    'logradouro': 'Rua A', 'tipo_logradouro': 'Rua', 'bairro': 'Centro', 'cidade': 'Recife',
+    'cep': '50000-000', 'tipo': 'Casa', 'valor': '250000.50', 'data_aquisicao': '2020-01-31'
+}
+
+
+@pytest.fixture
+def lotes(monkeypatch):
+    """Captura os lotes que iriam para o banco"""
+    inseridos = []
+
+    def inserir(imoveis):
+        inseridos.append(list(imoveis))
+        return len(imoveis)
+
+    monkeypatch.setattr(importacao, 'inserir_imoveis_em_lote', inserir)
+    return inseridos
+
+
+def test_validar_lote_normaliza_e_aponta_todos_os_erros():
+    invalido = dict(VALIDO, cep='123', tipo='castelo', valor='-1', data_aquisicao='2020-02-30', bairro=' ')
+    normalizados, erros = validar_lote([VALIDO, invalido])
+
+    assert normalizados[0] == ('Rua A', 'Rua', 'Centro', 'Recife', '50000-000', 'casa', 250000.5, '2020-01-31')
+    assert erros[0] == []
+    assert normalizados[1] is None
+    assert [erro['field'] for erro in erros[1]] == ['bairro', 'cep', 'tipo', 'valor', 'data_aquisicao']
+
+
+def test_ler_csv():
+    arquivo = io.BytesIO((CABECALHO + 'Rua A,Rua,Centro,Recife,50000000,casa,1,2020-01-01\n'
+                          'Rua B,Rua,Centro,Recife,50000000,casa,1,2020-01-01,sobra\n').encode('utf-8'))
+    linhas = list(ler_csv(arquivo))
+    assert linhas[0][1]['logradouro'] == 'Rua A'
+    assert linhas[1][1] is None and linhas[1][2]
+
+
+def test_ler_ndjson():
+    arquivo = io.BytesIO(b'{"logradouro": "Rua A"}\n\n{quebrado\n[1, 2]\n')
+    linhas = list(ler_ndjson(arquivo))
+    assert [(numero, erro is None) for numero, _, erro in linhas] == [(1, True), (3, False), (4, False)]
+
+
+def test_importar_em_lotes_com_rejeitados(tmp_path, lotes):
+    registros = [(i + 1, dict(VALIDO), None) for i in range(5)]
+    registros.insert(2, (99, dict(VALIDO, cep='abc'), None))
+    registros.append((100, None, 'JSON inválido'))
+
+    resumo = importar_imoveis(iter(registros), tamanho_lote=2, diretorio=str(tmp_path))
+
+    assert (resumo['total'], resumo['importados'], resumo['rejeitados']) == (7, 5, 2)
+    assert [len(lote) for lote in lotes] == [2, 1, 2]
+    rejeitados = [json.loads(linha) for linha in open(importacao.caminho_rejeitados(resumo['id'], str(tmp_path)))]
+    assert [r['linha'] for r in rejeitados] == [99, 100]
+    assert [erro['code'] for erro in rejeitados[0]['erros']] == ['invalid_format']
+    assert rejeitados[1]['erros'][0]['code'] == 'invalid_record'
+
+
+def test_importacao_sem_rejeitados_nao_deixa_arquivo(tmp_path, lotes):
+    resumo = importar_imoveis(iter([(1, dict(VALIDO), None)]), diretorio=str(tmp_path))
+    assert resumo['importados'] == 1
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_caminho_rejeitados_recusa_ids_invalidos():
+    assert importacao.caminho_rejeitados('../../etc/passwd') is None
+
+
+def test_falha_no_banco_leva_o_resumo_parcial(tmp_path, monkeypatch):
+    chamadas = []
+
+    def inserir(imoveis):
+        chamadas.append(1)
+        if len(chamadas) == 2:
+            raise RuntimeError('Lost connection to MySQL server')
+        return len(imoveis)
+
+    monkeypatch.setattr(importacao, 'inserir_imoveis_em_lote', inserir)
+    registros = [(1, dict(VALIDO, cep='abc'), None)] + [(i, dict(VALIDO), None) for i in range(2, 7)]
+
+    with pytest.raises(RuntimeError) as erro:
+        importar_imoveis(iter(registros), tamanho_lote=3, diretorio=str(tmp_path))
+
+    resumo = erro.value.resumo
+    assert (resumo['importados'], resumo['lotes'], resumo['rejeitados']) == (2, 1, 1)
+    assert os.path.exists(importacao.caminho_rejeitados(resumo['id'], str(tmp_path)))
+
+
+def test_rota_devolve_o_resumo_parcial_com_o_erro(tmp_path, monkeypatch, criar_app):
+    def inserir(imoveis):
+        raise RuntimeError('Lost connection to MySQL server')
+
+    monkeypatch.setattr(importacao, 'inserir_imoveis_em_lote', inserir)
+    monkeypatch.setattr(importacao, 'diretorio_importacoes', lambda: str(tmp_path))
+    client = criar_app().test_client()
+    corpo = CABECALHO + 'Rua B,Rua,,Recife,1,casa,1,2020-01-01\nRua A,Rua,Centro,Recife,50000000,casa,1,2020-01-01\n'
+
+    resposta = client.post('/imoveis/import', data=corpo, content_type='text/csv')
+    assert resposta.status_code == 503
+    assert resposta.json['success'] is False
+    assert resposta.json['data'] == {'total': 2, 'imported': 0, 'rejected': 1, 'batches': 0}
+    assert client.get(resposta.json['links']['rejects']['href']).status_code == 200
+
+
+def test_rota_importacao(tmp_path, monkeypatch, lotes, criar_app):
+    monkeypatch.setattr(importacao, 'diretorio_importacoes', lambda: str(tmp_path))
+    client = criar_app().test_client()
+    corpo = CABECALHO + 'Rua A,Rua,Centro,Recife,50000000,casa,1,2020-01-01\nRua B,Rua,,Recife,1,casa,1,2020-01-01\n'
+
+    resposta = client.post('/imoveis/import', data=corpo, content_type='text/csv')
+    assert resposta.status_code == 200
+    assert resposta.json['data'] == {'total': 2, 'imported': 1, 'rejected': 1, 'batches': 1}
+
+    rejeitados = client.get(resposta.json['links']['rejects']['href'])
+    assert rejeitados.status_code == 200
+    assert json.loads(rejeitados.data.splitlines()[0])['linha'] == 3
+
+    assert client.post('/imoveis/import', json=VALIDO).status_code == 415
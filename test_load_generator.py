@@ -0,0 +1,57 @@
+import pytest
+from load_generator import parse_mix, detect_saturation, StageResult, LoadClient
+import random
+
+
+def _stage(rps, p99, error_rate=0.0):
+    return {'throughput_rps': rps, 'error_rate': error_rate, 'latency_ms': {'p99': p99}}
+
+
+def test_parse_mix():
+    mix = parse_mix('get=70, post=5,delete')
+    assert mix == {'get': 70.0, 'post': 5.0, 'delete': 1.0}
+
+    with pytest.raises(ValueError):
+        parse_mix('patch=10')
+    with pytest.raises(ValueError):
+        parse_mix('get=0')
+
+
+def test_detect_saturation_por_latencia():
+    stages = [_stage(100, 10), _stage(190, 12), _stage(200, 40), _stage(205, 90)]
+    # Throughput cresce só 5% enquanto o p99 mais que triplica
+    assert detect_saturation(stages) == 2
+
+
+def test_detect_saturation_por_erros():
+    stages = [_stage(100, 10), _stage(180, 11, error_rate=0.05)]
+    assert detect_saturation(stages, max_error_rate=0.01) == 1
+
+
+def test_detect_saturation_sem_saturacao():
+    stages = [_stage(100, 10), _stage(190, 11), _stage(350, 12)]
+    assert detect_saturation(stages) is None
+
+
+def test_stage_result_report():
+    result = StageResult()
+    result.merge([('get', 1.0, None), ('get', 3.0, 'HTTP 500'), ('post', 2.0, None)])
+    result.elapsed = 2.0
+
+    report = result.report()
+    assert report['requests'] == 3
+    assert report['errors'] == 1
+    assert report['throughput_rps'] == 1.5
+    assert report['endpoints']['get']['error_kinds'] == {'HTTP 500': 1}
+    assert report['endpoints']['get']['latency_ms']['max'] == 3.0
+
+
+def test_delete_so_remove_ids_criados():
+    client = LoadClient('http://localhost:5000', {'delete': 1}, (1, 10), ['Recife'])
+    rng = random.Random(1)
+
+    # Sem ids criados pelo teste, o DELETE vira POST
+    assert client.build_request('delete', rng)[:3] == ('post', 'POST', '/imoveis')
+
+    client.created_ids.append(42)
+    assert client.build_request('delete', rng) == ('delete', 'DELETE', '/imoveis/42', None)
@@ -0,0 +1,83 @@
+import pytest
+
+import func
+import shared_cache
+from shared_cache import SQLiteCache
+
+
+class FakeBanco:
+    def __init__(self, existentes, linha):
+        self.existentes = existentes
+        self.linha = linha
+        self.consultas = []
+
+    def __call__(self, query, params=None, fetch_all=False, fetch_one=False, tx=None, read_only=False):
+        self.consultas.append(params)
+        colunas = ' '.join(query.split()).split('SELECT ')[1].split(' FROM')[0].split(', ')
+        posicoes = [func.COLUNAS_IMOVEL.index(coluna) for coluna in colunas]
+        return [tuple(self.linha(imovel_id)[i] for i in posicoes) for imovel_id in params if imovel_id in self.existentes]
+
+
+@pytest.fixture
+def banco(monkeypatch, linha):
+    """banco(ids existentes): troca func.execute_query por um FakeBanco"""
+    def criar(existentes):
+        fake = FakeBanco(existentes, linha)
+        monkeypatch.setattr(func, 'execute_query', fake)
+        return fake
+    return criar
+
+
+def test_get_many_e_set_many(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite3'))
+    cache.set('ns', 'a', 1, cache.version('ns'))
+    guardados, versao = cache.get_many('ns', ['a', 'b'])
+    assert guardados == {'a': 1}
+    cache.set_many('ns', {'b': None, 'c': 3}, versao)
+    assert cache.get_many('ns', ['a', 'b', 'c'])[0] == {'a': 1, 'b': None, 'c': 3}
+    # Valores carregados antes de uma invalidação não voltam
+    cache.invalidate('ns')
+    cache.set_many('ns', {'a': 'antigo'}, versao)
+    assert cache.get_many('ns', ['a'])[0] == {}
+
+
+def test_busca_em_lotes_preserva_a_ordem(monkeypatch, banco):
+    fake = banco({1, 2, 3, 5})
+    monkeypatch.setattr(func, 'LOTE_IDS', 2)
+    encontrados, ausentes = func.listar_imoveis_por_ids([5, 4, 1, 5, 3], campos={'valor'})
+    assert [imovel['id'] for imovel in encontrados] == [5, 1, 3]
+    assert encontrados[0] == {'id': 5, 'valor': 1000.0}
+    assert ausentes == [4]
+    assert fake.consultas == [(5, 4), (1, 3)]
+
+
+def test_so_os_ids_fora_do_cache_vao_ao_banco(tmp_path, banco):
+    fake = banco({1, 2, 3})
+    shared_cache.configure('sqlite', path=str(tmp_path / 'cache.sqlite3'))
+    try:
+        func.listar_imoveis_por_ids([1, 9])
+        encontrados, ausentes = func.listar_imoveis_por_ids([2, 1, 9])
+        assert [imovel['id'] for imovel in encontrados] == [2, 1]
+        assert ausentes == [9]
+        assert fake.consultas == [(1, 9), (2,)]
+        # Mesmas entradas usadas pela busca de um imóvel só
+        assert func.listar_imovel_por_id(2)['id'] == 2
+        assert len(fake.consultas) == 2
+    finally:
+        shared_cache.configure('none')
+
+
+def test_rotas_de_busca_por_ids(criar_app, linha):
+    client = criar_app([linha(1), linha(2), linha(3)]).test_client()
+    resposta = client.get('/imoveis?ids=3,99,1&fields=valor').get_json()
+    assert [imovel['id'] for imovel in resposta['data']] == [3, 1]
+    assert resposta['missing'] == [99]
+    assert list(resposta['data'][0]) == ['id', 'valor']
+
+    resposta = client.post('/imoveis/lookup', json={'ids': [2, '1']}).get_json()
+    assert [imovel['id'] for imovel in resposta['data']] == [2, 1]
+    assert 'link' in resposta['data'][0]
+
+    assert client.get('/imoveis?ids=1,abc').status_code == 400
+    assert client.post('/imoveis/lookup', json={'ids': []}).status_code == 400
+    assert client.post('/imoveis/lookup', json=[1, 2]).status_code == 400
@@ -0,0 +1,93 @@
+import pytest
+import replication
+from replication import ReplicaRouter
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+def _router(lags, relogio, **kwargs):
+    configs = [{'host': f'replica{i}', 'port': 3306} for i in range(len(lags))]
+    lag_por_host = {c['host']: lag for c, lag in zip(configs, lags)}
+
+    def probe(config):
+        lag = lag_por_host[config['host']]
+        if isinstance(lag, Exception):
+            raise lag
+        return lag
+
+    router = ReplicaRouter(configs, probe=probe, clock=relogio, **kwargs)
+    # Sem thread de monitoramento nos testes: as checagens são chamadas explicitamente
+    router.start = lambda: None
+    router.check_replicas()
+    return router, lag_por_host
+
+
+def test_balanceia_entre_replicas_saudaveis():
+    replication.begin_request('cliente-a')
+    router, _ = _router([0.0, 1.0], Relogio())
+
+    escolhidas = {router.choose().name for _ in range(4)}
+    assert escolhidas == {'replica0:3306', 'replica1:3306'}
+
+
+def test_replicas_atrasadas_ou_fora_do_ar_sao_descartadas():
+    replication.begin_request('cliente-a')
+    router, lags = _router([30.0, None, ConnectionError('down'), 0.5], Relogio(), max_lag=5.0)
+
+    assert {router.choose().name for _ in range(3)} == {'replica3:3306'}
+    assert [r['healthy'] for r in router.status()] == [False, False, False, True]
+
+    # Quando a réplica alcança o primário ela volta para a rotação
+    lags['replica0'] = 1.0
+    router.check_replicas()
+    assert {router.choose().name for _ in range(4)} == {'replica0:3306', 'replica3:3306'}
+
+
+def test_sem_replicas_disponiveis_usa_primario():
+    replication.begin_request('cliente-a')
+    router, _ = _router([None], Relogio())
+    assert router.choose() is None
+
+
+def test_leitura_apos_escrita_fica_no_primario_ate_replica_alcancar():
+    relogio = Relogio()
+    router, _ = _router([2.0], relogio, margin=1.0)
+
+    replication.begin_request('cliente-a')
+    router.record_write()
+    assert replication.request_wrote()
+    assert router.choose() is None
+
+    # Outro cliente continua lendo da réplica
+    replication.begin_request('cliente-b')
+    assert router.choose() is not None
+
+    # Depois do atraso da réplica + margem, o cliente volta para a réplica
+    replication.begin_request('cliente-a')
+    relogio.agora += 3.5
+    assert router.choose() is not None
+
+
+def test_escrita_informada_pelo_cliente():
+    relogio = Relogio()
+    router, _ = _router([2.0], relogio, margin=1.0)
+
+    # Escrita feita em outro worker, informada via cookie
+    replication.begin_request('cliente-c', last_write_hint=relogio.agora - 1.0)
+    assert router.choose() is None
+    replication.begin_request('cliente-c', last_write_hint=relogio.agora - 10.0)
+    assert router.choose() is not None
+
+
+def test_limite_de_sessoes():
+    router, _ = _router([0.0], Relogio(), max_sessions=2)
+    for chave in ['a', 'b', 'c']:
+        replication.begin_request(chave)
+        router.record_write()
+    assert list(router._sessions) == ['b', 'c']
@@ -0,0 +1,107 @@
+import app as app_module
+import response_cache
+import shared_cache
+from response_cache import ResponseCache
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+def test_expira_apos_ttl():
+    relogio = Relogio()
+    cache = ResponseCache(ttl=5, clock=relogio)
+    cache.set('k', 200, [], b'corpo', cache.generation)
+    assert cache.get('k').body == b'corpo'
+    relogio.agora = 5
+    assert cache.get('k') is None
+    assert cache.status()['bytes'] == 0
+
+
+def test_lru_limitado_por_bytes():
+    cache = ResponseCache(ttl=60, max_bytes=10, clock=Relogio())
+    cache.set('a', 200, [], b'12345', 0)
+    cache.set('b', 200, [], b'12345', 0)
+    cache.get('a')
+    cache.set('c', 200, [], b'12345', 0)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.status()['bytes'] == 10
+
+
+def test_resposta_grande_demais_nao_e_guardada():
+    cache = ResponseCache(ttl=60, max_entry_bytes=4, clock=Relogio())
+    cache.set('k', 200, [], b'12345', 0)
+    assert cache.get('k') is None
+
+
+def test_resposta_renderizada_antes_da_invalidacao_e_descartada():
+    cache = ResponseCache(ttl=60, clock=Relogio())
+    geracao = cache.generation
+    cache.invalidate()
+    cache.set('k', 200, [], b'antigo', geracao)
+    assert cache.get('k') is None
+
+
+def test_entrada_de_outra_versao_dos_dados_e_descartada():
+    cache = ResponseCache(ttl=60, clock=Relogio())
+    cache.set('k', 200, [], b'antigo', cache.generation, version=3)
+    assert cache.get('k', 3).body == b'antigo'
+    # Outro processo escreveu: a versão compartilhada mudou
+    assert cache.get('k', 4) is None
+    assert cache.get('k', 3) is None
+
+
+def test_leituras_servidas_do_cache_com_etag(criar_app, linha, monkeypatch):
+    app = criar_app([linha(1, cidade='São Paulo', cep='01000-000', valor=100.0)],
+                    RESPONSE_CACHE_TTL=60, HTTP_MAX_AGE=30)
+    client = app.test_client()
+    primeira = client.get('/imoveis/tipo/casa')
+    assert primeira.status_code == 200
+    assert primeira.headers['X-Cache'] == 'MISS'
+    assert primeira.headers['Cache-Control'] == 'public, max-age=30'
+    assert 'Accept-Encoding' in primeira.headers['Vary']
+    etag = primeira.headers['ETag']
+
+    chamadas = []
+    original = app_module.listar_imoveis_por_tipo
+    monkeypatch.setattr(app_module, 'listar_imoveis_por_tipo',
+                        lambda tipo, **kwargs: chamadas.append(tipo) or original(tipo, **kwargs))
+
+    segunda = client.get('/imoveis/tipo/casa')
+    assert segunda.headers['X-Cache'] == 'HIT'
+    assert segunda.get_data() == primeira.get_data()
+    assert segunda.headers['ETag'] == etag
+    assert client.get('/imoveis/tipo/casa', headers={'If-None-Match': etag}).status_code == 304
+    assert chamadas == []
+
+    # Uma escrita confirmada invalida o cache
+    response_cache.invalidate()
+    assert client.get('/imoveis/tipo/casa').headers['X-Cache'] == 'MISS'
+    assert chamadas == ['casa']
+
+
+def test_cache_desligado_ainda_envia_politica_http(criar_app):
+    client = criar_app([]).test_client()
+    resposta = client.get('/imoveis/tipo/casa')
+    assert resposta.headers['Cache-Control'] == 'no-cache'
+    assert 'ETag' in resposta.headers and 'X-Cache' not in resposta.headers
+    assert client.post('/imoveis', json={}).headers['Cache-Control'] == 'no-store'
+
+
+def test_escrita_de_outro_worker_invalida_pela_versao_compartilhada(criar_app, tmp_path):
+    app = criar_app([], RESPONSE_CACHE_TTL=60, CACHE_BACKEND='sqlite',
+                    CACHE_PATH=str(tmp_path / 'cache.sqlite3'))
+    client = app.test_client()
+    assert client.get('/imoveis/tipo/casa').headers['X-Cache'] == 'MISS'
+    assert client.get('/imoveis/tipo/casa').headers['X-Cache'] == 'HIT'
+
+    # Outro worker confirma uma escrita: só o arquivo compartilhado fica sabendo
+    outro_worker = shared_cache.SQLiteCache(str(tmp_path / 'cache.sqlite3'), prefix=shared_cache.get_cache().prefix)
+    outro_worker.invalidate('imoveis')
+    assert client.get('/imoveis/tipo/casa').headers['X-Cache'] == 'MISS'
+    assert client.get('/imoveis/tipo/casa').headers['X-Cache'] == 'HIT'
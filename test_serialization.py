@@ -0,0 +1,69 @@
+import datetime
+import decimal
+import json
+
+import pytest
+
+import serialization
+
+
+def test_datas_e_decimal_nativos():
+    backend = serialization.get_backend('stdlib')
+    corpo = backend.dumps({'valor': decimal.Decimal('1500.50'), 'data_aquisicao': datetime.date(2020, 1, 2),
+                           'cidade': 'São Paulo'})
+    assert corpo == '{"valor":1500.5,"data_aquisicao":"2020-01-02","cidade":"São Paulo"}'.encode('utf-8')
+
+
+def test_saida_indentada():
+    backend = serialization.get_backend('stdlib')
+    assert backend.dumps({'a': [1]}, pretty=True) == b'{\n  "a": [\n    1\n  ]\n}'
+
+
+@pytest.mark.skipif(serialization.orjson is None, reason='orjson não instalado')
+def test_backends_produzem_o_mesmo_json():
+    dados = {'valor': decimal.Decimal('10.25'), 'data': datetime.date(2021, 5, 6), 'nome': 'Recife'}
+    assert (serialization.get_backend('orjson').dumps(dados)
+            == serialization.get_backend('stdlib').dumps(dados))
+
+
+def test_linhas_direto_para_bytes():
+    colunas = ('id', 'logradouro', 'valor', 'data_aquisicao')
+    linhas = [(1, 'Rua "Á"\n', decimal.Decimal('10.25'), datetime.date(2020, 1, 2)), (2, None, 1e20, {'x': 1})]
+    encoder = serialization.RowEncoder(colunas, suffix=lambda linha: f',"n":{linha[0] * 10}')
+    corpo = encoder.encode(linhas).data
+    esperado = [dict(zip(colunas, linha), n=linha[0] * 10) for linha in linhas]
+    assert corpo == serialization.get_backend('stdlib').dumps(esperado)
+    assert encoder.encode_mappings(esperado).data == corpo
+    assert serialization.RowEncoder(('id',)).encode_mappings([{'id': 3, 'valor': 1}]).data == b'[{"id":3}]'
+
+
+def test_backend_desconhecido():
+    with pytest.raises(ValueError):
+        serialization.get_backend('simdjson')
+
+
+def test_respostas_compactas_com_pretty_opcional(criar_app, linha):
+    client = criar_app([linha(1, valor=1500.5)]).test_client()
+    compacta = client.get('/imoveis/1').get_data()
+    assert b'\n' not in compacta
+    dados = json.loads(compacta)
+    assert list(dados) == ['success', 'message', 'link', 'data']
+    assert list(dados['data'])[:2] == ['id', 'logradouro'] and list(dados['data'])[-1] == 'link'
+    assert dados['data']['data_aquisicao'] == '2020-01-02'
+
+    indentada = client.get('/imoveis/1?pretty=1').get_data()
+    assert indentada.startswith(b'{\n  "success": true')
+    assert json.loads(indentada) == dados
+
+
+def test_listagem_codificada_com_os_links_de_cada_imovel(criar_app, linha):
+    client = criar_app([linha(1), linha(22, cidade='São Paulo')]).test_client()
+    dados = client.get('/imoveis').get_json()['data']
+    assert [imovel['cidade'] for imovel in dados] == ['Recife', 'São Paulo']
+    assert dados[1]['link']['self']['href'] == 'http://localhost/imoveis/22'
+    assert dados[1]['link']['delete'] == {'href': 'http://localhost/imoveis/22', 'method': 'DELETE',
+                                          'title': 'Remover este imóvel'}
+
+    indentada = client.get('/imoveis/tipo/casa?pretty=1').get_data()
+    assert b'\n      "id": 22,' in indentada
+    assert json.loads(indentada)['data'] == dados
@@ -0,0 +1,162 @@
+import http.client
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from server import (
+    PooledWSGIServer, QuietRequestHandler, StatsTable, StatsMiddleware, PID, REQUESTS, ERRORS, IN_FLIGHT
+)
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server.py')
+
+APP_FALSO = '''
+import os
+
+def criar():
+    def app(environ, start_response):
+        status = '500 ERRO' if environ['PATH_INFO'] == '/erro' else '200 OK'
+        start_response(status, [('Content-Type', 'text/plain')])
+        if environ['PATH_INFO'] == '/threads':
+            return [os.environ['SERVER_THREADS'].encode()]
+        return [str(os.getpid()).encode()]
+    return app
+'''
+
+
+def test_stats_middleware_conta_requisicoes_e_erros():
+    stats = StatsTable(2)
+    slot = stats.claim(generation=0)
+    limites = []
+
+    def app(environ, start_response):
+        start_response('503 INDISPONIVEL' if environ.get('erro') else '200 OK', [])
+        return [b'ok']
+
+    middleware = StatsMiddleware(app, stats, slot, max_requests=2, on_limit=lambda: limites.append(1))
+    for environ in ({}, {'erro': True}):
+        resposta = middleware(environ, lambda status, headers, exc_info=None: None)
+        assert stats.get(slot, IN_FLIGHT) == 1
+        assert list(resposta) == [b'ok']
+        resposta.close()
+
+    assert stats.get(slot, REQUESTS) == 2
+    assert stats.get(slot, ERRORS) == 1
+    assert stats.get(slot, IN_FLIGHT) == 0
+    assert limites == [1]
+
+    stats.release(slot)
+    assert stats.get(slot, PID) == 0
+    assert stats.claim(generation=1) == slot
+
+
+def _get(port, path='/'):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        conn.request('GET', path)
+        resposta = conn.getresponse()
+        return resposta.status, resposta.read().decode()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def servidor(tmp_path):
+    (tmp_path / 'app_falso.py').write_text(APP_FALSO)
+    processos = []
+
+    def iniciar(*args):
+        env = dict(os.environ, PYTHONPATH=str(tmp_path))
+        proc = subprocess.Popen(
+            [sys.executable, SERVER, '--app', 'app_falso:criar', '--bind', '127.0.0.1:0', *args],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env
+        )
+        processos.append(proc)
+        port = int(re.search(r':(\d+) ', proc.stdout.readline()).group(1))
+        return proc, port
+
+    yield iniciar
+
+    for proc in processos:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+def test_workers_sao_reciclados_e_encerrados_com_sigterm(servidor):
+    proc, port = servidor('--workers', '2', '--threads', '2', '--max-requests', '3')
+
+    pids = [_get(port)[1] for _ in range(12)]
+    assert len(set(pids)) > 2
+    assert _get(port, '/erro')[0] == 500
+    # A aplicação dimensiona o controle de admissão por --threads
+    assert _get(port, '/threads') == (200, '2')
+
+    proc.send_signal(signal.SIGTERM)
+    assert proc.wait(timeout=10) == 0
+    assert 'total:' in proc.stderr.read()
+
+
+def test_reload_troca_todos_os_workers(servidor):
+    proc, port = servidor('--workers', '2', '--threads', '1')
+    antes = {_get(port)[1] for _ in range(6)}
+
+    proc.send_signal(signal.SIGHUP)
+    prazo = time.monotonic() + 10
+    depois = set()
+    while time.monotonic() < prazo:
+        depois = {_get(port)[1] for _ in range(6)}
+        if not depois & antes:
+            break
+        time.sleep(0.1)
+    assert depois and not depois & antes
+
+    proc.send_signal(signal.SIGTERM)
+    assert proc.wait(timeout=10) == 0
+
+
+def test_stream_sai_do_pool_e_termina_quando_o_worker_para():
+    parar = threading.Event()
+
+    def app(environ, start_response):
+        if environ['PATH_INFO'] != '/stream':
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [b'ok']
+        if not environ['server.detach'](on_stop=parar.set):
+            start_response('503 INDISPONIVEL', [('Content-Type', 'text/plain')])
+            return [b'cheio']
+        start_response('200 OK', [('Content-Type', 'text/event-stream')])
+
+        def eventos():
+            yield b'inicio\n'
+            parar.wait(10)
+        return eventos()
+
+    server = PooledWSGIServer('127.0.0.1', 0, app, threads=1, handler=QuietRequestHandler, streams=1)
+    port = server.server_address[1]
+    loop = threading.Thread(target=server.serve_forever, daemon=True)
+    loop.start()
+
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    conn.request('GET', '/stream')
+    stream = conn.getresponse()
+    assert stream.readline() == b'inicio\n'
+    # O stream aberto não ocupa a única thread do pool
+    assert _get(port) == (200, 'ok')
+    assert _get(port, '/stream') == (503, 'cheio')
+
+    # Como no fim de um worker: sem close_streams(), server_close() esperaria o stream para sempre
+    server.shutdown()
+    loop.join(5)
+    server.close_streams()
+    fechar = threading.Thread(target=server.server_close, daemon=True)
+    fechar.start()
+    fechar.join(5)
+    assert not fechar.is_alive()
+    assert stream.read() == b''
+    conn.close()
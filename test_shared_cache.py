@@ -0,0 +1,147 @@
+import datetime
+import os
+
+import pytest
+
+import shared_cache
+from shared_cache import MISS, NullCache, SQLiteCache
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.fixture
+def caminho(tmp_path):
+    return str(tmp_path / 'cache.sqlite3')
+
+
+def test_miss_depois_hit(caminho):
+    cache = SQLiteCache(caminho)
+    chamadas = []
+
+    def carregar():
+        chamadas.append(1)
+        return [{'id': 1, 'cidade': 'São Paulo'}]
+
+    assert cache.get_or_load('imoveis', 'todos', carregar) == [{'id': 1, 'cidade': 'São Paulo'}]
+    assert cache.get_or_load('imoveis', 'todos', carregar) == [{'id': 1, 'cidade': 'São Paulo'}]
+    assert len(chamadas) == 1
+    assert cache.status()['hits'] == 1
+    assert cache.status()['misses'] == 1
+
+
+def test_invalidacao_vale_para_todos_os_processos(caminho):
+    # Duas instâncias no mesmo arquivo fazem o papel de dois workers
+    worker_a = SQLiteCache(caminho)
+    worker_b = SQLiteCache(caminho)
+    worker_a.get_or_load('imoveis', 'id:1', lambda: {'valor': 100})
+    assert worker_b.get('imoveis', 'id:1')[0] == {'valor': 100}
+
+    worker_b.invalidate('imoveis')
+
+    assert worker_a.get('imoveis', 'id:1')[0] is MISS
+
+
+def test_leitura_concorrente_com_escrita_nao_fica_no_cache(caminho):
+    cache = SQLiteCache(caminho)
+    valor, versao = cache.get('imoveis', 'todos')
+    assert valor is MISS
+    # A escrita confirma e invalida enquanto a leitura antiga ainda carregava
+    cache.invalidate('imoveis')
+    cache.set('imoveis', 'todos', ['antigo'], versao)
+
+    assert cache.get('imoveis', 'todos')[0] is MISS
+
+
+def test_ttl_expira(caminho):
+    relogio = Relogio()
+    cache = SQLiteCache(caminho, default_ttl=30, clock=relogio)
+    cache.get_or_load('imoveis', 'todos', lambda: [1])
+    relogio.agora += 29
+    assert cache.get('imoveis', 'todos')[0] == [1]
+    relogio.agora += 2
+    assert cache.get('imoveis', 'todos')[0] is MISS
+
+
+def test_prefixo_separa_bancos(caminho):
+    banco_a = SQLiteCache(caminho, prefix='a:')
+    banco_b = SQLiteCache(caminho, prefix='b:')
+    banco_a.get_or_load('imoveis', 'todos', lambda: ['a'])
+
+    assert banco_b.get('imoveis', 'todos')[0] is MISS
+    banco_b.invalidate('imoveis')
+    assert banco_a.get('imoveis', 'todos')[0] == ['a']
+
+
+def test_entrada_grande_nao_e_guardada(caminho):
+    cache = SQLiteCache(caminho, max_entry_bytes=100)
+    assert cache.get_or_load('imoveis', 'todos', lambda: 'x' * 1000) == 'x' * 1000
+    assert cache.get('imoveis', 'todos')[0] is MISS
+
+
+def test_prune_remove_antigas_e_excedentes(caminho):
+    relogio = Relogio()
+    cache = SQLiteCache(caminho, max_entries=2, clock=relogio)
+    for i in range(4):
+        cache.set('imoveis', f'id:{i}', i, 0, ttl=10 + i)
+    cache.set('outros', 'velha', 'x', 0)
+    cache.invalidate('outros')
+
+    cache.prune()
+
+    conn = cache._connection()
+    restantes = [row[0] for row in conn.execute("SELECT key FROM entries ORDER BY key")]
+    assert restantes == ['id:2', 'id:3']
+
+
+def test_datas_voltam_como_datas(caminho):
+    cache = SQLiteCache(caminho)
+    imovel = {'id': 1, 'valor': 250000.0, 'data_aquisicao': datetime.date(2020, 5, 17)}
+    cache.set('imoveis', 'id:1', imovel, cache.version('imoveis'))
+    assert SQLiteCache(caminho).get('imoveis', 'id:1')[0] == imovel
+    assert cache.get_many('imoveis', ['id:1'])[0] == {'id:1': imovel}
+
+
+def test_valores_sao_gravados_em_json(caminho):
+    cache = SQLiteCache(caminho)
+    cache.set('imoveis', 'todos', [{'id': 1}], cache.version('imoveis'))
+    with cache._connection() as conn:
+        (valor,) = conn.execute("SELECT value FROM entries").fetchone()
+    assert bytes(valor) == b'[{"id":1}]'
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='permissões POSIX')
+def test_recusa_arquivo_que_outros_podem_alterar(caminho):
+    SQLiteCache(caminho)
+    os.chmod(caminho, 0o666)
+    with pytest.raises(PermissionError):
+        SQLiteCache(caminho)
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='permissões POSIX')
+def test_diretorio_padrao_e_privado():
+    path = shared_cache.default_cache_dir()
+    info = os.stat(path)
+    assert info.st_uid == os.getuid()
+    assert info.st_mode & 0o777 == 0o700
+
+
+def test_null_cache_sempre_carrega():
+    cache = NullCache()
+    assert cache.get_or_load('imoveis', 'todos', lambda: [1]) == [1]
+    assert cache.get('imoveis', 'todos') == (MISS, 0)
+
+
+def test_configure(caminho):
+    try:
+        assert isinstance(shared_cache.configure('sqlite', path=caminho), SQLiteCache)
+        with pytest.raises(ValueError):
+            shared_cache.configure('redis')
+    finally:
+        shared_cache.configure('none')
+    assert isinstance(shared_cache.get_cache(), NullCache)
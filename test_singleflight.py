@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+import func
+from singleflight import Group
+
+
+def _em_paralelo(n, alvo):
+    threads = [threading.Thread(target=alvo) for _ in range(n)]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def test_chamadas_simultaneas_compartilham_uma_execucao():
+    grupo = Group()
+    liberar = threading.Event()
+    execucoes = []
+    resultados = []
+
+    def carregar():
+        execucoes.append(1)
+        liberar.wait(5)
+        return ['imovel']
+
+    threads = _em_paralelo(20, lambda: resultados.append(grupo.do('cidade:Recife', carregar)))
+    while grupo.status()['calls'] < 20:
+        time.sleep(0.001)
+    liberar.set()
+    for t in threads:
+        t.join()
+
+    assert len(execucoes) == 1
+    assert resultados == [['imovel']] * 20
+    status = grupo.status()
+    assert status['collapsed'] == 19
+    assert status['top_keys']['cidade:Recife'] == {'calls': 20, 'executions': 1, 'collapsed': 19}
+    assert status['in_flight'] == 0
+
+
+def test_erro_e_entregue_a_todos():
+    grupo = Group()
+    liberar = threading.Event()
+    erros = []
+
+    def carregar():
+        liberar.wait(5)
+        raise RuntimeError('banco fora')
+
+    def chamar():
+        try:
+            grupo.do('todos', carregar)
+        except RuntimeError as e:
+            erros.append(str(e))
+
+    threads = _em_paralelo(5, chamar)
+    while grupo.status()['calls'] < 5:
+        time.sleep(0.001)
+    liberar.set()
+    for t in threads:
+        t.join()
+    assert erros == ['banco fora'] * 5
+
+
+def test_chamadas_seguidas_nao_reaproveitam_resultado():
+    grupo = Group()
+    valores = iter([1, 2])
+    assert grupo.do('id:1', lambda: next(valores)) == 1
+    assert grupo.do('id:1', lambda: next(valores)) == 2
+
+
+def _voo_em_andamento(grupo, chave):
+    """Deixa uma chamada de `chave` presa até o evento devolvido ser liberado"""
+    liberar = threading.Event()
+    thread = threading.Thread(target=lambda: grupo.do(chave, lambda: liberar.wait(5) and 'antigo'))
+    thread.start()
+    while not grupo.status()['in_flight']:
+        time.sleep(0.001)
+    return liberar, thread
+
+
+@pytest.mark.parametrize('modo', ['forget', 'not_before'])
+def test_escrita_impede_juntar_a_consulta_antiga(modo):
+    relogio = iter([100.0, 200.0])
+    grupo = Group(clock=lambda: next(relogio))
+    liberar, thread = _voo_em_andamento(grupo, 'todos')
+
+    if modo == 'forget':
+        grupo.forget()
+        resultado = grupo.do('todos', lambda: 'novo')
+    else:
+        resultado = grupo.do('todos', lambda: 'novo', not_before=150.0)
+    liberar.set()
+    thread.join()
+
+    assert resultado == 'novo'
+
+
+def test_escrita_confirmada_esquece_consultas(monkeypatch):
+    esquecidas = []
+    monkeypatch.setattr(func.singleflight.group, 'forget', lambda: esquecidas.append(1))
+    func._invalidar_leituras()
+    assert esquecidas == [1]
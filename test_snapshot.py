@@ -0,0 +1,90 @@
+import os
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+import func
+import snapshot
+from snapshot import Snapshot, SnapshotReader, build_snapshot
+
+LINHAS = [
+    (3, 'Avenida Paulista', 'Avenida', 'Bela Vista', 'São Paulo', '01310-100', 'apartamento',
+     Decimal('850000.10'), date(2020, 5, 17)),
+    (1, 'Rua das Flores', 'Rua', 'Centro', 'Curitiba', '80010-000', 'casa',
+     Decimal('420000.00'), date(2015, 1, 2)),
+    (7, 'Rua Augusta', None, None, 'sao paulo', None, None, None, None),
+    (9, 'Rua XV', 'Rua', 'Centro', 'Curitiba', '80020-000', 'Casa', Decimal('0.01'), date(2001, 12, 31)),
+]
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.fixture
+def arquivo(tmp_path):
+    caminho = str(tmp_path / 'imoveis.snap')
+    build_snapshot(LINHAS, caminho)
+    return caminho
+
+
+def test_busca_por_id(arquivo):
+    snap = Snapshot(arquivo)
+    assert snap.count == 4
+    assert snap.get(3) == func._row_para_imovel(LINHAS[0])
+    assert snap.get(7) == func._row_para_imovel(LINHAS[2])
+    assert snap.get(2) is None
+    assert snap.get(100) is None
+
+
+def test_todos_em_ordem_de_id(arquivo):
+    assert [imovel['id'] for imovel in Snapshot(arquivo).all()] == [1, 3, 7, 9]
+
+
+def test_tipo_e_cidade_ignoram_maiusculas_e_acentos(arquivo):
+    snap = Snapshot(arquivo)
+    assert [imovel['id'] for imovel in snap.find('tipo', 'casa')] == [1, 9]
+    assert [imovel['id'] for imovel in snap.find('cidade', 'SAO PAULO')] == [3, 7]
+    assert snap.find('cidade', 'Recife') == []
+    assert snap.count_matching('cidade', 'curitiba') == 2
+
+
+def test_arquivo_invalido(tmp_path):
+    caminho = tmp_path / 'lixo.snap'
+    caminho.write_bytes(b'x' * 100)
+    with pytest.raises(ValueError):
+        Snapshot(str(caminho))
+
+
+def test_troca_atomica(arquivo):
+    relogio = Relogio()
+    leitor = SnapshotReader(arquivo, check_interval=1, clock=relogio)
+    antigo = leitor.current()
+
+    build_snapshot(LINHAS[:1], arquivo)
+    assert not any(nome.startswith('imoveis.snap.tmp') for nome in os.listdir(os.path.dirname(arquivo)))
+    assert leitor.current() is antigo
+
+    relogio.agora += 1
+    novo = leitor.current()
+    assert novo.count == 1
+    # Quem ainda segura o snapshot antigo continua lendo dele
+    assert antigo.get(9)['cidade'] == 'Curitiba'
+
+
+def test_func_le_do_snapshot_sem_banco(arquivo):
+    try:
+        snapshot.configure(arquivo)
+        assert func.listar_imovel_por_id(1)['cidade'] == 'Curitiba'
+        assert len(func.listar_todos_imoveis()) == 4
+        assert [i['id'] for i in func.listar_imoveis_por_tipo('apartamento')] == [3]
+        assert [i['id'] for i in func.listar_imoveis_por_cidade('Curitiba')] == [1, 9]
+        assert func.contar_imoveis() == 4
+        assert func.contar_imoveis(cidade='São Paulo') == 2
+    finally:
+        snapshot.configure(None)
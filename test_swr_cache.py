@@ -0,0 +1,175 @@
+import threading
+
+import func
+import shared_cache
+import swr_cache
+from swr_cache import SWRCache
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+def _cache(**kwargs):
+    relogio = Relogio()
+    return SWRCache(fresh_for=5, stale_for=10, clock=relogio, **kwargs), relogio
+
+
+def _esperar_atualizacao(cache):
+    cache._executor.shutdown(wait=True)
+    cache._executor = None
+
+
+def test_fresco_nao_recarrega():
+    cache, relogio = _cache()
+    valores = iter([1, 2])
+    assert cache.get_or_load('tipo:casa', lambda: next(valores)) == 1
+    relogio.agora = 5
+    assert cache.get_or_load('tipo:casa', lambda: next(valores)) == 1
+    assert cache.status()['hits'] == 1
+
+
+def test_vencido_servido_na_hora_e_atualizado_em_segundo_plano():
+    cache, relogio = _cache()
+    cache.get_or_load('tipo:casa', lambda: 'antigo')
+    relogio.agora = 6
+    liberar = threading.Event()
+
+    def carregar():
+        liberar.wait(5)
+        return 'novo'
+
+    assert cache.get_or_load('tipo:casa', carregar) == 'antigo'
+    # Uma atualização por vez: a segunda requisição não dispara outra
+    assert cache.get_or_load('tipo:casa', carregar) == 'antigo'
+    liberar.set()
+    _esperar_atualizacao(cache)
+
+    assert cache.get_or_load('tipo:casa', carregar) == 'novo'
+    assert cache.status()['refreshes'] == 1
+
+
+def test_alem_da_janela_de_staleness_recarrega_na_hora():
+    cache, relogio = _cache()
+    cache.get_or_load('tipo:casa', lambda: 'antigo')
+    relogio.agora = 16
+    assert cache.get_or_load('tipo:casa', lambda: 'novo') == 'novo'
+
+
+def test_erro_na_atualizacao_mantem_o_valor_antigo():
+    cache, relogio = _cache()
+    cache.get_or_load('tipo:casa', lambda: 'antigo')
+    relogio.agora = 6
+
+    def falhar():
+        raise RuntimeError('banco fora')
+
+    assert cache.get_or_load('tipo:casa', falhar) == 'antigo'
+    _esperar_atualizacao(cache)
+    assert cache.get_or_load('tipo:casa', lambda: 'novo') == 'antigo'
+    _esperar_atualizacao(cache)
+    assert cache.status()['refresh_errors'] == 1
+    assert cache.get_or_load('tipo:casa', lambda: 'x') == 'novo'
+
+
+def test_invalidacao_por_tag():
+    cache, _ = _cache()
+    cache.get_or_load('tipo:casa', lambda: 'casas', {('tipo', 'casa')})
+    cache.get_or_load('cidade:recife', lambda: 'recife', {('cidade', 'recife')})
+
+    cache.invalidate({('tipo', 'casa'), ('cidade', 'natal')})
+
+    assert cache.get_or_load('tipo:casa', lambda: 'casas 2') == 'casas 2'
+    assert cache.get_or_load('cidade:recife', lambda: 'recife 2') == 'recife'
+
+
+def test_atualizacao_iniciada_antes_da_invalidacao_e_descartada():
+    cache, relogio = _cache()
+    tags = {('tipo', 'casa')}
+    cache.get_or_load('tipo:casa', lambda: 'antigo', tags)
+    relogio.agora = 6
+    liberar = threading.Event()
+
+    def carregar():
+        liberar.wait(5)
+        return 'lido antes da escrita'
+
+    cache.get_or_load('tipo:casa', carregar, tags)
+    cache.invalidate(tags)
+    liberar.set()
+    _esperar_atualizacao(cache)
+
+    assert cache.get_or_load('tipo:casa', lambda: 'depois da escrita', tags) == 'depois da escrita'
+
+
+def test_carga_concorrente_com_invalidacao_nao_e_guardada():
+    cache, _ = _cache()
+
+    def carregar():
+        cache.invalidate(None)
+        return 'lido antes da escrita'
+
+    assert cache.get_or_load('tipo:casa', carregar) == 'lido antes da escrita'
+    assert cache.status()['entries'] == 0
+
+
+def test_entrada_de_outra_versao_dos_dados_e_recarregada_na_hora():
+    cache, relogio = _cache()
+    cache.get_or_load('tipo:casa', lambda: 'antigo', version=1)
+    relogio.agora = 6
+    # Outro processo escreveu: nem a entrada vencida é servida
+    assert cache.get_or_load('tipo:casa', lambda: 'novo', version=2) == 'novo'
+    assert cache._executor is None
+    assert cache.get_or_load('tipo:casa', lambda: 'x', version=2) == 'novo'
+
+
+def test_escrita_de_outro_worker_invalida_pela_versao_compartilhada(tmp_path, monkeypatch):
+    caminho = str(tmp_path / 'cache.sqlite3')
+    shared_cache.configure('sqlite', path=caminho)
+    swr_cache.configure(fresh_for=60)
+    # Sem coalescing: cada carga vai direto ao "banco"
+    monkeypatch.setattr(func, '_coalescer', lambda chave, carregar: carregar())
+    leituras = []
+
+    def carregar():
+        leituras.append(1)
+        return []
+
+    try:
+        func._com_revalidacao('tipo:casa', carregar, None, {('tipo', 'casa')})
+        func._com_revalidacao('tipo:casa', carregar, None, {('tipo', 'casa')})
+        assert len(leituras) == 1
+
+        shared_cache.SQLiteCache(caminho).invalidate(func.CACHE_NAMESPACE)
+        func._com_revalidacao('tipo:casa', carregar, None, {('tipo', 'casa')})
+        assert len(leituras) == 2
+    finally:
+        swr_cache.configure(0)
+        shared_cache.configure('none')
+
+
+def test_limite_de_entradas():
+    cache, _ = _cache(max_entries=2)
+    for chave in ['a', 'b', 'a', 'c']:
+        cache.get_or_load(chave, lambda: chave)
+    assert list(cache._entries) == ['a', 'c']
+
+
+def test_escrita_invalida_so_as_listagens_afetadas():
+    cache = swr_cache.configure(fresh_for=60)
+    try:
+        cache.get_or_load('tipo:casa', lambda: 1, {('tipo', 'casa')})
+        cache.get_or_load('cidade:sao paulo', lambda: 1, {('cidade', 'sao paulo')})
+        cache.get_or_load('cidade:recife', lambda: 1, {('cidade', 'recife')})
+
+        func._invalidar_leituras(func._filtros(('Casa', 'São Paulo')))
+        assert sorted(cache._entries) == ['cidade:recife']
+
+        func._invalidar_leituras(None)
+        assert cache.status()['entries'] == 0
+    finally:
+        swr_cache.configure(0)
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import func
+from func import codificar_token_sync, decodificar_token_sync, listar_alteracoes, TokenExpiradoError
+
+AGORA = datetime(2025, 6, 1, 12, 0, 0)
+
+
+class FakeTx:
+    """Transação falsa: responde ao SELECT do horário e à consulta de alterações"""
+
+    def __init__(self, linhas):
+        self.linhas = linhas
+        self.params = None
+        self.query = None
+
+    def execute(self, query, params=None, fetch_one=False, fetch_all=False, get_lastrowid=False):
+        if 'SELECT CURRENT_TIMESTAMP' in query:
+            return (AGORA,)
+        self.query = query
+        self.params = params
+        return self.linhas[:params[-1]]
+
+
+def _imovel(imovel_id, momento):
+    return (imovel_id, 'Rua A', 'Rua', 'Centro', 'Recife', '50000000', 'casa', 100.0, '2020-01-01', momento, 0)
+
+
+def _removido(imovel_id, momento):
+    return (imovel_id,) + (None,) * 8 + (momento, 1)
+
+
+def test_token_ida_e_volta():
+    momento = datetime(2025, 1, 2, 3, 4, 5, 678901)
+    assert decodificar_token_sync(codificar_token_sync(momento, 42)) == (momento, 42)
+
+
+@pytest.mark.parametrize('token', ['lixo', codificar_token_sync(AGORA, 1)[:-3] + '!!!'])
+def test_token_invalido(token):
+    with pytest.raises(ValueError):
+        decodificar_token_sync(token)
+
+
+def test_pagina_com_mais_alteracoes_continua_da_ultima_linha():
+    antigo = AGORA - timedelta(hours=1)
+    linhas = [_imovel(1, antigo), _removido(7, antigo + timedelta(seconds=1)), _imovel(3, antigo + timedelta(seconds=2))]
+    resultado = listar_alteracoes(limite=2, tx=FakeTx(linhas))
+
+    assert [i['id'] for i in resultado['alterados']] == [1]
+    assert resultado['removidos'] == [7]
+    assert resultado['tem_mais']
+    assert decodificar_token_sync(resultado['token']) == (antigo + timedelta(seconds=1), 7)
+
+
+def test_campos_pedidos_vao_para_o_select():
+    antigo = AGORA - timedelta(hours=1)
+    linhas = [(1, 'Recife', antigo, 0), (7, None, antigo + timedelta(seconds=1), 1)]
+    tx = FakeTx(linhas)
+    resultado = listar_alteracoes(limite=5, tx=tx, campos={'cidade'})
+
+    assert 'SELECT id, cidade,' in tx.query
+    assert 'SELECT id, NULL,' in tx.query and 'logradouro' not in tx.query
+    assert resultado['alterados'] == [{'id': 1, 'cidade': 'Recife'}]
+    assert resultado['removidos'] == [7]
+
+
+def test_ultima_pagina_recua_a_janela_de_seguranca():
+    recente = AGORA - timedelta(seconds=1)
+    tx = FakeTx([_imovel(5, recente)])
+    resultado = listar_alteracoes(codificar_token_sync(AGORA - timedelta(minutes=10), 2), tx=tx)
+
+    assert not resultado['tem_mais']
+    assert tx.params[:3] == (AGORA - timedelta(minutes=10), AGORA - timedelta(minutes=10), 2)
+    assert decodificar_token_sync(resultado['token']) == (
+        AGORA - timedelta(seconds=func.JANELA_SEGURANCA_SYNC), 0
+    )
+
+
+def test_token_mais_antigo_que_os_tombstones_expira():
+    token = codificar_token_sync(AGORA - timedelta(days=func.RETENCAO_REMOVIDOS_DIAS), 1)
+    with pytest.raises(TokenExpiradoError):
+        listar_alteracoes(token, tx=FakeTx([]))
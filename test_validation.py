@@ -0,0 +1,74 @@
+import pytest
+
+from validation import Field, Validator, imovel_validator
+
+VALIDO = {
+    'logradouro': ' Rua A ', 'tipo_logradouro': 'Rua', 'bairro': 'Centro', 'cidade': 'Recife',
+    'cep': '50000-000', 'tipo': 'Casa ', 'valor': 250000, 'data_aquisicao': '2020-01-31'
+}
+
+
+def _codigos(erros):
+    return [(erro['field'], erro['code']) for erro in erros]
+
+
+def test_payload_valido_e_normalizado():
+    imovel, erros = imovel_validator.validate(VALIDO)
+    assert erros == []
+    assert imovel == {
+        'logradouro': 'Rua A', 'tipo_logradouro': 'Rua', 'bairro': 'Centro', 'cidade': 'Recife',
+        'cep': '50000-000', 'tipo': 'casa', 'valor': 250000.0, 'data_aquisicao': '2020-01-31'
+    }
+
+
+def test_todos_os_erros_de_uma_vez():
+    payload = dict(VALIDO, cidade='  ', cep='1234', tipo='castelo', valor='-5', data_aquisicao='2021-02-29')
+    del payload['bairro']
+
+    imovel, erros = imovel_validator.validate(payload)
+
+    assert imovel is None
+    assert _codigos(erros) == [
+        ('bairro', 'required'), ('cidade', 'empty'), ('cep', 'invalid_format'),
+        ('tipo', 'invalid_choice'), ('valor', 'out_of_range'), ('data_aquisicao', 'invalid_date'),
+    ]
+    assert all(erro['message'] for erro in erros)
+
+
+@pytest.mark.parametrize('valor', ['abc', 'nan', 'inf', True, [1]])
+def test_valor_nao_numerico(valor):
+    _, erros = imovel_validator.validate(dict(VALIDO, valor=valor))
+    assert _codigos(erros) == [('valor', 'not_a_number')]
+
+
+def test_parcial_valida_apenas_campos_presentes():
+    assert imovel_validator.validate({'valor': '10.5'}, partial=True) == ({'valor': 10.5}, [])
+    _, erros = imovel_validator.validate({'cidade': None, 'cep': 'x'}, partial=True)
+    assert _codigos(erros) == [('cidade', 'empty'), ('cep', 'invalid_format')]
+
+
+def test_corpo_que_nao_e_objeto():
+    _, erros = imovel_validator.validate(['lista'])
+    assert _codigos(erros) == [(None, 'invalid_type')]
+
+
+def test_lote_valida_por_coluna_uma_vez_por_valor():
+    chamadas = []
+    validador = Validator({'tipo': Field('choice', choices=['casa'])})
+    check = validador._checks[0][1]
+
+    def contando(valor):
+        chamadas.append(valor)
+        return check(valor)
+
+    validador._checks[0] = ('tipo', contando)
+    limpos, erros = validador.validate_batch([{'tipo': 'casa'}] * 1000 + [{'tipo': 'loja'}, {}])
+
+    assert chamadas == ['casa', 'loja']
+    assert limpos[0] == {'tipo': 'casa'} and limpos[1000] is None and limpos[1001] is None
+    assert _codigos(erros[1001]) == [('tipo', 'required')]
+
+
+def test_texto_longo_demais():
+    _, erros = imovel_validator.validate(dict(VALIDO, tipo_logradouro='x' * 51))
+    assert _codigos(erros) == [('tipo_logradouro', 'too_long')]
@@ -0,0 +1,196 @@
+import math
+import re
+from datetime import date
+
+# Tipos de imóvel aceitos pela API
+TIPOS_VALIDOS = ['casa', 'apartamento', 'terreno', 'casa em condominio']
+
+_MISSING = object()
+_CEP = re.compile(r'\d{8}')
+_DATE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+
+
+class Field:
+    """
+    Declarative description of one payload field.
+
+    kind is one of 'text', 'cep', 'choice', 'date' or 'number'.
+    """
+
+    def __init__(self, kind, required=True, max_length=None, choices=None, minimum=None):
+        self.kind = kind
+        self.required = required
+        self.max_length = max_length
+        self.choices = choices
+        self.minimum = minimum
+
+
+IMOVEL_SCHEMA = {
+    'logradouro': Field('text', max_length=255),
+    'tipo_logradouro': Field('text', max_length=50),
+    'bairro': Field('text', max_length=255),
+    'cidade': Field('text', max_length=255),
+    'cep': Field('cep'),
+    'tipo': Field('choice', choices=TIPOS_VALIDOS),
+    'valor': Field('number', minimum=0),
+    'data_aquisicao': Field('date'),
+}
+
+
+def _error(field, code, message):
+    return {'field': field, 'code': code, 'message': message}
+
+
+def _compile_field(name, field):
+    """Build the check for one field: value -> (clean value, None) or (None, error)"""
+    if field.kind == 'number':
+        def check(value):
+            try:
+                if isinstance(value, bool):
+                    raise ValueError
+                number = float(value.strip() if isinstance(value, str) else value)
+            except (ValueError, TypeError):
+                return None, _error(name, 'not_a_number', 'O valor deve ser um número válido')
+            if not math.isfinite(number):
+                return None, _error(name, 'not_a_number', 'O valor deve ser um número válido')
+            if field.minimum is not None and number < field.minimum:
+                return None, _error(name, 'out_of_range', 'O valor deve ser um número positivo')
+            return number, None
+        return check
+
+    empty = _error(name, 'empty', f'{name.replace("_", " ").title()} não pode estar vazio')
+
+    if field.kind == 'text':
+        too_long = _error(name, 'too_long', f'{name} deve ter no máximo {field.max_length} caracteres')
+
+        def check(value):
+            text = str(value).strip()
+            if not text:
+                return None, empty
+            if field.max_length is not None and len(text) > field.max_length:
+                return None, too_long
+            return text, None
+
+    elif field.kind == 'cep':
+        invalid = _error(name, 'invalid_format',
+                         'CEP deve conter 8 dígitos numéricos (formato: 12345678 ou 12345-678)')
+
+        def check(value):
+            text = str(value).strip()
+            if not text:
+                return None, empty
+            if not _CEP.fullmatch(text.replace('-', '').replace('.', '')):
+                return None, invalid
+            return text, None
+
+    elif field.kind == 'choice':
+        choices = frozenset(field.choices)
+        invalid = _error(name, 'invalid_choice', f'Tipo deve ser um dos seguintes: {", ".join(field.choices)}')
+
+        def check(value):
+            text = str(value).strip().lower()
+            if not text:
+                return None, empty
+            if text not in choices:
+                return None, invalid
+            return text, None
+
+    elif field.kind == 'date':
+        invalid = _error(name, 'invalid_date', 'Data deve estar no formato YYYY-MM-DD (ex: 2024-01-15)')
+
+        def check(value):
+            text = str(value).strip()
+            if not text:
+                return None, empty
+            match = _DATE.fullmatch(text)
+            if match is None:
+                return None, invalid
+            try:
+                date(*map(int, match.groups()))
+            except ValueError:
+                return None, invalid
+            return text, None
+
+    else:
+        raise ValueError(f"Unknown field kind: {field.kind}")
+    return check
+
+
+class Validator:
+    """
+    Validator compiled once from a schema.
+
+    validate_batch() works column by column: each field's check runs once
+    per distinct value of the column, so repeated values (tipo, cidade,
+    dates) in a large batch cost a dictionary lookup. Every error of every
+    record is reported, as {'field', 'code', 'message'} dictionaries.
+    """
+
+    def __init__(self, schema):
+        self.fields = list(schema)
+        self.required = [name for name, field in schema.items() if field.required]
+        self._checks = [(name, _compile_field(name, field)) for name, field in schema.items()]
+
+    def validate_batch(self, records, partial=False):
+        """
+        Validate and normalize many records.
+
+        Args:
+            records (list): Payload dictionaries
+            partial (bool): Only validate the fields present (updates); missing
+                required fields are not errors
+
+        Returns:
+            tuple: (list with the clean dict of each valid record or None,
+                list with the errors of each record)
+        """
+        errors = [[] for _ in records]
+        clean = []
+        for record, record_errors in zip(records, errors):
+            if isinstance(record, dict):
+                clean.append({})
+            else:
+                clean.append(None)
+                record_errors.append(_error(None, 'invalid_type', 'O registro deve ser um objeto JSON'))
+
+        for name, check in self._checks:
+            required = not partial and name in self.required
+            missing = _error(name, 'required', f'{name} é obrigatório')
+            memo = {}
+            for record, values, record_errors in zip(records, clean, errors):
+                if values is None:
+                    continue
+                value = record.get(name, _MISSING)
+                if value is _MISSING or value is None:
+                    if value is None and partial:
+                        record_errors.append(_error(name, 'empty', f'{name} não pode ser nulo'))
+                    elif required:
+                        record_errors.append(missing)
+                    continue
+                try:
+                    result = memo.get((type(value), value))
+                    if result is None:
+                        result = memo[(type(value), value)] = check(value)
+                except TypeError:
+                    # Valor não hashable (lista, objeto): valida sem memo
+                    result = check(value)
+                cleaned, error = result
+                if error is not None:
+                    record_errors.append(error)
+                else:
+                    values[name] = cleaned
+
+        return [values if not record_errors else None for values, record_errors in zip(clean, errors)], errors
+
+    def validate(self, data, partial=False):
+        """
+        Validate and normalize one payload.
+
+        Returns:
+            tuple: (clean dict or None, list of errors)
+        """
+        clean, errors = self.validate_batch([data], partial)
+        return clean[0], errors[0]
+
+
+imovel_validator = Validator(IMOVEL_SCHEMA)
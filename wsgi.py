@@ -0,0 +1,15 @@
+"""
+Ponto de entrada WSGI para servidores de produção.
+
+Exemplo com gunicorn, carregando a aplicação antes do fork:
+
+    gunicorn --preload --workers 4 --threads 8 wsgi:application
+
+Com vários threads por worker, ajuste DB_POOL_SIZE para o número de threads.
+"""
+import os
+from app import create_app
+
+application = create_app({
+    'WARM_POOL': os.getenv('WARM_POOL', '').lower() in ('1', 'true', 'yes'),
+})